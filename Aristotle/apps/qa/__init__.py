@@ -1 +1,3 @@
 #!/usr/bin/env python
+
+default_app_config = 'Aristotle.apps.qa.apps.QAConfig'
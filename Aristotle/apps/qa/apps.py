@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+#
+# @name: apps.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+from django.apps import AppConfig
+from django.core.signals import request_finished
+from django.db.models.signals import post_migrate
+
+
+class QAConfig(AppConfig):
+    name = 'Aristotle.apps.qa'
+    verbose_name = 'Question & Answer'
+
+    def ready(self):
+        from Aristotle.apps.qa.search import setup_index
+        from Aristotle.apps.qa.hits import flush_due_hits
+        post_migrate.connect(setup_index, sender=self)
+        request_finished.connect(flush_due_hits)
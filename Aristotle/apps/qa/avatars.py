@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+#
+# @name: avatars.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""Avatars
+
+An upload request only stores the original, named by its content (see
+storage), and hands it to a pool of AVATAR_WORKERS threads, which
+decodes it once and switches the avatar of the member to it with a
+single UPDATE if it is a readable image. Avatars hold a reference to
+their file (see media), the previous avatar of the member lets go of
+its own.
+
+The sizes of AVATAR_SIZES are not made on upload. /avatar/<size>/<name>
+makes a size the first time it is asked for, from one decode of the
+original, at a reduced scale for JPEGs. Made sizes are kept on disk by
+ThumbnailCache, which drops the least recently served ones once they
+take more than AVATAR_CACHE_MAX_SIZE bytes.
+"""
+import os
+import logging
+import threading
+from multiprocessing.pool import ThreadPool
+from PIL import Image
+from django.db import connection, transaction
+from Aristotle.apps.qa.models import Member
+from Aristotle.apps.qa.media import acquire, release
+import Aristotle.apps.qa.settings as qa_settings
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    # created by the first upload, after the server has forked
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPool(qa_settings.AVATAR_WORKERS)
+    return _pool
+
+
+def avatar_url(size, filename):
+    return '/avatar/%s/%s' % (size, filename)
+
+
+def open_avatar(path, box):
+    """decode an image for a box, at the smallest scale of a JPEG still
+    larger than box
+    return the image and its format
+    """
+    image = Image.open(path)
+    image_format = image.format
+    if image_format == 'JPEG':
+        image.draft('RGB', box)
+    return image.convert('RGB'), image_format
+
+
+def _temporary(path):
+    return '%s.%d.%d.tmp' % (path, os.getpid(),
+                             threading.current_thread().ident)
+
+
+class ThumbnailCache(object):
+    '''sizes of avatars made on demand, in a directory of at most
+    max_size bytes; the modification time of a file is when it was
+    last served, the oldest files are removed first
+    '''
+
+    def __init__(self, root, max_size):
+        self.root = root
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        # bytes in the directory, counted again when over max_size
+        self.size = None
+
+    def path(self, box, filename):
+        return os.path.join(self.root, '%dx%d' % box, filename)
+
+    def get(self, original, box, filename):
+        """path of the thumbnail of an avatar file, made if missing
+        """
+        path = self.path(box, filename)
+        try:
+            os.utime(path, None)
+            return path
+        except OSError:
+            pass
+        image, image_format = open_avatar(original, box)
+        image.thumbnail(box, Image.ANTIALIAS)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # made meanwhile by another thread
+                pass
+        temporary = _temporary(path)
+        image.save(temporary, image_format)
+        image.close()
+        os.rename(temporary, path)
+        self._added(os.path.getsize(path))
+        return path
+
+    def _added(self, size):
+        with self.lock:
+            if self.size is None:
+                self.size = self._scan()[0]
+            else:
+                self.size += size
+            if self.size > self.max_size:
+                self.size = self.evict()
+
+    def _scan(self):
+        files = []
+        total = 0
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        return total, files
+
+    def evict(self):
+        """remove the least recently served files down to 90% of
+        max_size, return the bytes left
+        """
+        total, files = self._scan()
+        for _, size, path in sorted(files):
+            if total <= self.max_size * 0.9:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        return total
+
+
+_cache = None
+
+
+def thumbnail_cache(storage):
+    global _cache
+    if _cache is None:
+        _cache = ThumbnailCache(storage.path(qa_settings.AVATAR_CACHE_PATH),
+                                qa_settings.AVATAR_CACHE_MAX_SIZE)
+    return _cache
+
+
+def forget_thumbnails(storage, name):
+    """remove the made sizes of a removed avatar file
+    """
+    cache = thumbnail_cache(storage)
+    filename = name[len(qa_settings.AVATAR_PATH):]
+    for box in qa_settings.AVATAR_SIZES.values():
+        try:
+            os.remove(cache.path(box, filename))
+        except OSError:
+            pass
+
+
+def process_avatar(member_id, storage, filename):
+    """check that an uploaded avatar decodes, then show it
+    """
+    name = qa_settings.AVATAR_PATH + filename
+    try:
+        box = max(qa_settings.AVATAR_SIZES.values())
+        image, _ = open_avatar(storage.path(name), box)
+        image.close()
+    except Exception as e:
+        logger.error('avatar %s: %s' % (filename, str(e)))
+        release(name)
+        return False
+    with transaction.atomic():
+        previous = Member.objects.filter(id=member_id).values_list(
+            'avatar', flat=True)
+        previous = previous[0] if previous else None
+        Member.objects.filter(id=member_id).update(avatar=filename)
+        if previous:
+            release(qa_settings.AVATAR_PATH + previous)
+    return True
+
+
+def _process_in_worker(*args):
+    try:
+        return process_avatar(*args)
+    finally:
+        # each worker thread has a connection of its own
+        connection.close()
+
+
+def save_avatar(member, upload):
+    """store an uploaded avatar and have it checked
+    the avatar of member changes once it is
+    """
+    name = member.avatar.field.generate_filename(member, upload.name)
+    if not name.startswith(qa_settings.AVATAR_PATH):
+        raise ValueError('Incorrect image')
+    storage = member.avatar.storage
+    path = storage.save(name, upload)
+    acquire(path)
+    if not storage.exists(path):
+        # removed by collect_media before it was acquired
+        upload.seek(0)
+        storage.save(name, upload)
+    filename = path[len(qa_settings.AVATAR_PATH):]
+    if qa_settings.AVATAR_WORKERS:
+        _get_pool().apply_async(_process_in_worker,
+                                (member.id, storage, filename))
+        return None
+    return process_avatar(member.id, storage, filename)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+#
+# @name: cache.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""Cache backends
+
+SharedMemoryCache keeps entries in a memory-mapped file, so the
+workers of a host share one cache without a cache server.
+StrictLocMemCache is a stand-in for memcached in development and
+tests: it rejects the keys and values memcached would.
+"""
+import os
+import mmap
+import time
+import zlib
+import fcntl
+import struct
+import threading
+from contextlib import contextmanager
+try:
+    from django.utils.six.moves import cPickle as pickle
+except ImportError:
+    import pickle
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.cache.backends.base import MEMCACHE_MAX_KEY_LENGTH
+from django.core.cache.backends.locmem import LocMemCache
+
+# hash, expiry time, key size, value size of a slot
+SLOT_HEADER = struct.Struct('<IdHI')
+
+# first byte of a stored value; pickles of COMPRESS_MIN_SIZE bytes or
+# more are stored compressed when that makes them smaller
+PLAIN = b'\x00'
+COMPRESSED = b'\x01'
+COMPRESS_MIN_SIZE = 1024
+
+# mapped files and thread locks by location, shared by the instances
+# of every thread since file locks only exclude other processes
+_maps = {}
+_locks = {}
+_open_lock = threading.Lock()
+
+
+class SharedMemoryCache(BaseCache):
+    '''cache in a memory-mapped file shared by the processes of a host
+
+    LOCATION is the file, best on a tmpfs such as /dev/shm. It holds
+    OPTIONS['SLOTS'] slots of OPTIONS['SLOT_SIZE'] bytes in sets of
+    OPTIONS['WAYS']: a key lives in one set, which is locked while it
+    is read or written, and a full set evicts the entry closest to
+    expiry. Values are compressed, those still larger than a slot are
+    not cached.
+    '''
+
+    def __init__(self, location, params):
+        BaseCache.__init__(self, params)
+        options = params.get('OPTIONS', {})
+        self._slot_size = int(options.get('SLOT_SIZE', 4096))
+        self._ways = int(options.get('WAYS', 8))
+        self._sets = max(1, int(options.get('SLOTS', 4096)) // self._ways)
+        self._set_size = self._slot_size * self._ways
+        self._path = location
+
+    def _open(self):
+        with _open_lock:
+            if self._path not in _maps:
+                size = self._sets * self._set_size
+                fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+                try:
+                    # a file of another layout is emptied first
+                    if os.fstat(fd).st_size != size:
+                        os.ftruncate(fd, 0)
+                        os.ftruncate(fd, size)
+                finally:
+                    fcntl.lockf(fd, fcntl.LOCK_UN)
+                _maps[self._path] = (fd, mmap.mmap(fd, size))
+                _locks[self._path] = threading.Lock()
+            return _maps[self._path]
+
+    @contextmanager
+    def _locked(self, hashed):
+        """the mapped file and offset of the set of a hash, locked
+        """
+        fd, mapped = self._open()
+        start = hashed % self._sets * self._set_size
+        with _locks[self._path]:
+            fcntl.lockf(fd, fcntl.LOCK_EX, self._set_size, start)
+            try:
+                yield mapped, start
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, self._set_size, start)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        if not isinstance(key, bytes):
+            key = key.encode('utf-8')
+        return key, zlib.crc32(key) & 0xffffffff
+
+    def _slots(self, start):
+        return range(start, start + self._set_size, self._slot_size)
+
+    def _find(self, mapped, start, key, hashed):
+        """offset, expiry time and value size of the slot of a key
+        offset is None when the key is not in its set
+        """
+        for offset in self._slots(start):
+            slot_hash, expires, key_size, value_size = \
+                SLOT_HEADER.unpack_from(mapped, offset)
+            if key_size == len(key) and slot_hash == hashed:
+                begin = offset + SLOT_HEADER.size
+                if mapped[begin:begin + key_size] == key:
+                    return offset, expires, value_size
+        return None, 0, 0
+
+    def _read(self, mapped, offset, key, value_size):
+        begin = offset + SLOT_HEADER.size + len(key)
+        return mapped[begin:begin + value_size]
+
+    def _write(self, mapped, start, key, hashed, value, expires, offset=None):
+        if offset is None:
+            now = time.time()
+            victim = None
+            for slot in self._slots(start):
+                _, slot_expires, key_size, _ = \
+                    SLOT_HEADER.unpack_from(mapped, slot)
+                if not key_size or slot_expires <= now:
+                    offset = slot
+                    break
+                if victim is None or slot_expires < victim[0]:
+                    victim = (slot_expires, slot)
+            if offset is None:
+                offset = victim[1]
+        SLOT_HEADER.pack_into(mapped, offset, hashed, expires,
+                              len(key), len(value))
+        begin = offset + SLOT_HEADER.size
+        mapped[begin:begin + len(key) + len(value)] = key + value
+
+    def _expires(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return float('inf') if expires is None else expires
+
+    def _pack(self, value):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(pickled) >= COMPRESS_MIN_SIZE:
+            compressed = zlib.compress(pickled)
+            if len(compressed) < len(pickled):
+                return COMPRESSED + compressed
+        return PLAIN + pickled
+
+    def _unpack(self, data):
+        if data[:1] == COMPRESSED:
+            data = zlib.decompress(data[1:])
+        elif data[:1] != PLAIN:
+            raise ValueError('unknown value format')
+        else:
+            data = data[1:]
+        return pickle.loads(data)
+
+    def _fits(self, key, value):
+        return SLOT_HEADER.size + len(key) + len(value) <= self._slot_size
+
+    def get(self, key, default=None, version=None):
+        key, hashed = self._key(key, version)
+        with self._locked(hashed) as (mapped, start):
+            offset, expires, value_size = self._find(mapped, start, key,
+                                                     hashed)
+            if offset is None or expires <= time.time():
+                return default
+            data = self._read(mapped, offset, key, value_size)
+        try:
+            return self._unpack(data)
+        except (pickle.PickleError, zlib.error, ValueError):
+            # written by another version of the backend
+            return default
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store(key, value, timeout, version, replace=True)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._store(key, value, timeout, version, replace=False)
+
+    def _store(self, key, value, timeout, version, replace):
+        key, hashed = self._key(key, version)
+        data = self._pack(value)
+        with self._locked(hashed) as (mapped, start):
+            offset, expires, _ = self._find(mapped, start, key, hashed)
+            if offset is not None and not replace and \
+                    expires > time.time():
+                return False
+            if not self._fits(key, data):
+                # never leave an older value behind
+                if offset is not None:
+                    SLOT_HEADER.pack_into(mapped, offset, 0, 0, 0, 0)
+                return False
+            self._write(mapped, start, key, hashed, data,
+                        self._expires(timeout), offset)
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key, hashed = self._key(key, version)
+        with self._locked(hashed) as (mapped, start):
+            offset, expires, value_size = self._find(mapped, start, key,
+                                                     hashed)
+            if offset is None or expires <= time.time():
+                raise ValueError("Key '%s' not found" % key)
+            value = self._unpack(self._read(mapped, offset, key,
+                                            value_size)) + delta
+            data = self._pack(value)
+            if not self._fits(key, data):
+                SLOT_HEADER.pack_into(mapped, offset, 0, 0, 0, 0)
+                raise ValueError("Key '%s' too large" % key)
+            self._write(mapped, start, key, hashed, data, expires, offset)
+        return value
+
+    def delete(self, key, version=None):
+        key, hashed = self._key(key, version)
+        with self._locked(hashed) as (mapped, start):
+            offset, _, _ = self._find(mapped, start, key, hashed)
+            if offset is not None:
+                SLOT_HEADER.pack_into(mapped, offset, 0, 0, 0, 0)
+
+    def clear(self):
+        for index in range(self._sets):
+            with self._locked(index) as (mapped, start):
+                for offset in self._slots(start):
+                    SLOT_HEADER.pack_into(mapped, offset, 0, 0, 0, 0)
+
+
+class StrictLocMemCache(LocMemCache):
+    '''local memory cache that fails where memcached would
+
+    keys over 250 characters or with spaces or control characters
+    raise ValueError, and values pickled to more than
+    OPTIONS['MAX_VALUE_SIZE'] bytes are not cached
+    '''
+
+    def __init__(self, name, params):
+        LocMemCache.__init__(self, name, params)
+        options = params.get('OPTIONS', {})
+        self._max_value_size = int(options.get('MAX_VALUE_SIZE', 1024 * 1024))
+
+    def validate_key(self, key):
+        if len(key) > MEMCACHE_MAX_KEY_LENGTH:
+            raise ValueError('Cache key longer than %d: %s' % (
+                MEMCACHE_MAX_KEY_LENGTH, key))
+        for char in key:
+            if ord(char) < 33 or ord(char) == 127:
+                raise ValueError('Cache key with invalid characters: %r' % key)
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        if len(value) > self._max_value_size:
+            self._cache.pop(key, None)
+            self._expire_info.pop(key, None)
+            return
+        LocMemCache._set(self, key, value, timeout)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+#
+# @name: fragments.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""Cached fragments of question pages
+
+Fragment keys carry a version of their question, and every write to
+the question, its answers, comments or votes bumps it: a stale fragment
+is never read again and simply expires. Versions expire too, after
+QUESTION_VERSION_TIMEOUT; the next one is new, so fragments of the
+question are rendered again. Fragments are rendered with a
+placeholder CSRF token, replaced by the token of each request.
+"""
+import time
+import hashlib
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.utils.encoding import force_text
+from django.utils.safestring import mark_safe
+import Aristotle.apps.qa.settings as qa_settings
+
+CSRF_PLACEHOLDER = 'QA_CSRF_TOKEN'
+
+
+def _version_key(question_id):
+    return 'qa:question:%d:version' % question_id
+
+
+def _new_version():
+    # never reuse a version number after the key is evicted
+    return int(time.time() * 1000000)
+
+
+def question_version(question_id):
+    key = _version_key(question_id)
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version,
+                         qa_settings.QUESTION_VERSION_TIMEOUT):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_question_version(question_id):
+    """invalidate every cached fragment of a question
+    """
+    key = _version_key(question_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), qa_settings.QUESTION_VERSION_TIMEOUT)
+
+
+def cached_fragment(question_id, name, render, *args):
+    """value of render(), cached under the current version
+    None results are not cached
+    """
+    key = 'qa:question:%d:%d:%s' % (
+        question_id, question_version(question_id), name)
+    if args:
+        # arguments come from the query string, keep the key safe
+        # for memcached
+        key += ':' + hashlib.md5(':'.join(
+            [force_text(arg) for arg in args]).encode('utf-8')).hexdigest()
+    value = cache.get(key)
+    if value is None:
+        value = render()
+        if value is not None:
+            cache.set(key, value, qa_settings.QUESTION_CACHE_TIMEOUT)
+    return value
+
+
+def with_csrf_token(request, html):
+    return mark_safe(html.replace(CSRF_PLACEHOLDER, get_token(request) or ''))
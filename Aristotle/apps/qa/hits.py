@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+#
+# @name: hits.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""Write-behind question views
+
+A question page only adds its view to a buffer in memory, deduplicated
+by visitor. The buffer is written once a request has finished, when it
+holds HIT_BUFFER_SIZE views or is HIT_FLUSH_INTERVAL seconds old: one
+INSERT per batch of new QuestionHit rows and one UPDATE of hits_count
+per distinct increment.
+
+With HIT_STORAGE = 'sketch' unique visitors go to a HyperLogLog sketch
+per question instead of rows, so storage does not grow with traffic.
+hits_count is always the number of QuestionHit rows plus the estimate
+of the sketch. Sketches are read locked and added to, so the flushes of
+several workers never overwrite each other's visitors.
+"""
+import time
+import logging
+import threading
+from django.db import transaction, DatabaseError, IntegrityError
+from django.db.models import Q, F
+from django.utils import timezone
+from Aristotle.apps.qa.models import Question, QuestionHit
+from Aristotle.apps.qa.models import QuestionViewers, QuestionDailyViews
+from Aristotle.apps.qa.hot import update_hot_score
+from Aristotle.apps.qa.hyperloglog import HyperLogLog
+import Aristotle.apps.qa.settings as qa_settings
+
+logger = logging.getLogger(__name__)
+
+
+class HitBuffer(object):
+    '''views waiting to be written, keyed by (question id, visitor)
+    a visitor is a session key, or an IP address without a session
+    '''
+
+    def __init__(self):
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flushed_time = time.time()
+
+    def add(self, question_id, ip, session):
+        key = (question_id, session or ip)
+        with self.lock:
+            if key not in self.pending:
+                self.pending[key] = (ip, session or '')
+
+    def due(self):
+        return len(self.pending) >= qa_settings.HIT_BUFFER_SIZE or \
+            time.time() - self.flushed_time >= qa_settings.HIT_FLUSH_INTERVAL
+
+    def take(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flushed_time = time.time()
+        return pending
+
+
+_buffer = HitBuffer()
+
+
+def record_hit(question_id, ip, session=None):
+    """count a view of a question, without touching the database
+    """
+    _buffer.add(question_id, ip, session)
+
+
+def flush_hits():
+    """write the buffered views, return the number of new hits
+    """
+    pending = sorted(_buffer.take().items())
+    created = 0
+    size = qa_settings.HIT_FLUSH_BATCH
+    for start in range(0, len(pending), size):
+        try:
+            with transaction.atomic():
+                created += _write_hits(pending[start:start + size])
+        except DatabaseError as e:
+            logger.error('question hits: %s' % str(e))
+    return created
+
+
+def flush_due_hits(sender, **kwargs):
+    """request_finished handler
+    """
+    if _buffer.pending and _buffer.due():
+        flush_hits()
+
+
+def _write_hits(pending):
+    existing = set(Question.objects.filter(
+        id__in=set(key[0] for key, _ in pending)).values_list(
+        'id', flat=True))
+    # deleted questions would fail the whole batch
+    pending = [(key, value) for key, value in pending if key[0] in existing]
+    if not pending:
+        return 0
+    if qa_settings.HIT_DAILY_ROLLUP:
+        _roll_up(pending)
+    if qa_settings.HIT_STORAGE == 'sketch':
+        return _write_sketches(pending)
+    return _write_rows(pending)
+
+
+def _write_rows(pending):
+    question_ids = set(question_id for (question_id, _), _ in pending)
+    sessions = [session for _, (ip, session) in pending if session]
+    ips = [ip for _, (ip, session) in pending if not session]
+    visited = Q()
+    if sessions:
+        visited |= Q(session__in=sessions)
+    if ips:
+        visited |= Q(session='', ip__in=ips)
+    seen = set()
+    rows = QuestionHit.objects.filter(visited, question_id__in=question_ids)
+    for question_id, ip, session in rows.values_list(
+            'question_id', 'ip', 'session'):
+        seen.add((question_id, session or ip))
+    now = timezone.now()
+    hits = []
+    counts = {}
+    for key, (ip, session) in pending:
+        if key in seen:
+            continue
+        question_id = key[0]
+        hits.append(QuestionHit(question_id=question_id, ip=ip,
+                                session=session, created_time=now))
+        counts[question_id] = counts.get(question_id, 0) + 1
+    QuestionHit.objects.bulk_create(hits)
+    _add_hits_count(counts)
+    return len(hits)
+
+
+def _add_hits_count(counts):
+    """{question id: new hits}, one UPDATE per distinct increment
+    """
+    by_increment = {}
+    for question_id, count in counts.items():
+        if count:
+            by_increment.setdefault(count, []).append(question_id)
+    for increment, ids in by_increment.items():
+        Question.objects.filter(id__in=ids).update(
+            hits_count=F('hits_count') + increment)
+    for ids in by_increment.values():
+        for question_id in ids:
+            update_hot_score(question_id)
+
+
+def _load_sketch(data):
+    if data:
+        return HyperLogLog.from_bytes(data)
+    return HyperLogLog(qa_settings.HIT_SKETCH_PRECISION)
+
+
+def _visitors(pending):
+    visitors = {}
+    for (question_id, visitor), _ in pending:
+        visitors.setdefault(question_id, []).append(visitor)
+    return visitors
+
+
+def _locked(queryset):
+    """{question id: row} of a queryset, locked until the end of the
+    transaction; rows are locked in order, so that the flushes of two
+    workers cannot deadlock
+    """
+    return dict((row.question_id, row) for row in
+                queryset.select_for_update().order_by('question_id'))
+
+
+def _create_rows(model, rows):
+    """insert {question id: row} at once, or one by one when another
+    worker inserted some of them meanwhile
+    return the question ids of the rows inserted by the other worker
+    """
+    if not rows:
+        return []
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(rows.values())
+        return []
+    except IntegrityError:
+        pass
+    taken = []
+    for question_id, row in sorted(rows.items()):
+        try:
+            with transaction.atomic():
+                row.save(force_insert=True)
+        except IntegrityError:
+            taken.append(question_id)
+    return taken
+
+
+def add_viewers(visitors):
+    """add {question id: [visitor, ...]} to the sketches of the
+    questions, return {question id: increase of the estimate}
+    """
+    rows = _locked(QuestionViewers.objects.filter(
+        question_id__in=list(visitors)))
+    created = {}
+    increases = {}
+    for question_id, keys in visitors.items():
+        row = rows.get(question_id)
+        sketch = _load_sketch(row.sketch if row else None)
+        before = sketch.count()
+        data = sketch.to_bytes()
+        for key in keys:
+            sketch.add(key)
+        # the estimate can drop a little where it switches from linear
+        # counting to the raw estimate, views are never taken back
+        increases[question_id] = max(0, sketch.count() - before)
+        if row is None:
+            created[question_id] = QuestionViewers(
+                question_id=question_id, sketch=sketch.to_bytes())
+        elif sketch.to_bytes() != data:
+            QuestionViewers.objects.filter(question_id=question_id).update(
+                sketch=sketch.to_bytes())
+    for question_id in _create_rows(QuestionViewers, created):
+        # added to the sketch of the other worker instead
+        increases.update(add_viewers({question_id: visitors[question_id]}))
+    return increases
+
+
+def _write_sketches(pending):
+    increases = add_viewers(_visitors(pending))
+    _add_hits_count(increases)
+    return sum(increases.values())
+
+
+def roll_up(day, visitors):
+    """add {question id: [visitor, ...]} to the views of a day
+    """
+    rows = _locked(QuestionDailyViews.objects.filter(
+        day=day, question_id__in=list(visitors)))
+    created = {}
+    for question_id, keys in visitors.items():
+        row = rows.get(question_id)
+        sketch = _load_sketch(row.sketch if row else None)
+        for key in keys:
+            sketch.add(key)
+        if row is None:
+            created[question_id] = QuestionDailyViews(
+                question_id=question_id, day=day, views=len(keys),
+                sketch=sketch.to_bytes())
+        else:
+            QuestionDailyViews.objects.filter(id=row.id).update(
+                views=F('views') + len(keys), sketch=sketch.to_bytes())
+    for question_id in _create_rows(QuestionDailyViews, created):
+        roll_up(day, {question_id: visitors[question_id]})
+
+
+def _roll_up(pending):
+    roll_up(timezone.localtime(timezone.now()).date(), _visitors(pending))
+
+
+def compact_hits(question_id):
+    """move the QuestionHit rows of a question into its sketch and,
+    with HIT_DAILY_ROLLUP, its daily views; return the rows removed
+    """
+    rows = QuestionHit.objects.filter(question_id=question_id)
+    visitors = []
+    days = {}
+    for session, ip, created_time in rows.values_list(
+            'session', 'ip', 'created_time').iterator():
+        visitors.append(session or ip)
+        day = timezone.localtime(created_time).date()
+        days.setdefault(day, []).append(session or ip)
+    if not visitors:
+        return 0
+    increase = add_viewers({question_id: visitors})[question_id]
+    if qa_settings.HIT_DAILY_ROLLUP:
+        for day, keys in days.items():
+            roll_up(day, {question_id: keys})
+    rows.delete()
+    Question.objects.filter(id=question_id).update(
+        hits_count=F('hits_count') + increase - len(visitors))
+    update_hot_score(question_id)
+    return len(visitors)
+
+
+def viewers_counts():
+    """{question id: estimated visitors} of every sketch
+    """
+    rows = QuestionViewers.objects.values_list('question_id', 'sketch')
+    return dict((question_id, _load_sketch(sketch).count())
+                for question_id, sketch in rows.iterator())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+#
+# @name: hot.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""Hot questions
+
+The hot score of a question is its activity, made of votes, answers
+and views, halved every HOT_HALF_LIFE seconds of age. At any moment
+ranking by activity * 2 ** (-age / HOT_HALF_LIFE) gives the same order
+as ranking by
+
+    log(activity) + log(2) * created / HOT_HALF_LIFE
+
+which is what Question.hot_score stores. It only changes when the
+counters do, and the hot list is a plain ORDER BY on an index.
+"""
+import math
+import calendar
+from datetime import datetime, timedelta
+from django.utils import timezone
+from Aristotle.apps.qa.models import Question
+import Aristotle.apps.qa.settings as qa_settings
+
+# created times are counted from here to keep scores small
+EPOCH = calendar.timegm(datetime(2014, 1, 1).utctimetuple())
+
+HOT_ORDERING = ('-hot_score', '-id')
+TOP_ORDERING = ('-votes_count', '-answers_count', '-hits_count', '-id')
+NEW_ORDERING = ('-created_time', '-id')
+
+
+def hot_score(votes, answers, hits, created_time):
+    activity = 1.0 + qa_settings.HOT_VOTE_WEIGHT * votes + \
+        qa_settings.HOT_ANSWER_WEIGHT * answers + \
+        qa_settings.HOT_HIT_WEIGHT * hits
+    created = calendar.timegm(created_time.utctimetuple()) - EPOCH
+    return math.log(max(activity, 1.0)) + \
+        math.log(2) * created / qa_settings.HOT_HALF_LIFE
+
+
+_SCORE_FIELDS = ('votes_count', 'answers_count', 'hits_count', 'created_time')
+
+
+def update_hot_score(question_id):
+    """recompute the score of a question after its counters changed
+    """
+    rows = Question.objects.filter(id=question_id).values_list(
+        *_SCORE_FIELDS)
+    if rows:
+        Question.objects.filter(id=question_id).update(
+            hot_score=hot_score(*rows[0]))
+
+
+def refresh_hot_scores():
+    """recompute every score, e.g. after changing the weights
+    return the number of questions updated
+    """
+    updated = 0
+    rows = Question.objects.values_list('id', 'hot_score', *_SCORE_FIELDS)
+    for row in rows.iterator():
+        score = hot_score(*row[2:])
+        if abs(score - row[1]) > 1e-9:
+            Question.objects.filter(id=row[0]).update(hot_score=score)
+            updated += 1
+    return updated
+
+
+def hot_questions():
+    return Question.objects.order_by(*HOT_ORDERING)
+
+
+def top_questions(days):
+    """most voted questions asked in the last days
+    """
+    since = timezone.now() - timedelta(days=days)
+    return Question.objects.filter(created_time__gte=since).order_by(
+        *TOP_ORDERING)
+
+
+def new_questions():
+    return Question.objects.order_by(*NEW_ORDERING)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+#
+# @name: hyperloglog.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""HyperLogLog distinct counter (Flajolet et al., 2007)
+
+2 ** precision one-byte registers, the standard error is about
+1.04 / sqrt(2 ** precision): 3.3% with the default 1 KB sketch.
+"""
+import math
+import struct
+import hashlib
+
+
+def _hash(value):
+    if not isinstance(value, bytes):
+        value = value.encode('utf-8')
+    return struct.unpack('>Q', hashlib.sha1(value).digest()[:8])[0]
+
+
+class HyperLogLog(object):
+
+    def __init__(self, precision=10, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is None:
+            registers = bytearray(self.size)
+        self.registers = registers
+
+    def add(self, value):
+        h = _hash(value)
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('cannot merge sketches of different sizes')
+        registers = self.registers
+        for i, rank in enumerate(other.registers):
+            if rank > registers[i]:
+                registers[i] = rank
+
+    def count(self):
+        m = float(self.size)
+        if self.size >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[self.size]
+        total = 0.0
+        zeros = 0
+        for rank in self.registers:
+            total += 2.0 ** -rank
+            if not rank:
+                zeros += 1
+        estimate = alpha * m * m / total
+        # linear counting is more accurate for small cardinalities
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return bytes(bytearray([self.precision]) + self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytearray(bytes(data))
+        if not data or len(data) != (1 << data[0]) + 1:
+            raise ValueError('not a sketch')
+        return cls(data[0], data[1:])
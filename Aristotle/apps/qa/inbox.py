@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+#
+# @name: inbox.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""In-site notifications
+
+An answer, comment or accepted answer is fanned out when it is written:
+one Notification row per user following the question or answer, all
+inserted at once, and one UPDATE of their NotificationCounter rows. The
+unread count of a user is then a single primary key lookup. The
+notifications of a deleted question or answer are taken out of the
+counts before the delete cascades to them.
+"""
+import logging
+from django.db import transaction, DatabaseError, IntegrityError
+from django.db.models import F, Count
+from Aristotle.apps.qa.models import QuestionComment, AnswerComment
+from Aristotle.apps.qa.models import Notification, NotificationCounter
+
+logger = logging.getLogger(__name__)
+
+
+def notify(kind, actor, question, answer, user_ids):
+    """notify users of something actor did, never actor itself
+    return the number of notified users
+    """
+    user_ids = set(user_ids)
+    user_ids.discard(actor.id)
+    if not user_ids:
+        return 0
+    try:
+        with transaction.atomic():
+            Notification.objects.bulk_create([Notification(
+                user_id=user_id, actor=actor, kind=kind, question=question,
+                answer=answer) for user_id in sorted(user_ids)])
+            _add_unread(user_ids, 1)
+        return len(user_ids)
+    except DatabaseError as e:
+        logger.error('notifications: %s' % str(e))
+        return 0
+
+
+def _add_unread(user_ids, delta):
+    counted = set(NotificationCounter.objects.filter(
+        user_id__in=user_ids).values_list('user_id', flat=True))
+    missing = [NotificationCounter(user_id=user_id)
+               for user_id in user_ids if user_id not in counted]
+    if missing:
+        try:
+            with transaction.atomic():
+                NotificationCounter.objects.bulk_create(missing)
+        except IntegrityError:
+            # created meanwhile by another request
+            pass
+    NotificationCounter.objects.filter(user_id__in=user_ids).update(
+        unread=F('unread') + delta)
+
+
+def _question_followers(question):
+    """the author and commenters of a question
+    """
+    users = set(QuestionComment.objects.filter(
+        question=question).values_list('user_id', flat=True))
+    users.add(question.author_id)
+    return users
+
+
+def notify_answer(answer):
+    return notify('answer', answer.author, answer.question, answer,
+                  _question_followers(answer.question))
+
+
+def notify_question_comment(comment):
+    return notify('question_comment', comment.user, comment.question, None,
+                  _question_followers(comment.question))
+
+
+def notify_answer_comment(comment):
+    answer = comment.answer
+    users = set(AnswerComment.objects.filter(
+        answer=answer).values_list('user_id', flat=True))
+    users.update((answer.author_id, answer.question.author_id))
+    return notify('answer_comment', comment.user, answer.question, answer,
+                  users)
+
+
+def notify_accept(answer):
+    return notify('accept', answer.question.author, answer.question, answer,
+                  [answer.author_id])
+
+
+def unread_count(user):
+    counts = NotificationCounter.objects.filter(
+        user=user).values_list('unread', flat=True)
+    return counts[0] if counts else 0
+
+
+def mark_read(user, ids=None):
+    """mark notifications of a user read, all of them if ids is None
+    """
+    with transaction.atomic():
+        notifications = Notification.objects.filter(user=user,
+                                                    has_read=False)
+        if ids is None:
+            notifications.update(has_read=True)
+            NotificationCounter.objects.filter(user=user).update(unread=0)
+        else:
+            read = notifications.filter(id__in=ids).update(has_read=True)
+            if read:
+                NotificationCounter.objects.filter(user=user).update(
+                    unread=F('unread') - read)
+
+
+def unread_counts(notifications):
+    """{user id: unread notifications} of a queryset, in a single
+    GROUP BY query
+    """
+    rows = notifications.filter(has_read=False).values(
+        'user_id').annotate(count=Count('id'))
+    return dict((row['user_id'], row['count']) for row in rows)
+
+
+def forget(notifications):
+    """delete notifications, and their unread ones from the counts
+    one UPDATE per distinct count
+    """
+    with transaction.atomic():
+        by_count = {}
+        for user_id, count in unread_counts(notifications).items():
+            by_count.setdefault(count, []).append(user_id)
+        for count, user_ids in by_count.items():
+            NotificationCounter.objects.filter(user_id__in=user_ids).update(
+                unread=F('unread') - count)
+        notifications.delete()
+
+
+def forget_question(question):
+    forget(Notification.objects.filter(question=question))
+
+
+def forget_answer(answer):
+    forget(Notification.objects.filter(answer=answer))
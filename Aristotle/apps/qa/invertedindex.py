@@ -0,0 +1,872 @@
+#!/usr/bin/env python
+#
+# @name: invertedindex.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""Embedded inverted index for databases without full-text search
+
+An index is a directory of immutable segment files plus a manifest.
+Every write appends a small segment and marks replaced documents as
+deleted in the older ones; a background merge folds small segments
+together. Readers memory-map the segments and pick up a new manifest
+on the next query.
+
+Segment layout, native byte order, all counts little enough for u32:
+
+    header    magic, version, ndocs, nterms, section offsets
+    docs      doc ids u32[ndocs] sorted, doc lengths u32[ndocs]
+    terms     term offsets u32[nterms + 1], utf-8 term blob
+    entries   df u32[nterms], postings offsets u64[nterms]
+    postings  per term: doc ids u32[df], weighted tf f32[df],
+              position starts u32[df + 1], positions u32[...]
+"""
+import os
+import re
+import sys
+import errno
+import json
+import mmap
+import math
+import heapq
+import fcntl
+import struct
+import bisect
+import logging
+import tempfile
+import threading
+from array import array
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'AQIX'
+VERSION = 1
+HEADER = struct.Struct('<4sIIIBQQQQ')
+MANIFEST = 'segments.json'
+LOCK = 'LOCK'
+
+# manifests read again when their segments are merged away meanwhile
+REFRESH_ATTEMPTS = 5
+
+# positions of two fields never look adjacent to a phrase query
+FIELD_GAP = 100
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+STOP_WORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'is', 'it', 'of', 'on', 'or', 'that', 'the', 'to', 'was', 'with',
+))
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def array_from_bytes(typecode, data=b''):
+    result = array(typecode)
+    if data:
+        if hasattr(result, 'frombytes'):
+            result.frombytes(data)
+        else:
+            result.fromstring(data)
+    return result
+
+
+def array_to_bytes(values):
+    if hasattr(values, 'tobytes'):
+        return values.tobytes()
+    return values.tostring()
+
+
+def _typecode(candidates, size):
+    for typecode in candidates:
+        try:
+            if array(typecode).itemsize == size:
+                return typecode
+        except ValueError:
+            pass
+    raise ImportError('no %d byte array type' % size)
+
+
+U32 = _typecode('IL', 4)
+U64 = _typecode('QL', 8)
+F32 = 'f'
+
+
+class PorterStemmer(object):
+    '''M. F. Porter's suffix stripping algorithm (1980)
+    '''
+
+    def __init__(self):
+        self.cache = {}
+
+    def _cons(self, word, i):
+        char = word[i]
+        if char in 'aeiou':
+            return False
+        if char == 'y':
+            return i == 0 or not self._cons(word, i - 1)
+        return True
+
+    def _m(self, stem):
+        """number of VC sequences in the stem
+        """
+        n = 0
+        i = 0
+        length = len(stem)
+        while i < length and self._cons(stem, i):
+            i += 1
+        while i < length:
+            while i < length and not self._cons(stem, i):
+                i += 1
+            if i >= length:
+                break
+            while i < length and self._cons(stem, i):
+                i += 1
+            n += 1
+        return n
+
+    def _vowel_in(self, stem):
+        return any(not self._cons(stem, i) for i in range(len(stem)))
+
+    def _double_cons(self, word):
+        return len(word) >= 2 and word[-1] == word[-2] and \
+            self._cons(word, len(word) - 1)
+
+    def _cvc(self, word):
+        if len(word) < 3:
+            return False
+        return self._cons(word, len(word) - 3) and \
+            not self._cons(word, len(word) - 2) and \
+            self._cons(word, len(word) - 1) and word[-1] not in 'wxy'
+
+    def _replace(self, word, rules, min_m):
+        for suffix, replacement in rules:
+            if word.endswith(suffix):
+                stem = word[:len(word) - len(suffix)]
+                if self._m(stem) > min_m:
+                    return stem + replacement
+                return word
+        return word
+
+    def _step1ab(self, word):
+        if word.endswith('sses'):
+            word = word[:-2]
+        elif word.endswith('ies'):
+            word = word[:-2]
+        elif word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        if word.endswith('eed'):
+            if self._m(word[:-3]) > 0:
+                word = word[:-1]
+            return word
+        for suffix in ('ed', 'ing'):
+            if word.endswith(suffix):
+                stem = word[:-len(suffix)]
+                if not self._vowel_in(stem):
+                    return word
+                word = stem
+                if word.endswith(('at', 'bl', 'iz')):
+                    return word + 'e'
+                if self._double_cons(word) and word[-1] not in 'lsz':
+                    return word[:-1]
+                if self._m(word) == 1 and self._cvc(word):
+                    return word + 'e'
+                return word
+        return word
+
+    def _step1c(self, word):
+        if word.endswith('y') and self._vowel_in(word[:-1]):
+            return word[:-1] + 'i'
+        return word
+
+    STEP2 = (
+        ('ational', 'ate'), ('tional', 'tion'), ('enci', 'ence'),
+        ('anci', 'ance'), ('izer', 'ize'), ('abli', 'able'),
+        ('alli', 'al'), ('entli', 'ent'), ('eli', 'e'), ('ousli', 'ous'),
+        ('ization', 'ize'), ('ation', 'ate'), ('ator', 'ate'),
+        ('alism', 'al'), ('iveness', 'ive'), ('fulness', 'ful'),
+        ('ousness', 'ous'), ('aliti', 'al'), ('iviti', 'ive'),
+        ('biliti', 'ble'),
+    )
+
+    STEP3 = (
+        ('icate', 'ic'), ('ative', ''), ('alize', 'al'), ('iciti', 'ic'),
+        ('ical', 'ic'), ('ful', ''), ('ness', ''),
+    )
+
+    STEP4 = (
+        'al', 'ance', 'ence', 'er', 'ic', 'able', 'ible', 'ant', 'ement',
+        'ment', 'ent', 'ion', 'ou', 'ism', 'ate', 'iti', 'ous', 'ive', 'ize',
+    )
+
+    def _step2(self, word):
+        rules = sorted(self.STEP2, key=lambda rule: -len(rule[0]))
+        return self._replace(word, rules, 0)
+
+    def _step3(self, word):
+        rules = sorted(self.STEP3, key=lambda rule: -len(rule[0]))
+        return self._replace(word, rules, 0)
+
+    def _step4(self, word):
+        for suffix in sorted(self.STEP4, key=len, reverse=True):
+            if word.endswith(suffix):
+                stem = word[:-len(suffix)]
+                if self._m(stem) > 1:
+                    if suffix == 'ion' and not stem.endswith(('s', 't')):
+                        return word
+                    return stem
+                return word
+        return word
+
+    def _step5(self, word):
+        if word.endswith('e'):
+            stem = word[:-1]
+            m = self._m(stem)
+            if m > 1 or (m == 1 and not self._cvc(stem)):
+                word = stem
+        if word.endswith('ll') and self._m(word) > 1:
+            word = word[:-1]
+        return word
+
+    def stem(self, word):
+        if len(word) <= 2 or not word.isalpha():
+            return word
+        result = self.cache.get(word)
+        if result is None:
+            result = word
+            for step in (self._step1ab, self._step1c, self._step2,
+                         self._step3, self._step4, self._step5):
+                result = step(result)
+            if len(self.cache) < 100000:
+                self.cache[word] = result
+        return result
+
+
+_stemmer = PorterStemmer()
+
+
+def analyze(text):
+    """normalized terms of a text, stop words are dropped
+    """
+    terms = []
+    for word in WORD_RE.findall(text.lower()):
+        if word not in STOP_WORDS:
+            terms.append(_stemmer.stem(word))
+    return terms
+
+
+def parse_query(query):
+    """query string to a list of OR clauses
+    each clause is a list of AND items, each item a list of terms
+    (one term, or several for a "quoted phrase")
+    """
+    clauses = [[]]
+    for match in re.finditer(r'"([^"]*)"?|(\S+)', query or ''):
+        phrase, word = match.groups()
+        if word == 'OR':
+            clauses.append([])
+            continue
+        terms = analyze(phrase if phrase is not None else word)
+        if terms:
+            clauses[-1].append(terms)
+    return [clause for clause in clauses if clause]
+
+
+def snippet(text, terms, start, stop, size=16):
+    """a window of size words around the first match in text,
+    matched words are wrapped in start and stop
+    """
+    words = list(WORD_RE.finditer(text or ''))
+    if not words:
+        return ''
+    matched = [_stemmer.stem(word.group().lower()) in terms
+               for word in words]
+    first = matched.index(True) if True in matched else 0
+    begin = max(0, min(first - size // 4, len(words) - size))
+    end = min(len(words), begin + size)
+    parts = ['...'] if begin else []
+    position = words[begin].start()
+    for i in range(begin, end):
+        word = words[i]
+        parts.append(text[position:word.start()])
+        if matched[i]:
+            parts.append(start + word.group() + stop)
+        else:
+            parts.append(word.group())
+        position = word.end()
+    if end < len(words):
+        parts.append('...')
+    return ''.join(parts)
+
+
+class Segment(object):
+    '''read-only view of a segment file
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.ndocs, self.nterms, byteorder, docs_offset,
+         terms_offset, entries_offset, postings_offset) = \
+            HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not a segment' % path)
+        self.swap = byteorder != (sys.byteorder == 'little')
+        n = self.ndocs
+        self.doc_ids = self._read(U32, docs_offset, n)
+        self.doc_lengths = self._read(U32, docs_offset + 4 * n, n)
+        self.term_offsets = self._read(U32, terms_offset, self.nterms + 1)
+        self.terms_blob = terms_offset + 4 * (self.nterms + 1)
+        self.dfs = self._read(U32, entries_offset, self.nterms)
+        self.postings_offsets = self._read(
+            U64, entries_offset + 4 * self.nterms, self.nterms)
+        self.total_length = sum(self.doc_lengths)
+
+    def _read(self, typecode, offset, count):
+        size = array(typecode).itemsize
+        values = array_from_bytes(
+            typecode, self.map[offset:offset + size * count])
+        if self.swap:
+            values.byteswap()
+        return values
+
+    def close(self):
+        self.map.close()
+
+    def term(self, i):
+        start = self.terms_blob + self.term_offsets[i]
+        end = self.terms_blob + self.term_offsets[i + 1]
+        return self.map[start:end].decode('utf-8')
+
+    def find(self, term):
+        """index of a term in the dictionary or -1
+        """
+        lo, hi = 0, self.nterms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.term(mid) < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.nterms and self.term(lo) == term:
+            return lo
+        return -1
+
+    def df(self, term):
+        i = self.find(term)
+        return self.dfs[i] if i >= 0 else 0
+
+    def postings(self, term):
+        """Postings of a term or None
+        """
+        i = self.find(term)
+        if i < 0:
+            return None
+        return Postings(self, self.dfs[i], int(self.postings_offsets[i]))
+
+    def doc_length(self, doc_id):
+        i = bisect.bisect_left(self.doc_ids, doc_id)
+        if i < self.ndocs and self.doc_ids[i] == doc_id:
+            return self.doc_lengths[i]
+        return 0
+
+    def iter_terms(self):
+        for i in range(self.nterms):
+            yield self.term(i)
+
+
+class Postings(object):
+    '''postings list of one term in one segment, decoded lazily
+    '''
+
+    def __init__(self, segment, df, offset):
+        self.segment = segment
+        self.df = df
+        self.offset = offset
+        self.doc_ids = segment._read(U32, offset, df)
+        self._tfs = None
+        self._starts = None
+
+    @property
+    def tfs(self):
+        if self._tfs is None:
+            self._tfs = self.segment._read(
+                F32, self.offset + 4 * self.df, self.df)
+        return self._tfs
+
+    @property
+    def starts(self):
+        if self._starts is None:
+            self._starts = self.segment._read(
+                U32, self.offset + 8 * self.df, self.df + 1)
+        return self._starts
+
+    def index(self, doc_id):
+        i = bisect.bisect_left(self.doc_ids, doc_id)
+        if i < self.df and self.doc_ids[i] == doc_id:
+            return i
+        return -1
+
+    def positions(self, i):
+        starts = self.starts
+        base = self.offset + 12 * self.df + 4
+        return self.segment._read(
+            U32, base + 4 * starts[i], starts[i + 1] - starts[i])
+
+    def all_positions(self):
+        """positions of every document, sliced with starts
+        """
+        base = self.offset + 12 * self.df + 4
+        return self.segment._read(U32, base, self.starts[self.df])
+
+
+class SegmentWriter(object):
+    '''builds a segment from analyzed documents
+    '''
+
+    def __init__(self):
+        self.docs = {}
+        self.postings = {}
+
+    def add(self, doc_id, fields):
+        """fields is a list of (text, weight)
+        """
+        self.docs[doc_id] = 0
+        position = 0
+        length = 0
+        for text, weight in fields:
+            for term in analyze(text or ''):
+                doc_postings = self.postings.setdefault(term, {})
+                tf, positions = doc_postings.get(doc_id, (0.0, None))
+                if positions is None:
+                    positions = []
+                positions.append(position)
+                doc_postings[doc_id] = (tf + weight, positions)
+                position += 1
+                length += 1
+            position += FIELD_GAP
+        self.docs[doc_id] = length
+
+    def add_postings(self, term, doc_id, tf, positions):
+        """copy postings of a live document during a merge
+        """
+        self.postings.setdefault(term, {})[doc_id] = (tf, positions)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def write(self, path):
+        doc_ids = sorted(self.docs)
+        terms = sorted(self.postings)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(b'\0' * HEADER.size)
+            docs_offset = f.tell()
+            f.write(array_to_bytes(array(U32, doc_ids)))
+            lengths = array(U32, [self.docs[d] for d in doc_ids])
+            f.write(array_to_bytes(lengths))
+            terms_offset = f.tell()
+            blob = [term.encode('utf-8') for term in terms]
+            offsets = array(U32, [0])
+            for encoded in blob:
+                offsets.append(offsets[-1] + len(encoded))
+            f.write(array_to_bytes(offsets))
+            f.write(b''.join(blob))
+            entries_offset = f.tell()
+            dfs = array(U32, [len(self.postings[t]) for t in terms])
+            f.write(array_to_bytes(dfs))
+            # postings offsets are patched once they are known
+            f.write(b'\0' * (8 * len(terms)))
+            postings_offset = f.tell()
+            postings_offsets = array(U64)
+            for term in terms:
+                postings_offsets.append(f.tell())
+                doc_postings = self.postings[term]
+                term_docs = sorted(doc_postings)
+                tfs = array(F32)
+                starts = array(U32, [0])
+                positions = array(U32)
+                for doc_id in term_docs:
+                    tf, doc_positions = doc_postings[doc_id]
+                    tfs.append(tf)
+                    positions.extend(doc_positions)
+                    starts.append(len(positions))
+                f.write(array_to_bytes(array(U32, term_docs)))
+                f.write(array_to_bytes(tfs))
+                f.write(array_to_bytes(starts))
+                f.write(array_to_bytes(positions))
+            f.seek(entries_offset + 4 * len(terms))
+            f.write(array_to_bytes(postings_offsets))
+            f.seek(0)
+            f.write(HEADER.pack(
+                MAGIC, VERSION, len(doc_ids), len(terms),
+                sys.byteorder == 'little', docs_offset, terms_offset,
+                entries_offset, postings_offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp, path)
+
+
+class InvertedIndex(object):
+    '''a directory of segments with a JSON manifest
+
+    The manifest lists the live segments in order, each with the ids
+    deleted from it since it was written. Writers hold an flock on
+    LOCK; readers only reload the manifest when it changes. Merged
+    segments are removed as soon as the manifest no longer lists them:
+    a reader that finds one missing reads the manifest again, and the
+    maps it already holds stay readable until it lets go of them.
+    '''
+
+    def __init__(self, path, merge_factor=10, background_merge=True):
+        self.path = path
+        self.merge_factor = merge_factor
+        self.background_merge = background_merge
+        self.segments = []
+        self.deleted = {}
+        self.generation = None
+        self._state_lock = threading.Lock()
+        self._merging = threading.Lock()
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    # manifest
+
+    def _manifest_path(self):
+        return os.path.join(self.path, MANIFEST)
+
+    def _read_manifest(self):
+        try:
+            with open(self._manifest_path()) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {'generation': 0, 'next': 1, 'segments': []}
+
+    def _write_manifest(self, manifest):
+        manifest['generation'] += 1
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp, self._manifest_path())
+
+    def _lock(self):
+        return _FileLock(os.path.join(self.path, LOCK))
+
+    def refresh(self):
+        """open the segments of the current manifest
+        """
+        for attempt in range(REFRESH_ATTEMPTS):
+            manifest = self._read_manifest()
+            try:
+                self._open(manifest)
+                return
+            except (IOError, OSError) as e:
+                # a merge replaced the manifest and removed its segments
+                # after it was read, the next manifest lists the result
+                if e.errno != errno.ENOENT or \
+                        attempt == REFRESH_ATTEMPTS - 1:
+                    raise
+
+    def _open(self, manifest):
+        with self._state_lock:
+            if manifest['generation'] == self.generation:
+                return
+            opened = dict((s.name, s) for s in self.segments)
+            segments = []
+            deleted = {}
+            for entry in manifest['segments']:
+                name = entry['name']
+                segment = opened.pop(name, None)
+                if segment is None:
+                    segment = Segment(os.path.join(self.path, name))
+                segments.append(segment)
+                deleted[name] = frozenset(entry['deleted'])
+            # segments dropped here may still be read by a search of
+            # another thread, their maps are closed by the garbage
+            # collector once nothing holds them
+            self.segments = segments
+            self.deleted = deleted
+            self.generation = manifest['generation']
+
+    def _snapshot(self):
+        self.refresh()
+        with self._state_lock:
+            return self.segments, self.deleted
+
+    def _new_segment_name(self, manifest):
+        name = 'seg_%08d' % manifest['next']
+        manifest['next'] += 1
+        return name
+
+    # writes
+
+    def add_many(self, docs):
+        """index or replace documents, docs is a list of
+        (doc_id, [(text, weight), ...]), written as one segment
+        """
+        writer = SegmentWriter()
+        for doc_id, fields in docs:
+            writer.add(doc_id, fields)
+        with self._lock():
+            manifest = self._read_manifest()
+            self._delete_from(manifest, writer.docs)
+            if len(writer):
+                name = self._new_segment_name(manifest)
+                writer.write(os.path.join(self.path, name))
+                manifest['segments'].append({'name': name, 'deleted': []})
+            self._write_manifest(manifest)
+        self._maybe_merge()
+
+    def add(self, doc_id, fields):
+        self.add_many([(doc_id, fields)])
+
+    def delete(self, doc_id):
+        with self._lock():
+            manifest = self._read_manifest()
+            self._delete_from(manifest, [doc_id])
+            self._write_manifest(manifest)
+
+    def _delete_from(self, manifest, doc_ids):
+        self.refresh()
+        segments = dict((s.name, s) for s in self.segments)
+        for entry in manifest['segments']:
+            segment = segments.get(entry['name'])
+            if segment is None:
+                segment = Segment(os.path.join(self.path, entry['name']))
+            deleted = set(entry['deleted'])
+            for doc_id in doc_ids:
+                if _contains(segment.doc_ids, doc_id):
+                    deleted.add(doc_id)
+            entry['deleted'] = sorted(deleted)
+
+    def clear(self):
+        with self._lock():
+            manifest = self._read_manifest()
+            names = [entry['name'] for entry in manifest['segments']]
+            manifest['segments'] = []
+            self._write_manifest(manifest)
+        for name in names:
+            _remove(os.path.join(self.path, name))
+
+    # merges
+
+    def _maybe_merge(self):
+        self.refresh()
+        if len(self.segments) <= self.merge_factor:
+            return
+        if self.background_merge:
+            thread = threading.Thread(target=self.merge,
+                                      kwargs={'wait': False})
+            thread.daemon = True
+            thread.start()
+        else:
+            self.merge()
+
+    def merge(self, max_segments=None, wait=True):
+        """merge the smallest segments into one
+        with max_segments=1 the whole index becomes a single segment
+        """
+        if not self._merging.acquire(wait):
+            return
+        try:
+            self._merge(max_segments or self.merge_factor)
+            self.refresh()
+        except Exception as e:
+            logger.error('merging segments: %s' % str(e))
+        finally:
+            self._merging.release()
+
+    def _merge(self, max_segments):
+        with self._lock():
+            manifest = self._read_manifest()
+            self.refresh()
+            entries = manifest['segments']
+            if len(entries) <= max_segments and \
+                    not any(entry['deleted'] for entry in entries):
+                return
+            count = len(entries) - max_segments + 1
+            if count < 2:
+                count = len(entries)
+            by_size = sorted(
+                entries, key=lambda e: self._segment(e['name']).ndocs)
+            chosen = [entry['name'] for entry in by_size[:count]]
+            snapshot = dict((entry['name'], set(entry['deleted']))
+                            for entry in entries if entry['name'] in chosen)
+            name = self._new_segment_name(manifest)
+            self._write_manifest(manifest)
+        # the merged segment is written without holding the lock
+        writer = SegmentWriter()
+        merged_docs = set()
+        for source in chosen:
+            segment = self._segment(source)
+            deleted = snapshot[source]
+            for i in range(segment.ndocs):
+                doc_id = segment.doc_ids[i]
+                if doc_id not in deleted:
+                    writer.docs[doc_id] = segment.doc_lengths[i]
+                    merged_docs.add(doc_id)
+            for term in segment.iter_terms():
+                postings = segment.postings(term)
+                tfs = postings.tfs
+                starts = postings.starts
+                positions = postings.all_positions()
+                for j, doc_id in enumerate(postings.doc_ids):
+                    if doc_id not in deleted:
+                        writer.add_postings(
+                            term, doc_id, tfs[j],
+                            positions[starts[j]:starts[j + 1]])
+        if len(writer):
+            writer.write(os.path.join(self.path, name))
+        with self._lock():
+            manifest = self._read_manifest()
+            names = set(entry['name'] for entry in manifest['segments'])
+            if not names.issuperset(chosen):
+                # another process merged them first
+                _remove(os.path.join(self.path, name))
+                return
+            late_deletes = set()
+            position = None
+            kept = []
+            for i, entry in enumerate(manifest['segments']):
+                if entry['name'] in chosen:
+                    late_deletes.update(
+                        set(entry['deleted']) - snapshot[entry['name']])
+                    if position is None:
+                        position = i
+                else:
+                    kept.append(entry)
+            if len(writer):
+                merged = {
+                    'name': name,
+                    'deleted': sorted(late_deletes & merged_docs),
+                }
+                kept.insert(position or 0, merged)
+            manifest['segments'] = kept
+            self._write_manifest(manifest)
+        for source in chosen:
+            _remove(os.path.join(self.path, source))
+
+    def _segment(self, name):
+        for segment in self.segments:
+            if segment.name == name:
+                return segment
+        return Segment(os.path.join(self.path, name))
+
+    # queries
+
+    def __len__(self):
+        segments, deleted = self._snapshot()
+        return sum(s.ndocs - len(deleted[s.name]) for s in segments)
+
+    def search(self, query, k=10):
+        """top k (doc_id, score) pairs, best first
+        """
+        clauses = parse_query(query)
+        if not clauses:
+            return []
+        segments, deleted = self._snapshot()
+        ndocs = 0
+        total_length = 0
+        for segment in segments:
+            ndocs += segment.ndocs
+            total_length += segment.total_length
+        if not ndocs:
+            return []
+        avgdl = float(total_length) / ndocs
+        terms = set()
+        for clause in clauses:
+            for item in clause:
+                terms.update(item)
+        idf = {}
+        for term in terms:
+            df = sum(segment.df(term) for segment in segments)
+            idf[term] = math.log(1.0 + (ndocs - df + 0.5) / (df + 0.5))
+        scores = {}
+        for segment in segments:
+            cache = {}
+            for clause in clauses:
+                for doc_id, score in self._match(segment, clause, idf,
+                                                 avgdl, cache):
+                    if doc_id in deleted[segment.name]:
+                        continue
+                    if score > scores.get(doc_id, 0.0):
+                        scores[doc_id] = score
+        return heapq.nlargest(k, scores.items(),
+                              key=lambda item: (item[1], item[0]))
+
+    def _match(self, segment, clause, idf, avgdl, cache):
+        """(doc_id, score) of the documents matching every item
+        """
+        postings = {}
+        for item in clause:
+            for term in item:
+                if term not in cache:
+                    cache[term] = segment.postings(term)
+                if cache[term] is None:
+                    return []
+                postings[term] = cache[term]
+        # walk the rarest term, probe the others with a binary search
+        ordered = sorted(postings.values(), key=lambda p: p.df)
+        results = []
+        for doc_id in ordered[0].doc_ids:
+            indexes = {}
+            for term, term_postings in postings.items():
+                i = term_postings.index(doc_id)
+                if i < 0:
+                    break
+                indexes[term] = i
+            else:
+                phrases = [item for item in clause if len(item) > 1]
+                if all(self._phrase(postings, indexes, item)
+                       for item in phrases):
+                    norm = K1 * (1 - B + B * segment.doc_length(doc_id) /
+                                 avgdl)
+                    score = 0.0
+                    for term, i in indexes.items():
+                        tf = postings[term].tfs[i]
+                        score += idf[term] * tf * (K1 + 1) / (tf + norm)
+                    results.append((doc_id, score))
+        return results
+
+    def _phrase(self, postings, indexes, phrase):
+        candidates = set(postings[phrase[0]].positions(indexes[phrase[0]]))
+        for offset, term in enumerate(phrase[1:], 1):
+            positions = postings[term].positions(indexes[term])
+            candidates &= set(p - offset for p in positions)
+            if not candidates:
+                return False
+        return True
+
+
+class _FileLock(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+
+
+def _contains(values, value):
+    i = bisect.bisect_left(values, value)
+    return i < len(values) and values[i] == value
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+#
+# @name: mailqueue.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""Outbound email queue
+
+Requests only insert OutgoingEmail rows; the send_queued_mail worker
+sends them in batches over the pooled SMTP connection of its process,
+one send_messages call per batch.
+A worker leases each email by moving its next_try_time forward, so
+that several workers never send the same email and the email of a
+crashed worker is due again once its lease is over. Failures are
+retried with exponential backoff until EMAIL_MAX_ATTEMPTS, then the
+email is dead and kept for inspection.
+"""
+import socket
+import smtplib
+import logging
+from datetime import timedelta
+from django.core.mail import EmailMessage, get_connection, send_mail
+from django.db.models import F
+from django.utils import timezone
+from Aristotle.apps.qa.models import OutgoingEmail
+import Aristotle.apps.qa.settings as qa_settings
+
+logger = logging.getLogger(__name__)
+
+
+_connection = None
+
+
+def pooled_connection():
+    """the open email connection of the process, opened again when
+    the server has dropped it
+    """
+    global _connection
+    smtp = getattr(_connection, 'connection', None)
+    if smtp is not None:
+        try:
+            alive = smtp.noop()[0] == 250
+        except (smtplib.SMTPException, socket.error):
+            alive = False
+        if not alive:
+            close_connection()
+    if _connection is None:
+        connection = get_connection()
+        connection.open()
+        _connection = connection
+    return _connection
+
+
+def close_connection():
+    global _connection
+    if _connection is not None:
+        try:
+            _connection.close()
+        except (smtplib.SMTPException, socket.error):
+            pass
+        _connection = None
+
+
+def send_messages(messages):
+    """send EmailMessages over the pooled connection
+    the connection is dropped after an error, its state is unknown
+    """
+    try:
+        return pooled_connection().send_messages(messages)
+    except Exception:
+        close_connection()
+        raise
+
+
+class _Taken(object):
+    '''messages handed to a backend, counting those it has taken: when
+    send_messages raises, the last one taken is the one that failed
+    '''
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.count = 0
+
+    def __iter__(self):
+        for message in self.messages:
+            self.count += 1
+            yield message
+
+
+def send_batch(messages):
+    """send a list of EmailMessages in one send_messages call, the
+    pooled connection is checked once; after a failure the messages
+    that follow are sent in another call
+    return {index of a failed message: error}
+    """
+    failed = {}
+    start = 0
+    while start < len(messages):
+        taken = _Taken(messages[start:])
+        try:
+            send_messages(taken)
+            break
+        except Exception as e:
+            if not taken.count:
+                # no connection, none of them was tried
+                for i in range(start, len(messages)):
+                    failed[i] = e
+                break
+            failed[start + taken.count - 1] = e
+            start += taken.count
+    return failed
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    """send an email from the worker, or right away without the queue
+    """
+    if not qa_settings.EMAIL_QUEUE:
+        return send_mail(subject, message, from_email, recipient_list)
+    OutgoingEmail.objects.create(subject=subject, message=message,
+                                 from_email=from_email,
+                                 recipients='\n'.join(recipient_list))
+    return 1
+
+
+def retry_delay(attempts):
+    """seconds to wait after a number of failed attempts
+    """
+    return min(qa_settings.EMAIL_RETRY_DELAY * 2 ** (attempts - 1),
+               qa_settings.EMAIL_RETRY_MAX_DELAY)
+
+
+def _claim(batch_size):
+    """lease up to batch_size due emails, oldest first
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=qa_settings.EMAIL_LEASE)
+    due = OutgoingEmail.objects.filter(
+        status='queued', next_try_time__lte=now).order_by(
+        'next_try_time', 'id')
+    claimed = []
+    for email in due[:batch_size]:
+        # taken by another worker if its next_try_time has moved
+        if OutgoingEmail.objects.filter(
+                id=email.id, status='queued',
+                next_try_time=email.next_try_time).update(
+                next_try_time=lease):
+            claimed.append(email)
+    return claimed
+
+
+def _failed(email, error):
+    attempts = email.attempts + 1
+    fields = {'attempts': attempts, 'last_error': error}
+    if attempts >= qa_settings.EMAIL_MAX_ATTEMPTS:
+        fields['status'] = 'dead'
+        logger.error('email %d is dead: %s' % (email.id, error))
+    else:
+        fields['next_try_time'] = timezone.now() + timedelta(
+            seconds=retry_delay(attempts))
+    OutgoingEmail.objects.filter(id=email.id).update(**fields)
+
+
+def deliver_mail(batch_size=None):
+    """send one batch of due emails over a single connection
+    return the numbers of sent and failed emails
+    """
+    emails = _claim(batch_size or qa_settings.EMAIL_BATCH_SIZE)
+    if not emails:
+        return 0, 0
+    failed = send_batch([EmailMessage(
+        email.subject, email.message, email.from_email,
+        email.recipients.split('\n')) for email in emails])
+    sent = []
+    for i, email in enumerate(emails):
+        if i in failed:
+            # waits for the next try
+            logger.error('email %d: %s' % (email.id, str(failed[i])))
+            _failed(email, str(failed[i]))
+        else:
+            sent.append(email.id)
+    OutgoingEmail.objects.filter(id__in=sent).update(
+        status='sent', attempts=F('attempts') + 1, sent_time=timezone.now())
+    return len(sent), len(failed)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+#
+# @name: add_columns.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+from django.core.management import call_command
+from django.core.management.base import NoArgsCommand
+from django.db import connection, transaction
+from Aristotle.apps.qa.models import Question, Answer
+
+# columns added to tables that an older syncdb made, filled by
+# rebuild_counters once they are there, hot scores included
+COLUMNS = (
+    (Question, 'votes_count'),
+    (Question, 'answers_count'),
+    (Question, 'hits_count'),
+    (Answer, 'upvotes_count'),
+    (Answer, 'downvotes_count'),
+    (Question, 'hot_score'),
+)
+
+
+def _columns(model):
+    with connection.cursor() as cursor:
+        return [column[0] for column in
+                connection.introspection.get_table_description(
+                    cursor, model._meta.db_table)]
+
+
+def _missing():
+    """(model, field) of the COLUMNS the tables lack
+    """
+    missing = []
+    for model, name in COLUMNS:
+        field = model._meta.get_field(name)
+        if field.column not in _columns(model):
+            missing.append((model, field))
+    return missing
+
+
+class Command(NoArgsCommand):
+    help = ('Add the denormalized counter and hot score columns that '
+            'tables made by an older syncdb lack, then rebuild them')
+
+    def handle_noargs(self, **options):
+        missing = _missing()
+        if not missing:
+            self.stdout.write('0 columns added')
+            return
+        with transaction.atomic():
+            with connection.schema_editor() as editor:
+                for model, field in missing:
+                    editor.add_field(model, field)
+                    self.stdout.write('%s.%s' % (model._meta.db_table,
+                                                 field.column))
+        self.stdout.write('%d columns added' % len(missing))
+        # the new columns are all 0 until counted, rebuild_counters
+        # refreshes the hot scores too
+        call_command('rebuild_counters', stdout=self.stdout)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+#
+# @name: add_indexes.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+from django.apps import apps
+from django.core.management.base import NoArgsCommand
+from django.db import connection, transaction, IntegrityError
+
+
+def _sqlite_constraints(cursor, table):
+    # the introspection of Django 1.7 expects the three columns that
+    # PRAGMA index_list had before SQLite 3.8.9
+    quote = connection.ops.quote_name
+    cursor.execute('PRAGMA index_list(%s)' % quote(table))
+    constraints = []
+    for row in cursor.fetchall():
+        cursor.execute('PRAGMA index_info(%s)' % quote(row[1]))
+        columns = [info[2] for info in sorted(cursor.fetchall())]
+        constraints.append({'name': row[1], 'columns': columns,
+                            'unique': bool(row[2]), 'index': True})
+    return constraints
+
+
+def _constraints(model):
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            return _sqlite_constraints(cursor, table)
+        return connection.introspection.get_constraints(
+            cursor, table).values()
+
+
+def _exists(model, fields, constraints, unique):
+    columns = [model._meta.get_field(name).column for name in fields]
+    for constraint in constraints:
+        if constraint['columns'] == columns and (
+                constraint['unique'] or
+                not unique and constraint['index']):
+            return True
+    return False
+
+
+class Command(NoArgsCommand):
+    help = ('Create the index_together and unique_together indexes of '
+            'the qa models that tables made by an older syncdb lack')
+
+    def handle_noargs(self, **options):
+        created = 0
+        for model in apps.get_app_config('qa').get_models():
+            constraints = _constraints(model)
+            for unique, option in ((False, 'index_together'),
+                                   (True, 'unique_together')):
+                declared = [tuple(fields) for fields in
+                            getattr(model._meta, option)]
+                present = [fields for fields in declared
+                           if _exists(model, fields, constraints, unique)]
+                missing = [fields for fields in declared
+                           if fields not in present]
+                if not missing:
+                    continue
+                try:
+                    with transaction.atomic():
+                        with connection.schema_editor() as editor:
+                            getattr(editor, 'alter_' + option)(
+                                model, present, declared)
+                except IntegrityError as e:
+                    # rows written before the constraint repeat a key
+                    self.stderr.write('%s %s: %s' % (
+                        model.__name__, missing, str(e)))
+                    continue
+                for fields in missing:
+                    self.stdout.write('%s(%s)' % (model._meta.db_table,
+                                                  ', '.join(fields)))
+                created += len(missing)
+        self.stdout.write('%d indexes created' % created)
@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+#
+# @name: collect_media.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+from django.core.management.base import NoArgsCommand
+from Aristotle.apps.qa.storage import avatar_storage
+from Aristotle.apps.qa.media import collect_media
+from Aristotle.apps.qa.avatars import forget_thumbnails
+
+
+class Command(NoArgsCommand):
+    help = 'Remove the uploaded files nothing refers to any more'
+
+    def handle_noargs(self, **options):
+        removed = collect_media(avatar_storage)
+        for name in removed:
+            forget_thumbnails(avatar_storage, name)
+        self.stdout.write('%d files removed' % len(removed))
@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+#
+# @name: compact_hits.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from Aristotle.apps.qa.models import QuestionHit
+from Aristotle.apps.qa.hits import compact_hits
+
+
+class Command(NoArgsCommand):
+    help = 'Move QuestionHit rows into per-question HyperLogLog sketches'
+
+    def handle_noargs(self, **options):
+        question_ids = QuestionHit.objects.order_by(
+            'question').values_list('question', flat=True).distinct()
+        questions = 0
+        rows = 0
+        for question_id in list(question_ids):
+            with transaction.atomic():
+                rows += compact_hits(question_id)
+            questions += 1
+        self.stdout.write('%d hits of %d questions compacted' % (
+            rows, questions))
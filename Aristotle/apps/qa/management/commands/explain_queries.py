@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+#
+# @name: explain_queries.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+from optparse import make_option
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from Aristotle.apps.qa.models import Question, Answer, Tag
+from Aristotle.apps.qa.queryplans import view_queries, explain, full_scans
+from Aristotle.apps.qa.queryplans import seed
+
+
+class Command(BaseCommand):
+    help = 'Print the query plans of the views and flag full table scans'
+    option_list = BaseCommand.option_list + (
+        make_option('--seed', type='int', default=0,
+                    help='Add that many questions with their answers, '
+                         'comments and votes first, rolled back at the '
+                         'end; done anyway on an empty database'),
+        make_option('--strict', action='store_true', default=False,
+                    help='Fail when a plan has a full scan'),
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = self._rows()
+            if options['seed'] or rows is None:
+                rows = seed(options['seed'] or 100)
+            scans = self._report(view_queries(*rows))
+            transaction.set_rollback(True)
+        self.stdout.write('%d queries with full scans' % scans)
+        if scans and options['strict']:
+            raise CommandError('full scans in %d queries' % scans)
+
+    def _rows(self):
+        rows = (User.objects.first(), Question.objects.first(),
+                Answer.objects.first(), Tag.objects.first())
+        return None if None in rows else rows
+
+    def _report(self, queries):
+        scans = 0
+        for name, queryset in queries:
+            plan = explain(queryset)
+            scanned = full_scans(plan)
+            self.stdout.write('%s%s' % (name,
+                                        ': FULL SCAN' if scanned else ''))
+            for step in plan:
+                self.stdout.write('    ' + step)
+            scans += bool(scanned)
+        return scans
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+#
+# @name: migrate_mails.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from Aristotle.apps.qa.models import Mail, MailMessage, MailboxEntry
+
+# old rows moved per transaction
+BATCH_SIZE = 500
+
+
+def _runs(mails):
+    """the old rows of each sent mail: sending wrote an outbox and an
+    inbox copy per receiver in a row, so a mail is a run of rows with
+    the same sender, subject and content, until a box repeats
+    """
+    run = []
+    boxes = set()
+    for mail in mails:
+        key = (mail.sender_id, mail.subject, mail.content)
+        box = (mail.user_id, mail.box)
+        if run and (key != (run[0].sender_id, run[0].subject,
+                            run[0].content) or
+                    box in boxes and mail.box != 'outbox'):
+            yield run
+            run = []
+            boxes = set()
+        run.append(mail)
+        boxes.add(box)
+    if run:
+        yield run
+
+
+def _move(run):
+    first = run[0]
+    message = MailMessage.objects.create(
+        subject=first.subject, content=first.content,
+        sender_id=first.sender_id, created_time=first.created_time)
+    entries = {}
+    for mail in run:
+        # the sender had one outbox copy per receiver
+        entries.setdefault((mail.user_id, mail.box), MailboxEntry(
+            message=message, user_id=mail.user_id, box=mail.box,
+            has_read=mail.has_read, created_time=mail.created_time))
+    MailboxEntry.objects.bulk_create(entries.values())
+    Mail.objects.filter(id__in=[mail.id for mail in run]).delete()
+
+
+class Command(NoArgsCommand):
+    help = 'Move Mail copies into single MailMessage rows and mailboxes'
+
+    def handle_noargs(self, **options):
+        messages = 0
+        rows = 0
+        last_id = 0
+        # the last run of a batch can go on in the next one
+        pending = []
+        while True:
+            mails = list(Mail.objects.filter(id__gt=last_id).order_by(
+                'id')[:BATCH_SIZE])
+            if not mails:
+                break
+            last_id = mails[-1].id
+            runs = list(_runs(pending + mails))
+            pending = runs.pop()
+            rows += self._move(runs)
+            messages += len(runs)
+        if pending:
+            rows += self._move([pending])
+            messages += 1
+        self.stdout.write('%d mails moved into %d messages' % (
+            rows, messages))
+
+    def _move(self, runs):
+        with transaction.atomic():
+            for run in runs:
+                _move(run)
+        return sum(len(run) for run in runs)
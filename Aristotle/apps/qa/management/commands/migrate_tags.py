@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+#
+# @name: migrate_tags.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+from django.core.management.base import NoArgsCommand
+from django.db import connection, transaction
+from Aristotle.apps.qa.models import Tag
+
+# old rows read and links written at a time
+BATCH_SIZE = 500
+
+
+def _columns(table):
+    with connection.cursor() as cursor:
+        return [column[0] for column in
+                connection.introspection.get_table_description(cursor, table)]
+
+
+def _old_tags():
+    """{name: set of question ids} of the old table, one row per tag
+    and question
+    """
+    tags = {}
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT %s, %s FROM %s' % (
+            connection.ops.quote_name('name'),
+            connection.ops.quote_name('question_id'),
+            connection.ops.quote_name(Tag._meta.db_table)))
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            for name, question_id in rows:
+                tags.setdefault(name, set()).add(question_id)
+    return tags
+
+
+def _rebuild_tables():
+    """drop the old tag table, then create the tag and link tables
+    """
+    through = Tag.questions.through._meta.db_table
+    tables = connection.introspection.table_names()
+    with connection.schema_editor() as editor:
+        # the link table is there, empty, if syncdb ran after the upgrade
+        for table in (through, Tag._meta.db_table):
+            if table in tables:
+                editor.execute(editor.sql_delete_table % {
+                    'table': editor.quote_name(table)})
+        editor.create_model(Tag)
+
+
+def _add_tags(tags):
+    Tag.objects.bulk_create([
+        Tag(name=name, question_count=len(question_ids))
+        for name, question_ids in tags.items()], batch_size=BATCH_SIZE)
+    ids = dict(Tag.objects.values_list('name', 'id'))
+    Link = Tag.questions.through
+    links = [Link(tag_id=ids[name], question_id=question_id)
+             for name, question_ids in sorted(tags.items())
+             for question_id in sorted(question_ids)]
+    Link.objects.bulk_create(links, batch_size=BATCH_SIZE)
+    return len(links)
+
+
+class Command(NoArgsCommand):
+    help = 'Move the tags of questions into unique tags and links'
+
+    def handle_noargs(self, **options):
+        if 'question_id' not in _columns(Tag._meta.db_table):
+            self.stdout.write('Tags are already migrated')
+            return
+        with transaction.atomic():
+            tags = _old_tags()
+            _rebuild_tables()
+            links = _add_tags(tags)
+        self.stdout.write('%d tags and %d links to questions migrated' % (
+            len(tags), links))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+#
+# @name: rebuild_counters.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from django.db.models import Count
+from Aristotle.apps.qa.models import Question, Answer
+from Aristotle.apps.qa.models import QuestionVote, QuestionHit, AnswerVote
+from Aristotle.apps.qa.models import Tag
+from Aristotle.apps.qa.models import Notification, NotificationCounter
+from Aristotle.apps.qa.inbox import unread_counts
+from Aristotle.apps.qa.hot import refresh_hot_scores
+from Aristotle.apps.qa.hits import viewers_counts
+
+
+def _group_count(queryset, field):
+    """{field value: number of rows} in a single GROUP BY query
+    """
+    rows = queryset.values(field).annotate(count=Count('id'))
+    return dict((row[field], row['count']) for row in rows)
+
+
+class Command(NoArgsCommand):
+    help = ('Rebuild the denormalized counters of questions, answers, '
+            'tags and unread notifications')
+
+    def handle_noargs(self, **options):
+        with transaction.atomic():
+            questions = self._rebuild_questions()
+            answers = self._rebuild_answers()
+            tags = self._rebuild_tags()
+            users = self._rebuild_notifications()
+            refresh_hot_scores()
+        self.stdout.write(
+            '%d questions, %d answers, %d tags and %d unread counts '
+            'updated' % (questions, answers, tags, users))
+
+    def _rebuild_questions(self):
+        votes = _group_count(QuestionVote.objects, 'question')
+        answers = _group_count(Answer.objects, 'question')
+        hits = _group_count(QuestionHit.objects, 'question')
+        for qid, count in viewers_counts().items():
+            hits[qid] = hits.get(qid, 0) + count
+        updated = 0
+        fields = ('id', 'votes_count', 'answers_count', 'hits_count')
+        for row in Question.objects.values_list(*fields).iterator():
+            qid = row[0]
+            counters = (votes.get(qid, 0), answers.get(qid, 0),
+                        hits.get(qid, 0))
+            if counters != row[1:]:
+                Question.objects.filter(id=qid).update(
+                    votes_count=counters[0], answers_count=counters[1],
+                    hits_count=counters[2])
+                updated += 1
+        return updated
+
+    def _rebuild_answers(self):
+        upvotes = _group_count(
+            AnswerVote.objects.filter(vote_type=True), 'answer')
+        downvotes = _group_count(
+            AnswerVote.objects.filter(vote_type=False), 'answer')
+        updated = 0
+        fields = ('id', 'upvotes_count', 'downvotes_count')
+        for row in Answer.objects.values_list(*fields).iterator():
+            aid = row[0]
+            counters = (upvotes.get(aid, 0), downvotes.get(aid, 0))
+            if counters != row[1:]:
+                Answer.objects.filter(id=aid).update(
+                    upvotes_count=counters[0], downvotes_count=counters[1])
+                updated += 1
+        return updated
+
+    def _rebuild_tags(self):
+        counts = _group_count(Tag.questions.through.objects, 'tag')
+        updated = 0
+        for tid, count in Tag.objects.values_list('id', 'question_count'):
+            if counts.get(tid, 0) != count:
+                Tag.objects.filter(id=tid).update(
+                    question_count=counts.get(tid, 0))
+                updated += 1
+        return updated
+
+    def _rebuild_notifications(self):
+        counts = unread_counts(Notification.objects)
+        updated = 0
+        for uid, count in NotificationCounter.objects.values_list(
+                'user_id', 'unread'):
+            unread = counts.pop(uid, 0)
+            if unread != count:
+                NotificationCounter.objects.filter(user_id=uid).update(
+                    unread=unread)
+                updated += 1
+        # users notified before they had a counter
+        NotificationCounter.objects.bulk_create([
+            NotificationCounter(user_id=uid, unread=count)
+            for uid, count in counts.items()])
+        return updated + len(counts)
@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+#
+# @name: rebuild_related.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from Aristotle.apps.qa.related import rebuild_related
+
+
+class Command(NoArgsCommand):
+    help = 'Recompute the term vectors and related lists of every question'
+
+    def handle_noargs(self, **options):
+        with transaction.atomic():
+            count = rebuild_related()
+        self.stdout.write('%d questions updated' % count)
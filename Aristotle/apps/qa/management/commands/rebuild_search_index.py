@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+#
+# @name: rebuild_search_index.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from Aristotle.apps.qa.search import get_backend
+
+
+class Command(NoArgsCommand):
+    help = 'Create the search index and index every question'
+
+    def handle_noargs(self, **options):
+        backend = get_backend()
+        with transaction.atomic():
+            count = backend.rebuild()
+        self.stdout.write('%d questions indexed by %s' % (
+            count, backend.__class__.__name__))
@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+#
+# @name: refresh_hot_scores.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from Aristotle.apps.qa.hot import refresh_hot_scores
+
+
+class Command(NoArgsCommand):
+    help = 'Recompute the hot score of every question'
+
+    def handle_noargs(self, **options):
+        with transaction.atomic():
+            count = refresh_hot_scores()
+        self.stdout.write('%d questions updated' % count)
@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+#
+# @name: send_digests.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+from datetime import timedelta
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from Aristotle.apps.qa.mailqueue import close_connection
+from Aristotle.apps.qa.notification import send_digests
+
+
+class Command(BaseCommand):
+    help = 'Email users the answers, comments and mails they got lately'
+    option_list = BaseCommand.option_list + (
+        make_option('--hours', type='int', default=24,
+                    help='Activity of the last hours, 24 by default'),
+    )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['hours'])
+        try:
+            digests = send_digests(since)
+        finally:
+            close_connection()
+        self.stdout.write('%d digests sent' % digests)
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+#
+# @name: send_queued_mail.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+import time
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from Aristotle.apps.qa.mailqueue import deliver_mail, close_connection
+import Aristotle.apps.qa.settings as qa_settings
+
+
+class Command(BaseCommand):
+    help = 'Send the queued emails, or keep sending them with --loop'
+    option_list = BaseCommand.option_list + (
+        make_option('--loop', action='store_true', default=False,
+                    help='Keep polling the queue'),
+    )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                sent, failed = deliver_mail()
+                if sent or failed:
+                    self.stdout.write('%d emails sent, %d failed' % (
+                        sent, failed))
+                if not options['loop']:
+                    break
+                # a full batch means more are probably due
+                if sent + failed < qa_settings.EMAIL_BATCH_SIZE:
+                    time.sleep(qa_settings.EMAIL_QUEUE_INTERVAL)
+        finally:
+            close_connection()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+# @name: media.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""Reference counts of stored files
+
+Content-addressed files are shared, so a file is only removed once
+nothing refers to it. acquire and release count the references of a
+storage name in MediaFile; collect_media removes the files that have
+had none for MEDIA_GRACE seconds, which leaves time to an upload that
+found the file before it acquired it. A file being removed has -1
+references; a removal that never finished is given up after
+MEDIA_REMOVAL_TIMEOUT seconds.
+"""
+import time
+import logging
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from Aristotle.apps.qa.models import MediaFile
+import Aristotle.apps.qa.settings as qa_settings
+
+logger = logging.getLogger(__name__)
+
+
+class MediaBusy(Exception):
+    pass
+
+
+def acquire(name):
+    """count a new reference to a stored file
+    raise MediaBusy while the file is being removed
+    """
+    for attempt in range(qa_settings.MEDIA_ACQUIRE_ATTEMPTS):
+        if MediaFile.objects.filter(name=name, refs__gte=0).update(
+                refs=F('refs') + 1, updated_time=timezone.now()):
+            return
+        try:
+            with transaction.atomic():
+                MediaFile.objects.create(name=name, refs=1)
+            return
+        except IntegrityError:
+            # created meanwhile, or not removed yet
+            time.sleep(0.05 * 2 ** attempt)
+    raise MediaBusy('The file is being removed, please try again')
+
+
+def release(name):
+    """drop a reference to a stored file, files stored before
+    reference counting are never counted
+    """
+    MediaFile.objects.filter(name=name, refs__gt=0).update(
+        refs=F('refs') - 1, updated_time=timezone.now())
+
+
+def collect_media(storage, grace=None):
+    """remove the files without references
+    return their names
+    """
+    if grace is None:
+        grace = qa_settings.MEDIA_GRACE
+    now = timezone.now()
+    before = now - timedelta(seconds=grace)
+    removed = []
+    _give_up_removals(storage, now - timedelta(
+        seconds=qa_settings.MEDIA_REMOVAL_TIMEOUT))
+    orphans = MediaFile.objects.filter(refs=0, updated_time__lt=before)
+    for media in orphans.iterator():
+        # taken again if its references have changed
+        if not MediaFile.objects.filter(
+                id=media.id, refs=0, updated_time=media.updated_time).update(
+                refs=-1, updated_time=timezone.now()):
+            continue
+        try:
+            storage.delete(media.name)
+        except Exception as e:
+            logger.error('media %s: %s' % (media.name, str(e)))
+            MediaFile.objects.filter(id=media.id).update(refs=0)
+            continue
+        MediaFile.objects.filter(id=media.id).delete()
+        removed.append(media.name)
+    return removed
+
+
+def _give_up_removals(storage, before):
+    """count the files of removals started before a time as orphans
+    again, or forget them if they are gone
+    """
+    stale = MediaFile.objects.filter(refs=-1, updated_time__lt=before)
+    for media in stale.iterator():
+        if storage.exists(media.name):
+            MediaFile.objects.filter(id=media.id, refs=-1).update(
+                refs=0, updated_time=timezone.now())
+        else:
+            MediaFile.objects.filter(id=media.id, refs=-1).delete()
@@ -4,22 +4,20 @@
 # @create:
 # @update: 12 October 2014 (Sunday)
 # @author:
+import os
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from PIL import Image
 from settings import DEFAULT_AVATAR, AVATAR_PATH
-from utils import get_utc_timestamp, format_time_path
 from utils import get_utc_time
+from storage import avatar_storage
 
 
 def upload_to_handler(instance, filename):
-    tmp = filename.split('.')
-    if tmp and len(tmp) == 2:
-        path = format_time_path(AVATAR_PATH)
-        # add random strings
-        path += str(get_utc_timestamp()) + '.' + tmp[1]
-        return path
+    # the storage names the file by its content
+    extension = os.path.splitext(filename)[1].lower()
+    if extension:
+        return AVATAR_PATH + 'avatar' + extension
     return DEFAULT_AVATAR
 
 
@@ -38,37 +36,12 @@ class Member(models.Model):
     company = models.CharField(blank=True, default='', max_length=100)
     website = models.URLField(blank=True, default='')
     avatar = models.ImageField(blank=True, default=DEFAULT_AVATAR,
-                               upload_to=upload_to_handler)
+                               upload_to=upload_to_handler,
+                               storage=avatar_storage)
     interests = models.CharField(blank=True, default='', max_length=255)
     bio = models.TextField(blank=True)
     last_login_ip = models.CharField(blank=True, default='', max_length=40)
 
-    def save_avatar(self, *args, **kwargs):
-        """rewrite model's save method
-        """
-        if not self.id:
-            return self.update()
-        self.update()
-        idx = self.avatar.path.find(AVATAR_PATH)
-        prefix = self.avatar.path[0:idx]
-        filename = self.avatar.path[idx + len(AVATAR_PATH):]
-        avatar = Image.open(self.avatar).convert('RGB')
-        size_list = {
-            'large': (256, 256),
-            'medium': (128, 128),
-            'small': (32, 32),
-        }
-
-        for key, size in size_list.items():
-            copy = avatar.copy()
-            copy.thumbnail(size, Image.ANTIALIAS)
-            new_path = ''.join([prefix, AVATAR_PATH, key, '/', filename])
-            copy.save(new_path)
-            copy.close()
-        avatar.close()
-        self.avatar.name = filename
-        self.update()
-
     def update(self, *args, **kwargs):
         return super(Member, self).save(*args, **kwargs)
 
@@ -92,6 +65,8 @@ class Score(models.Model):
 
 
 class Mail(models.Model):
+    # one full copy per mailbox, replaced by MailMessage and
+    # MailboxEntry; the migrate_mails command moves the rows over
     MAILBOX_CHOICES = (
         ('inbox', 'inbox'), ('outbox', 'outbox'), ('trash', 'trash'),
         ('draft', 'draft'),
@@ -104,7 +79,55 @@ class Mail(models.Model):
     has_read = models.BooleanField(default=False)
     box = models.CharField(choices=MAILBOX_CHOICES, max_length=50)
     # reply_to = models.ForeignKey('self')
-    created_time = models.DateTimeField(default=timezone.now())
+    created_time = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        index_together = (('user', 'box', 'created_time'),)
+
+
+class MailMessage(models.Model):
+    # a mail as written, stored once for all of its receivers
+    subject = models.CharField(max_length=255)
+    content = models.TextField()
+    sender = models.ForeignKey(User, related_name='+')
+    created_time = models.DateTimeField(default=timezone.now)
+
+
+class MailboxEntry(models.Model):
+    # a mail in the box of a user
+    message = models.ForeignKey(MailMessage)
+    user = models.ForeignKey(User)
+    box = models.CharField(choices=Mail.MAILBOX_CHOICES, max_length=50)
+    has_read = models.BooleanField(default=False)
+    created_time = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # a box, newest first
+        index_together = (('user', 'box', 'created_time'),)
+
+
+class OutgoingEmail(models.Model):
+    # emails waiting for the mail worker, see mailqueue
+    STATUS_CHOICES = (
+        ('queued', 'queued'), ('sent', 'sent'), ('dead', 'dead'),
+    )
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    from_email = models.CharField(max_length=255)
+    # one address per line
+    recipients = models.TextField()
+    status = models.CharField(choices=STATUS_CHOICES, default='queued',
+                              max_length=10)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    # due time of the next attempt, or the end of the lease of a worker
+    # sending it
+    next_try_time = models.DateTimeField(default=timezone.now)
+    created_time = models.DateTimeField(default=timezone.now)
+    sent_time = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        index_together = (('status', 'next_try_time'),)
 
 
 class Activation(models.Model):
@@ -137,44 +160,86 @@ class Question(models.Model):
     content = models.TextField()
     author = models.ForeignKey(User)
     solved = models.BooleanField(default=False)
-    created_time = models.DateTimeField(default=timezone.now())
+    created_time = models.DateTimeField(default=timezone.now)
     updated_time = models.DateTimeField(blank=True, null=True)
-
-    def _get_votes_count(self):
-        return self.questionvote_set.all().count()
-
-    def _get_answers_count(self):
-        return self.answer_set.all().count()
-
-    def _get_hits_count(self):
-        return self.questionhit_set.all().count()
+    # denormalized counters, kept in sync by the views
+    # and rebuilt by the rebuild_counters command
+    votes_count = models.IntegerField(default=0)
+    answers_count = models.IntegerField(default=0)
+    hits_count = models.IntegerField(default=0)
+    # ranking of the hot list, see hot.py
+    hot_score = models.FloatField(default=0, db_index=True)
+
+    class Meta:
+        # the sort modes of the question lists and of a profile
+        index_together = (
+            ('created_time', 'id'),
+            ('votes_count', 'created_time'),
+            ('solved', 'answers_count', 'created_time'),
+            ('answers_count', 'votes_count', 'created_time'),
+            ('hits_count', 'created_time'),
+            ('author', 'created_time'),
+        )
 
     def get_tags(self):
         return self.tag_set.all()
 
-    votes_count = property(_get_votes_count)
-    answers_count = property(_get_answers_count)
-    hits_count = property(_get_hits_count)
+
+class QuestionVector(models.Model):
+    # terms of a question for related lookups, a packed sparse array
+    # of term ids and weighted counts, and the related questions found
+    # when it was last computed
+    question = models.OneToOneField(Question, primary_key=True)
+    vector = models.BinaryField()
+    related = models.CommaSeparatedIntegerField(max_length=255, blank=True)
+    updated_time = models.DateTimeField(auto_now=True, db_index=True)
 
 
 class QuestionHit(models.Model):
     question = models.ForeignKey(Question)
     ip = models.CharField(max_length=40)
     session = models.CharField(max_length=120)
-    created_time = models.DateTimeField(default=timezone.now())
+    created_time = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # visitors already counted, by session or by ip without one
+        index_together = (('question', 'session'), ('question', 'ip'))
+
+
+class QuestionViewers(models.Model):
+    # HyperLogLog sketch of the visitors of a question, used instead
+    # of QuestionHit rows when HIT_STORAGE is 'sketch'
+    question = models.OneToOneField(Question, primary_key=True)
+    sketch = models.BinaryField()
+
+
+class QuestionDailyViews(models.Model):
+    # views of a question on a day and a sketch of their visitors,
+    # kept when HIT_DAILY_ROLLUP is on
+    question = models.ForeignKey(Question)
+    day = models.DateField()
+    views = models.IntegerField(default=0)
+    sketch = models.BinaryField()
+
+    class Meta:
+        unique_together = ('question', 'day')
 
 
 class QuestionAppend(models.Model):
     question = models.ForeignKey(Question)
     content = models.TextField()
-    created_time = models.DateTimeField(default=timezone.now())
+    created_time = models.DateTimeField(default=timezone.now)
 
 
 class QuestionComment(models.Model):
     question = models.ForeignKey(Question)
     user = models.ForeignKey(User)
     content = models.TextField()
-    created_time = models.DateTimeField(default=timezone.now())
+    created_time = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # the comments of a question in order
+        index_together = (('question', 'created_time'),)
 
 
 class QuestionVote(models.Model):
@@ -182,7 +247,11 @@ class QuestionVote(models.Model):
     user = models.ForeignKey(User)
     vote_type = models.BooleanField(default=False)
     reason = models.CharField(max_length=255)
-    created_time = models.DateTimeField(default=timezone.now())
+    created_time = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # one vote of a user on a question
+        unique_together = ('question', 'user')
 
 
 class Answer(models.Model):
@@ -192,15 +261,20 @@ class Answer(models.Model):
     accepted = models.BooleanField(default=False)
     accepted_time = models.DateTimeField(blank=True, null=True)
     updated_time = models.DateTimeField(blank=True, null=True)
-    created_time = models.DateTimeField(default=timezone.now())
+    created_time = models.DateTimeField(default=timezone.now)
+    # denormalized counters, see Question
+    upvotes_count = models.IntegerField(default=0)
+    downvotes_count = models.IntegerField(default=0)
+
+    class Meta:
+        # the answers of a profile
+        index_together = (('author', 'created_time'),)
 
     def _get_votes_count(self):
-        return self.answervote_set.all().count()
+        return self.upvotes_count + self.downvotes_count
 
     def _get_abs_votes_count(self):
-        ups = self.answervote_set.filter(vote_type=True).count()
-        downs = self.votes_count - ups
-        return ups - downs
+        return self.upvotes_count - self.downvotes_count
 
     votes_count = property(_get_votes_count)
     abs_votes_count = property(_get_abs_votes_count)
@@ -209,14 +283,17 @@ class Answer(models.Model):
 class AnswerAppend(models.Model):
     answer = models.ForeignKey(Answer)
     content = models.TextField()
-    created_time = models.DateTimeField(default=timezone.now())
+    created_time = models.DateTimeField(default=timezone.now)
 
 
 class AnswerComment(models.Model):
     answer = models.ForeignKey(Answer)
     user = models.ForeignKey(User)
     content = models.TextField()
-    created_time = models.DateTimeField(default=timezone.now())
+    created_time = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        index_together = (('answer', 'created_time'),)
 
 
 class AnswerVote(models.Model):
@@ -224,9 +301,78 @@ class AnswerVote(models.Model):
     user = models.ForeignKey(User)
     vote_type = models.BooleanField(default=False)
     reason = models.CharField(max_length=255)
-    created_time = models.DateTimeField(default=timezone.now())
+    created_time = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('answer', 'user')
+
+
+class TagManager(models.Manager):
+
+    def tag_question(self, question, names):
+        """attach tags to a question, creating missing ones
+        """
+        if not names:
+            return
+        tags = [self.get_or_create(name=name)[0] for name in names]
+        question.tag_set.add(*tags)
+        self.filter(id__in=[tag.id for tag in tags]).update(
+            question_count=models.F('question_count') + 1)
+
+    def untag_question(self, question, names=None):
+        """detach tags from a question, all of them if names is None
+        """
+        tags = question.tag_set.all()
+        if names is not None:
+            tags = tags.filter(name__in=names)
+        tags = list(tags)
+        if not tags:
+            return
+        question.tag_set.remove(*tags)
+        self.filter(id__in=[tag.id for tag in tags]).update(
+            question_count=models.F('question_count') - 1)
 
 
 class Tag(models.Model):
-    name = models.CharField(null=False, max_length=40)
+    name = models.CharField(unique=True, max_length=40)
+    questions = models.ManyToManyField(Question)
+    # denormalized number of tagged questions
+    question_count = models.IntegerField(default=0, db_index=True)
+
+    objects = TagManager()
+
+
+class Notification(models.Model):
+    # something that happened to a question or answer of a user,
+    # written by inbox.notify
+    KIND_CHOICES = (
+        ('answer', 'answer'), ('question_comment', 'question_comment'),
+        ('answer_comment', 'answer_comment'), ('accept', 'accept'),
+    )
+    user = models.ForeignKey(User)
+    actor = models.ForeignKey(User, related_name='+')
+    kind = models.CharField(choices=KIND_CHOICES, max_length=20)
     question = models.ForeignKey(Question)
+    answer = models.ForeignKey(Answer, blank=True, null=True)
+    has_read = models.BooleanField(default=False)
+    created_time = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        index_together = (('user', 'has_read'),)
+
+
+class NotificationCounter(models.Model):
+    # denormalized number of unread notifications of a user
+    user = models.OneToOneField(User, primary_key=True)
+    unread = models.IntegerField(default=0)
+
+
+class MediaFile(models.Model):
+    # references to a shared content-addressed file, see media
+    name = models.CharField(max_length=255, unique=True)
+    refs = models.IntegerField(default=0)
+    updated_time = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # files without references, see collect_media
+        index_together = (('refs', 'updated_time'),)
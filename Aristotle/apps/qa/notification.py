@@ -2,15 +2,41 @@
 #
 # @name: views.py
 # @create: Sep. 10th, 2014
-# @update: 01 October 2014 (Wednesday)
+# @update: 18 October 2026 (Sunday)
 # @author: Z. Huang
 import logging
-from django.core.mail import send_mail
-from models import ResetPassword
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage
+from django.db.models import F
+from django.template import Context
+from django.template.loader import get_template
+from models import ResetPassword, Answer, QuestionComment, AnswerComment
+from models import MailboxEntry
 from utils import create_unique_code
+from mailqueue import queue_mail, send_batch
+import Aristotle.apps.qa.settings as qa_settings
 
 logger = logging.getLogger(__name__)
 
+# templates compiled by the first email of the process
+_templates = {}
+
+
+def _template(name):
+    template = _templates.get(name)
+    if template is None:
+        template = _templates[name] = get_template(name)
+    return template
+
+
+def render_email(name, context):
+    """subject and message of the qa/email/<name> templates
+    """
+    context = Context(dict(context, site_url=qa_settings.SITE_URL))
+    subject = _template('qa/email/%s_subject.txt' % name).render(context)
+    message = _template('qa/email/%s.txt' % name).render(context)
+    return ' '.join(subject.split()), message
+
 
 class EmailNotification(object):
 
@@ -18,20 +44,14 @@ class EmailNotification(object):
         self.user = user
 
     def send_verfication(self):
-        """only for testing purposes
-        """
-        # TODO create email nofitication templates
-        subject = 'Please verify your account for website name'
-        message = 'Thank you for signin up for website name!\n'
-        message += 'To verify your account, please use the address\n'
-        from_email = 'donotreply@something.com'
         to_email = self.user.email
         try:
             code = create_unique_code()
             self.user.activation.code = code
             self.user.activation.save()
-            message += 'http://127.0.0.1:8001/activate/%s' % code
-            send_mail(subject, message, from_email, [to_email, ])
+            subject, message = render_email('verification', {'code': code})
+            queue_mail(subject, message, qa_settings.NOTIFICATION_FROM_EMAIL,
+                       [to_email, ])
             return True
         except Exception as e:
             logger.error(str(e))
@@ -39,22 +59,91 @@ class EmailNotification(object):
         return False
 
     def send_reset_password(self):
-        """only for testing purposes
-        """
-        subject = 'Reset your password'
-        message = 'Please use the address\n'
-        from_email = 'donotreply@something.com'
         to_email = self.user.email
         try:
             code = create_unique_code()
-            message += 'http://127.0.0.1:8001/reset/%s' % code
             reset = ResetPassword.objects.filter(user=self.user)
             if reset:
                 reset.delete()
             ResetPassword.objects.create(user=self.user, code=code).save()
-            send_mail(subject, message, from_email, [to_email, ])
+            subject, message = render_email('reset_password', {'code': code})
+            queue_mail(subject, message, qa_settings.NOTIFICATION_FROM_EMAIL,
+                       [to_email, ])
             return True
         except Exception as e:
             logger.error(str(e))
             return False
         return False
+
+
+def _group(objects, key):
+    groups = {}
+    for obj in objects:
+        groups.setdefault(key(obj), []).append(obj)
+    return groups
+
+
+def _digest_activity(user_ids, since):
+    """the activity since a time for the digests of users, as
+    {name: {user id: objects}}, one query per kind of activity
+    """
+    # what users did themselves is left out
+    answers = Answer.objects.filter(
+        question__author_id__in=user_ids, created_time__gte=since).exclude(
+        author=F('question__author')).select_related('question', 'author')
+    question_comments = QuestionComment.objects.filter(
+        question__author_id__in=user_ids, created_time__gte=since).exclude(
+        user=F('question__author')).select_related('question', 'user')
+    answer_comments = AnswerComment.objects.filter(
+        answer__author_id__in=user_ids, created_time__gte=since).exclude(
+        user=F('answer__author')).select_related('answer__question', 'user')
+    mails = MailboxEntry.objects.filter(
+        user_id__in=user_ids, box='inbox', has_read=False,
+        created_time__gte=since).select_related('message__sender')
+    return {
+        'answers': _group(answers.order_by('id'),
+                          lambda answer: answer.question.author_id),
+        'question_comments': _group(
+            question_comments.order_by('id'),
+            lambda comment: comment.question.author_id),
+        'answer_comments': _group(
+            answer_comments.order_by('id'),
+            lambda comment: comment.answer.author_id),
+        'mails': _group(mails.order_by('id'), lambda mail: mail.user_id),
+    }
+
+
+def send_digests(since, batch_size=None):
+    """email every user the answers, comments and mails they got
+    since a time, batch_size users at a time in one send over the
+    pooled connection; emails that fail are queued for the mail worker
+    return the number of digests
+    """
+    batch_size = batch_size or qa_settings.DIGEST_BATCH_SIZE
+    from_email = qa_settings.NOTIFICATION_FROM_EMAIL
+    digests = 0
+    last_id = 0
+    while True:
+        users = list(User.objects.filter(id__gt=last_id).exclude(
+            email='').order_by('id')[:batch_size])
+        if not users:
+            break
+        last_id = users[-1].id
+        activity = _digest_activity([user.id for user in users], since)
+        messages = []
+        for user in users:
+            context = dict((name, groups.get(user.id, []))
+                           for name, groups in activity.items())
+            if not any(context.values()):
+                continue
+            context['user'] = user
+            subject, message = render_email('digest', context)
+            messages.append(EmailMessage(subject, message, from_email,
+                                         [user.email]))
+        for i, error in sorted(send_batch(messages).items()):
+            message = messages[i]
+            logger.error('digest to %s: %s' % (message.to[0], str(error)))
+            queue_mail(message.subject, message.body, from_email,
+                       message.to)
+        digests += len(messages)
+    return digests
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+#
+# @name: pagecache.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""Cached list pages for anonymous users
+
+A list page is the same for every anonymous visitor, so its response
+is cached whole under its path and sorted query string, fresh for the
+seconds of its policy in CACHE_POLICIES. The CSRF token of the page is
+cached as a placeholder and replaced by the token of each request.
+
+A page is also stale once one of its tags is invalidated, when a
+question is asked, edited or deleted. For PAGE_CACHE_STALE seconds
+after that a stale page is still served, while the one request that
+takes the rebuild lock renders it again.
+"""
+import time
+import hashlib
+from functools import wraps
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.encoding import force_bytes
+from django.utils.http import urlencode
+from Aristotle.apps.qa.fragments import CSRF_PLACEHOLDER
+import Aristotle.apps.qa.settings as qa_settings
+
+
+def _hash(value):
+    return hashlib.md5(force_bytes(value)).hexdigest()
+
+
+def page_key(name, request):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    return 'qa:page:%s:%s' % (name, _hash(request.path + '?' + query))
+
+
+def _tag_key(tag):
+    return 'qa:pagetag:%s' % _hash(tag)
+
+
+def _new_version():
+    return int(time.time() * 1000000)
+
+
+def tag_versions(cache, tags):
+    """current versions of page tags, in the order of tags
+    """
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key, 0)
+    return tuple(versions[key] for key in keys)
+
+
+def invalidate_pages(*tags):
+    """mark every cached page of the tags stale
+    """
+    cache = caches[qa_settings.PAGE_CACHE]
+    for tag in tags:
+        key = _tag_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def invalidate_question_pages(tag_names):
+    """the pages a question shows on, with tags named tag_names
+    """
+    invalidate_pages('questions', 'tags',
+                     *['tag:' + name for name in tag_names])
+
+
+def _cached_response(request, entry):
+    content, content_type = entry['content'], entry['content_type']
+    content = content.replace(force_bytes(CSRF_PLACEHOLDER),
+                              force_bytes(get_token(request)))
+    return HttpResponse(content, content_type=content_type)
+
+
+def _cache_response(cache, key, request, response, timeout, versions):
+    if response.status_code != 200 or response.streaming or \
+            response.cookies:
+        return
+    content = response.content
+    token = request.META.get('CSRF_COOKIE')
+    if token:
+        content = content.replace(force_bytes(token),
+                                  force_bytes(CSRF_PLACEHOLDER))
+    entry = {
+        'content': content,
+        'content_type': response['Content-Type'],
+        'fresh_until': time.time() + timeout,
+        'versions': versions,
+    }
+    cache.set(key, entry, timeout + qa_settings.PAGE_CACHE_STALE)
+
+
+def cache_policy(name, tags=()):
+    """cache the responses of the get method of a view for anonymous
+    users, as set by the policy name in CACHE_POLICIES
+    tags are formatted with the keyword arguments of the view
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            timeout = qa_settings.CACHE_POLICIES.get(name)
+            if request.user.is_authenticated() or not timeout:
+                response = method(self, request, *args, **kwargs)
+                patch_cache_control(response, private=True)
+                return response
+            cache = caches[qa_settings.PAGE_CACHE]
+            key = page_key(name, request)
+            versions = tag_versions(
+                cache, [tag.format(**kwargs) for tag in tags])
+            entry = cache.get(key)
+            if entry is not None and (
+                    entry['fresh_until'] > time.time() and
+                    entry['versions'] == versions or
+                    not cache.add(key + ':lock', 1,
+                                  qa_settings.PAGE_REBUILD_TIMEOUT)):
+                response = _cached_response(request, entry)
+            else:
+                try:
+                    response = method(self, request, *args, **kwargs)
+                    _cache_response(cache, key, request, response, timeout,
+                                    versions)
+                finally:
+                    if entry is not None:
+                        cache.delete(key + ':lock')
+            patch_cache_control(response, max_age=timeout)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+#
+# @name: pagination.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+import json
+import base64
+import collections
+from django.db import models
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+import Aristotle.apps.qa.settings as qa_settings
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _field_name(key):
+    return key[1:] if key.startswith('-') else key
+
+
+def encode_cursor(obj, ordering):
+    """opaque token holding the sort key of obj
+    """
+    values = []
+    for key in ordering:
+        value = getattr(obj, _field_name(key))
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        values.append(value)
+    token = base64.urlsafe_b64encode(json.dumps(values).encode('utf-8'))
+    return token.decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, model, ordering):
+    """sort key values of a token built by encode_cursor
+    raise InvalidCursor if it does not match the ordering
+    """
+    try:
+        token = str(token)
+        token += '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(token).decode('utf-8'))
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor(token)
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor(token)
+    result = []
+    for key, value in zip(ordering, values):
+        field = model._meta.get_field(_field_name(key))
+        if isinstance(field, models.DateTimeField):
+            try:
+                value = parse_datetime(value or '')
+            except (TypeError, ValueError):
+                value = None
+        if value is None:
+            raise InvalidCursor(token)
+        result.append(value)
+    return result
+
+
+def supports_keyset(model, ordering):
+    """cursors only work on model fields, not on extra selects
+    """
+    names = set(field.name for field in model._meta.fields)
+    return all(_field_name(key) in names for key in ordering)
+
+
+def keyset_filter(ordering, values):
+    """rows strictly after values in ordering, i.e.
+    (k1 > v1) or (k1 = v1 and k2 > v2) or ...
+    with < for descending keys
+    """
+    result = None
+    for i, key in enumerate(ordering):
+        lookup = '__lt' if key.startswith('-') else '__gt'
+        condition = Q(**{_field_name(key) + lookup: values[i]})
+        for prev_key, prev_value in zip(ordering[:i], values[:i]):
+            condition &= Q(**{_field_name(prev_key): prev_value})
+        result = condition if result is None else result | condition
+    return result
+
+
+class CursorPage(collections.Sequence):
+    """a page fetched after a cursor, it has no total count
+    and only links forward
+    """
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.number = None
+        self.paginator = None
+        self.page_links = []
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return False
+
+
+class CursorPaginator(object):
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset.order_by(*ordering)
+        self.ordering = ordering
+        self.per_page = int(per_page)
+
+    def page(self, cursor=None):
+        queryset = self.queryset
+        if cursor:
+            values = decode_cursor(cursor, queryset.model, self.ordering)
+            queryset = queryset.filter(keyset_filter(self.ordering, values))
+        object_list = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(object_list) > self.per_page:
+            object_list = object_list[:self.per_page]
+            next_cursor = encode_cursor(object_list[-1], self.ordering)
+        return CursorPage(object_list, next_cursor)
+
+
+def paginate(request, queryset, ordering, per_page):
+    """page of an ordered queryset for the current request
+
+    ?after=<cursor> switches to keyset pagination, which costs the
+    same on every page. Otherwise ?page=<n> is served by Paginator,
+    and from page CURSOR_PAGE_LINKS on the next link is a cursor.
+    Orderings on extra selects, like search ranks, only have pages:
+    ?after= raises InvalidCursor rather than serve the first page again.
+    """
+    params = request.GET.copy()
+    params.pop('page', None)
+    params.pop('after', None)
+    keyset = supports_keyset(queryset.model, ordering)
+    after = request.GET.get('after')
+    if after and not keyset:
+        raise InvalidCursor(after)
+    if after:
+        try:
+            page = CursorPaginator(queryset, ordering, per_page).page(after)
+            page.params = params.urlencode()
+            return page
+        except InvalidCursor:
+            pass
+    paginator = Paginator(queryset.order_by(*ordering), per_page)
+    try:
+        page = paginator.page(request.GET.get('page'))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+    page.params = params.urlencode()
+    page.page_links = range(
+        1, min(paginator.num_pages, qa_settings.CURSOR_PAGE_LINKS) + 1)
+    page.next_cursor = None
+    if keyset and page.has_next() and \
+            page.number >= qa_settings.CURSOR_PAGE_LINKS:
+        page.next_cursor = encode_cursor(page[len(page) - 1], ordering)
+    return page
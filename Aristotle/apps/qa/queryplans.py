@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+#
+# @name: queryplans.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""Query plans of the lookups the views make
+
+view_queries builds the querysets of each page and action from the
+orderings the views use, and explain asks the database how it runs
+each of them. A plan that reads a whole table where the table is not
+the driving list of the page is a full scan that an index should
+prevent.
+"""
+import re
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+from Aristotle.apps.qa.models import Question, Answer, Tag, QuestionHit
+from Aristotle.apps.qa.models import QuestionComment, AnswerComment
+from Aristotle.apps.qa.models import QuestionVote, AnswerVote
+from Aristotle.apps.qa.models import Activation, ResetPassword
+from Aristotle.apps.qa.models import MailMessage, MailboxEntry
+from Aristotle.apps.qa.models import Notification, OutgoingEmail, MediaFile
+from Aristotle.apps.qa.views.lists import QUESTION_ORDERINGS, TAG_ORDERINGS
+from Aristotle.apps.qa.views.question import ANSWER_SCORE, ANSWER_ORDERING
+from Aristotle.apps.qa.views.question import COMMENT_ORDERING
+from Aristotle.apps.qa.views.question import _first_comments
+from Aristotle.apps.qa.views.mail import MAIL_ORDERING
+from Aristotle.apps.qa.views.inbox import NOTIFICATION_ORDERING
+from Aristotle.apps.qa.hot import HOT_ORDERING
+import Aristotle.apps.qa.settings as qa_settings
+
+# a table read whole, by database vendor
+FULL_SCAN = {
+    'sqlite': re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$'),
+    'mysql': re.compile(r'^ALL$'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+
+
+def view_queries(user, question, answer, tag):
+    """(name, queryset) of the lookups of the views, with rows of a
+    seeded database as arguments
+    """
+    page = qa_settings.QUESTION_PAGE_SIZE
+    queries = [('questions ' + sort, Question.objects.order_by(
+        *ordering)[:page]) for sort, ordering in
+        sorted(QUESTION_ORDERINGS.items())]
+    queries += [
+        ('hot questions', Question.objects.order_by(*HOT_ORDERING)[:page]),
+        ('tagged questions', Question.objects.filter(
+            tag__name=tag.name).order_by(
+            *QUESTION_ORDERINGS['newest'])[:page]),
+        ('tag', Tag.objects.filter(name=tag.name)),
+        ('tags', Tag.objects.filter(question_count__gt=0).order_by(
+            *TAG_ORDERINGS['popular'])[:qa_settings.TAG_PAGE_SIZE]),
+        ('question', Question.objects.filter(id=question.id)),
+        ('answers', Answer.objects.filter(question=question).extra(
+            select={'score': ANSWER_SCORE}).order_by(
+            *ANSWER_ORDERING)[:qa_settings.ANSWER_PAGE_SIZE]),
+        ('question comments', _first_comments(
+            QuestionComment, 'question').filter(question=question)),
+        ('answer comments', _first_comments(
+            AnswerComment, 'answer').filter(answer=answer)),
+        ('comment page', QuestionComment.objects.filter(
+            question=question).order_by(*COMMENT_ORDERING)),
+        ('question vote', QuestionVote.objects.filter(
+            question=question, user=user)),
+        ('answer vote', AnswerVote.objects.filter(answer=answer, user=user)),
+        ('hits', QuestionHit.objects.filter(
+            question_id__in=[question.id], session__in=['session'])),
+        ('profile questions', Question.objects.filter(
+            author=user).order_by('-created_time')),
+        ('profile answers', Answer.objects.filter(
+            author=user).order_by('-created_time')),
+        ('mails', MailboxEntry.objects.filter(
+            user=user, box='inbox').order_by(
+            *MAIL_ORDERING)[:qa_settings.MAIL_PAGE_SIZE]),
+        ('notifications', Notification.objects.filter(
+            user=user).order_by(*NOTIFICATION_ORDERING)[
+            :qa_settings.NOTIFICATION_PAGE_SIZE]),
+        ('unread notifications', Notification.objects.filter(
+            user=user, has_read=False)),
+        ('activation', Activation.objects.filter(code='code')),
+        ('reset password', ResetPassword.objects.filter(code='code')),
+        ('queued email', OutgoingEmail.objects.filter(
+            status='queued', next_try_time__lte=timezone.now()).order_by(
+            'next_try_time', 'id')[:qa_settings.EMAIL_BATCH_SIZE]),
+        ('media orphans', MediaFile.objects.filter(
+            refs=0, updated_time__lt=timezone.now())),
+    ]
+    return queries
+
+
+def explain(queryset):
+    """the plan of a queryset, one line per step
+    """
+    sql, params = queryset.query.sql_with_params()
+    vendor = connection.vendor
+    prefix = 'EXPLAIN QUERY PLAN ' if vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        rows = cursor.fetchall()
+        columns = [column[0] for column in cursor.description]
+    if vendor == 'sqlite':
+        return [row[-1] for row in rows]
+    if vendor == 'mysql':
+        return ['%s %s' % (row[columns.index('table')],
+                           row[columns.index('type')]) for row in rows]
+    return [row[0] for row in rows]
+
+
+def full_scans(plan):
+    """the steps of a plan that read a whole table
+    """
+    pattern = FULL_SCAN.get(connection.vendor)
+    if pattern is None:
+        return []
+    steps = []
+    for step in plan:
+        detail = step.split(' ', 1)[-1] if connection.vendor == 'mysql' \
+            else step
+        if pattern.search(detail.strip()):
+            steps.append(step)
+    return steps
+
+
+def seed(count):
+    """rows for the planner to choose by: count questions with answers,
+    comments, votes and hits, and the mails and notifications of users
+    return the user, question, answer and tag to look up
+    """
+    now = timezone.now()
+    users = [User.objects.create_user('plan%d' % i, 'plan%d@test.com' % i,
+                                      'plan') for i in range(10)]
+    Question.objects.bulk_create([Question(
+        title='question %d' % i, content='content', author=users[i % 10],
+        created_time=now - timedelta(minutes=i), votes_count=i % 7,
+        answers_count=i % 3, hits_count=i % 11) for i in range(count)])
+    questions = list(Question.objects.order_by('-id')[:count])
+    Answer.objects.bulk_create([Answer(
+        content='answer', author=users[i % 10], question=questions[i])
+        for i in range(count)])
+    answers = list(Answer.objects.order_by('-id')[:count])
+    QuestionComment.objects.bulk_create([QuestionComment(
+        question=questions[i], user=users[i % 10], content='comment')
+        for i in range(count)])
+    AnswerComment.objects.bulk_create([AnswerComment(
+        answer=answers[i], user=users[i % 10], content='comment')
+        for i in range(count)])
+    QuestionVote.objects.bulk_create([QuestionVote(
+        question=questions[i], user=users[i % 10]) for i in range(count)])
+    AnswerVote.objects.bulk_create([AnswerVote(
+        answer=answers[i], user=users[i % 10]) for i in range(count)])
+    QuestionHit.objects.bulk_create([QuestionHit(
+        question=questions[i], ip='127.0.0.1', session='s%d' % i)
+        for i in range(count)])
+    message = MailMessage.objects.create(subject='mail', content='mail',
+                                         sender=users[0])
+    MailboxEntry.objects.bulk_create([MailboxEntry(
+        message=message, user=users[i % 10], box='inbox')
+        for i in range(count)])
+    Notification.objects.bulk_create([Notification(
+        user=users[i % 10], actor=users[0], kind='answer',
+        question=questions[i]) for i in range(count)])
+    tag = Tag.objects.create(name='plan', question_count=count)
+    tag.questions.add(*questions[:count // 2])
+    return users[0], questions[0], answers[0], tag
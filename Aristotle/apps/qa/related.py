@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+#
+# @name: related.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""Related questions by tf-idf cosine similarity
+
+Every question has a QuestionVector row with the weighted counts of
+its most distinctive terms. Each process keeps an inverted index of
+those vectors in memory, loaded once and then synced from the rows
+updated since. Related lists are computed when a question is written
+and cached, so a question page only reads the cache. Deleting a
+question recomputes the lists that include it.
+"""
+import math
+import zlib
+import heapq
+import logging
+import threading
+from array import array
+from django.core.cache import cache
+from django.db import DatabaseError
+from Aristotle.apps.qa.models import Question, QuestionVector
+from Aristotle.apps.qa.invertedindex import analyze, U32, F32
+from Aristotle.apps.qa.invertedindex import array_from_bytes, array_to_bytes
+import Aristotle.apps.qa.settings as qa_settings
+
+logger = logging.getLogger(__name__)
+
+# term weights of title, content, tags
+FIELD_WEIGHTS = (2.0, 1.0, 3.0)
+
+
+def term_id(term):
+    return zlib.crc32(term.encode('utf-8')) & 0xffffffff
+
+
+def term_counts(texts):
+    """weighted counts of the terms in (text, weight) pairs
+    """
+    counts = {}
+    for text, weight in texts:
+        for term in analyze(text or ''):
+            key = term_id(term)
+            counts[key] = counts.get(key, 0.0) + weight
+    return counts
+
+
+def question_terms(question):
+    tags = ' '.join(question.tag_set.values_list('name', flat=True))
+    return term_counts(zip((question.title, question.content, tags),
+                           FIELD_WEIGHTS))
+
+
+def pack(terms, counts):
+    return array_to_bytes(array(U32, terms)) + \
+        array_to_bytes(array(F32, counts))
+
+
+def unpack(data):
+    data = bytes(data)
+    size = len(data) // 2
+    return array_from_bytes(U32, data[:size]), \
+        array_from_bytes(F32, data[size:])
+
+
+class RelatedIndex(object):
+    '''inverted index of the question vectors, kept by each process
+    '''
+
+    def __init__(self):
+        # term id -> (question ids, counts)
+        self.postings = {}
+        # question id -> (term ids, counts)
+        self.vectors = {}
+        self.norms = {}
+        self.synced = None
+        self.lock = threading.RLock()
+
+    def idf(self, term):
+        postings = self.postings.get(term)
+        df = len(postings[0]) if postings else 0
+        return math.log((1.0 + len(self.vectors)) / (1.0 + df)) + 1.0
+
+    def select(self, counts):
+        """the RELATED_MAX_TERMS terms of counts with the highest
+        tf-idf, as (term ids, counts) sorted by term id
+        """
+        weighted = [(count * self.idf(term), term)
+                    for term, count in counts.items()]
+        top = heapq.nlargest(qa_settings.RELATED_MAX_TERMS, weighted)
+        terms = sorted(term for _, term in top)
+        return array(U32, terms), array(F32, [counts[t] for t in terms])
+
+    def add(self, question_id, terms, counts):
+        with self.lock:
+            self.remove(question_id)
+            norm = 0.0
+            for term, count in zip(terms, counts):
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = (array(U32), array(F32))
+                postings[0].append(question_id)
+                postings[1].append(count)
+                norm += (count * self.idf(term)) ** 2
+            self.vectors[question_id] = (terms, counts)
+            self.norms[question_id] = math.sqrt(norm) or 1.0
+
+    def remove(self, question_id):
+        with self.lock:
+            terms, _ = self.vectors.pop(question_id, ((), ()))
+            for term in terms:
+                question_ids, counts = self.postings[term]
+                i = question_ids.index(question_id)
+                del question_ids[i]
+                del counts[i]
+                if not question_ids:
+                    del self.postings[term]
+            self.norms.pop(question_id, None)
+
+    def sync(self):
+        """load the vectors written since the last sync by any process
+        """
+        with self.lock:
+            vectors = QuestionVector.objects.order_by('updated_time')
+            if self.synced is not None:
+                vectors = vectors.filter(updated_time__gte=self.synced)
+            rows = vectors.values_list('question_id', 'vector', 'updated_time')
+            for question_id, vector, updated_time in rows.iterator():
+                terms, counts = unpack(vector)
+                self.add(question_id, terms, counts)
+                self.synced = updated_time
+
+    def nearest(self, terms, counts, k, exclude=None):
+        """ids of the k questions closest to a vector, best first
+        """
+        scores = {}
+        with self.lock:
+            for term, count in zip(terms, counts):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = self.idf(term)
+                weight = count * idf * idf
+                for question_id, other in zip(*postings):
+                    scores[question_id] = scores.get(question_id, 0.0) + \
+                        weight * other
+            scores.pop(exclude, None)
+            norms = self.norms
+            best = heapq.nlargest(k, scores.items(), key=lambda item: (
+                item[1] / norms[item[0]], item[0]))
+        return [question_id for question_id, _ in best]
+
+
+_index = RelatedIndex()
+
+
+def _cache_key(question_id):
+    return 'qa:related:%d' % question_id
+
+
+def _save_vector(question):
+    terms, counts = _index.select(question_terms(question))
+    QuestionVector.objects.update_or_create(
+        question_id=question.id, defaults={'vector': pack(terms, counts)})
+    _index.add(question.id, terms, counts)
+    return terms, counts
+
+
+def _existing(question_ids):
+    """question_ids still in the database, in order; a question deleted
+    by another process is dropped from the index of this one
+    """
+    existing = set(Question.objects.filter(id__in=question_ids).values_list(
+        'id', flat=True))
+    for question_id in question_ids:
+        if question_id not in existing:
+            _index.remove(question_id)
+    return [i for i in question_ids if i in existing]
+
+
+def _save_related(question_id, terms, counts):
+    k = qa_settings.RELATED_QUESTIONS
+    related = _existing(_index.nearest(terms, counts, 2 * k,
+                                       exclude=question_id))[:k]
+    QuestionVector.objects.filter(question_id=question_id).update(
+        related=','.join(str(i) for i in related))
+    cache.delete(_cache_key(question_id))
+    return related
+
+
+def update_related(question):
+    """recompute the vector and related questions of a question after
+    it is asked or edited, and the lists of its neighbours which may
+    now include it; return the related ids
+    """
+    try:
+        _index.sync()
+        terms, counts = _save_vector(question)
+        related = _save_related(question.id, terms, counts)
+        for question_id in related:
+            _save_related(question_id, *_index.vectors[question_id])
+        return related
+    except DatabaseError as e:
+        logger.error('related questions: %s' % str(e))
+        return []
+
+
+def forget_related(question_id):
+    """drop a deleted question from the index and recompute the lists
+    of the questions it was related to
+    """
+    _index.remove(question_id)
+    cache.delete(_cache_key(question_id))
+    try:
+        _index.sync()
+        rows = QuestionVector.objects.filter(
+            related__contains=str(question_id)).values_list(
+            'question_id', 'related')
+        for other_id, related in rows:
+            if str(question_id) in related.split(',') and \
+                    other_id in _index.vectors:
+                _save_related(other_id, *_index.vectors[other_id])
+    except DatabaseError as e:
+        logger.error('related questions: %s' % str(e))
+
+
+def related_questions(question_id):
+    """(id, title) of the questions related to a question
+    """
+    key = _cache_key(question_id)
+    related = cache.get(key)
+    if related is None:
+        rows = QuestionVector.objects.filter(
+            question_id=question_id).values_list('related', flat=True)
+        if rows:
+            ids = [int(i) for i in rows[0].split(',') if i]
+        else:
+            question = Question.objects.filter(id=question_id).first()
+            ids = update_related(question) if question else []
+        titles = dict(Question.objects.filter(id__in=ids).values_list(
+            'id', 'title'))
+        related = [(i, titles[i]) for i in ids if i in titles]
+        cache.set(key, related, qa_settings.RELATED_CACHE_TIMEOUT)
+    return related
+
+
+def similar_questions(text, k):
+    """ids of the k questions closest to a text
+    """
+    _index.sync()
+    terms, counts = _index.select(term_counts([(text, 1.0)]))
+    return _index.nearest(terms, counts, k)
+
+
+def rebuild_related(chunk_size=500):
+    """vectors of every question, then their related lists
+    return the number of questions
+    """
+    _index.sync()
+    vectors = {}
+    last_id = 0
+    while True:
+        chunk = list(Question.objects.filter(id__gt=last_id)
+                     .order_by('id')[:chunk_size])
+        if not chunk:
+            break
+        for question in chunk:
+            vectors[question.id] = _save_vector(question)
+        last_id = chunk[-1].id
+    for question_id in list(_index.vectors):
+        if question_id not in vectors:
+            _index.remove(question_id)
+    for question_id, (terms, counts) in vectors.items():
+        _save_related(question_id, terms, counts)
+    return len(vectors)
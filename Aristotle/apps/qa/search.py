@@ -2,11 +2,392 @@
 #
 # @name: search.py
 # @create: Sep. 11th, 2014
-# @update: 04 October 2014 (Saturday)
+# @update: 18 October 2026 (Sunday)
 # @author: Liangju Li, Z. Huang
+import re
+import logging
+from collections import OrderedDict
 from django.contrib.auth.models import User
+from django.db import connection, transaction, DatabaseError
 from django.db.models import Q
-from Aristotle.apps.qa.models import Question
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.module_loading import import_string
+from Aristotle.apps.qa.models import Question, Tag
+from Aristotle.apps.qa.related import similar_questions
+from Aristotle.apps.qa.hot import hot_questions, new_questions
+from Aristotle.apps.qa.invertedindex import InvertedIndex, analyze, snippet
+import Aristotle.apps.qa.settings as qa_settings
+
+logger = logging.getLogger(__name__)
+
+# snippet() markers around matched terms, replaced after escaping
+MATCH_START = '\x02'
+MATCH_STOP = '\x03'
+
+
+def parse_terms(query):
+    """words of a user query, free of any full-text syntax
+    """
+    return re.findall(r'\w+', query or '', re.UNICODE)
+
+
+def highlight(snippet):
+    """escape a snippet and mark its matched terms
+    """
+    if not snippet:
+        return ''
+    snippet = escape(snippet)
+    snippet = snippet.replace(MATCH_START, '<mark>')
+    return mark_safe(snippet.replace(MATCH_STOP, '</mark>'))
+
+
+class SearchBackend(object):
+    '''full-text index over questions
+
+    Every question has one document made of its title, content,
+    answers and tags. Views call update_question/delete_question after
+    each write, and rebuild() indexes everything from scratch.
+    '''
+    # ORDER BY of the queryset returned by questions()
+    ordering = ('-created_time', '-id')
+
+    def setup(self):
+        """create the index structures if they do not exist
+        """
+        pass
+
+    def clear(self):
+        pass
+
+    def update_question(self, question):
+        pass
+
+    def delete_question(self, question_id):
+        pass
+
+    def questions(self, query):
+        """queryset of matching questions, with rank and snippet
+        attributes when the backend supports them
+        """
+        raise NotImplementedError
+
+    def empty(self):
+        """no results, still orderable by self.ordering
+        """
+        select = OrderedDict([('rank', '0'), ('snippet', "''")])
+        return Question.objects.extra(select=select).none()
+
+    def document(self, question):
+        answers = question.answer_set.values_list('content', flat=True)
+        tags = question.tag_set.values_list('name', flat=True)
+        return {
+            'title': question.title,
+            'content': question.content,
+            'answers': '\n'.join(answers),
+            'tags': ' '.join(tags),
+        }
+
+    def rebuild(self, chunk_size=500):
+        """index all questions, return the number of documents
+        """
+        self.setup()
+        self.clear()
+        count = 0
+        last_id = 0
+        while True:
+            chunk = list(Question.objects.filter(id__gt=last_id)
+                         .order_by('id')[:chunk_size])
+            if not chunk:
+                return count
+            for question in chunk:
+                self.update_question(question)
+            count += len(chunk)
+            last_id = chunk[-1].id
+
+
+class LikeBackend(SearchBackend):
+    '''fallback without an index, LIKE scans on titles and contents
+    '''
+
+    def questions(self, query):
+        question_filter = Q(content__contains=query) | Q(
+            title__contains=query)
+        return Question.objects.filter(question_filter)
+
+
+class SQLiteBackend(SearchBackend):
+    '''SQLite FTS5 table, ranked with bm25()
+    rowid of a document is the id of its question
+    '''
+    table = 'qa_search'
+    # bm25() weights of title, content, answers, tags
+    weights = (10.0, 4.0, 1.0, 6.0)
+    ordering = ('rank', '-id')
+
+    def setup(self):
+        cursor = connection.cursor()
+        cursor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5('
+            'title, content, answers, tags, '
+            'tokenize = "porter unicode61")' % self.table)
+
+    def clear(self):
+        connection.cursor().execute('DELETE FROM %s' % self.table)
+
+    def update_question(self, question):
+        doc = self.document(question)
+        cursor = connection.cursor()
+        cursor.execute('DELETE FROM %s WHERE rowid = %%s' % self.table,
+                       [question.id])
+        cursor.execute(
+            'INSERT INTO %s (rowid, title, content, answers, tags) '
+            'VALUES (%%s, %%s, %%s, %%s, %%s)' % self.table,
+            [question.id, doc['title'], doc['content'], doc['answers'],
+             doc['tags']])
+
+    def delete_question(self, question_id):
+        connection.cursor().execute(
+            'DELETE FROM %s WHERE rowid = %%s' % self.table, [question_id])
+
+    def questions(self, query):
+        terms = parse_terms(query)
+        if not terms:
+            return self.empty()
+        # quoted terms are plain strings to FTS5, implicitly ANDed
+        match = ' '.join('"%s"' % term for term in terms)
+        weights = ', '.join(str(weight) for weight in self.weights)
+        select = OrderedDict([
+            ('rank', 'bm25(%s, %s)' % (self.table, weights)),
+            ('snippet', "snippet(%s, -1, char(2), char(3), '...', 16)" %
+             self.table),
+        ])
+        return Question.objects.extra(
+            select=select, tables=[self.table],
+            where=['%s MATCH %%s' % self.table,
+                   '%s.rowid = qa_question.id' % self.table],
+            params=[match])
+
+    @classmethod
+    def is_supported(cls):
+        """whether this SQLite build has the FTS5 module
+        """
+        cursor = connection.cursor()
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE temp.qa_fts5_probe '
+                           'USING fts5(x)')
+            cursor.execute('DROP TABLE temp.qa_fts5_probe')
+            return True
+        except DatabaseError:
+            return False
+
+
+class PostgreSQLBackend(SearchBackend):
+    '''tsvector column with a GIN index, ranked with ts_rank_cd()
+    '''
+    table = 'qa_search'
+    config = 'english'
+    ordering = ('-rank', '-id')
+    headline_options = 'StartSel=%s, StopSel=%s, MaxWords=30, ' \
+        'MinWords=10' % (MATCH_START, MATCH_STOP)
+
+    def setup(self):
+        cursor = connection.cursor()
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS %s ('
+            'question_id integer PRIMARY KEY '
+            'REFERENCES qa_question (id) ON DELETE CASCADE, '
+            'document tsvector NOT NULL)' % self.table)
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS %s_document ON %s '
+            'USING gin(document)' % (self.table, self.table))
+
+    def clear(self):
+        connection.cursor().execute('DELETE FROM %s' % self.table)
+
+    def update_question(self, question):
+        doc = self.document(question)
+        vector = ' || '.join(
+            "setweight(to_tsvector(%%s, %%s), '%s')" % weight
+            for weight in 'ABDC')
+        params = [question.id]
+        for key in ('title', 'tags', 'answers', 'content'):
+            params.extend([self.config, doc[key]])
+        cursor = connection.cursor()
+        cursor.execute('DELETE FROM %s WHERE question_id = %%s' % self.table,
+                       [question.id])
+        cursor.execute(
+            'INSERT INTO %s (question_id, document) VALUES (%%s, %s)' % (
+                self.table, vector), params)
+
+    def delete_question(self, question_id):
+        connection.cursor().execute(
+            'DELETE FROM %s WHERE question_id = %%s' % self.table,
+            [question_id])
+
+    def questions(self, query):
+        terms = parse_terms(query)
+        if not terms:
+            return self.empty()
+        query = ' '.join(terms)
+        select = OrderedDict([
+            ('rank', 'ts_rank_cd(%s.document, plainto_tsquery(%%s, %%s))' %
+             self.table),
+            ('snippet', 'ts_headline(%s, qa_question.content, '
+             'plainto_tsquery(%s, %s), %s)'),
+        ])
+        select_params = [self.config, query, self.config, self.config,
+                         query, self.headline_options]
+        return Question.objects.extra(
+            select=select, select_params=select_params, tables=[self.table],
+            where=['%s.document @@ plainto_tsquery(%%s, %%s)' % self.table,
+                   '%s.question_id = qa_question.id' % self.table],
+            params=[self.config, query])
+
+
+class RankedResults(object):
+    '''questions ranked outside the database, held as (id, rank)
+    pairs and loaded one page at a time; enough of a queryset for
+    paginate()
+    '''
+    model = Question
+
+    def __init__(self, hits, query):
+        self.hits = hits
+        self.terms = set(analyze(query))
+        self.related = ()
+
+    def order_by(self, *ordering):
+        return self
+
+    def select_related(self, *fields):
+        self.related = fields
+        return self
+
+    def count(self):
+        return len(self.hits)
+
+    def __len__(self):
+        return len(self.hits)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        hits = self.hits[index]
+        queryset = Question.objects.all()
+        if self.related:
+            queryset = queryset.select_related(*self.related)
+        questions = queryset.in_bulk([question_id for question_id, _ in hits])
+        result = []
+        for question_id, rank in hits:
+            # the index may lag behind a deleted question
+            question = questions.get(question_id)
+            if question is not None:
+                question.rank = rank
+                question.snippet = snippet(question.content, self.terms,
+                                           MATCH_START, MATCH_STOP)
+                result.append(question)
+        return result
+
+
+class InvertedIndexBackend(SearchBackend):
+    '''embedded inverted index under SEARCH_INDEX_PATH, for databases
+    without full-text search, ranked with BM25
+
+    Queries are words ANDed together, "quoted phrases" and OR.
+    '''
+    ordering = ('-rank', '-id')
+    # term weights of title, content, answers, tags
+    weights = (10.0, 4.0, 1.0, 6.0)
+
+    def __init__(self, path=None, **options):
+        self.index = InvertedIndex(path or qa_settings.SEARCH_INDEX_PATH,
+                                   **options)
+
+    def clear(self):
+        self.index.clear()
+
+    def fields(self, question):
+        doc = self.document(question)
+        keys = ('title', 'content', 'answers', 'tags')
+        return [(doc[key], weight) for key, weight in zip(keys, self.weights)]
+
+    def update_question(self, question):
+        self.index.add(question.id, self.fields(question))
+
+    def delete_question(self, question_id):
+        self.index.delete(question_id)
+
+    def questions(self, query):
+        hits = self.index.search(query, qa_settings.SEARCH_MAX_RESULTS)
+        return RankedResults(hits, query)
+
+    def rebuild(self, chunk_size=500):
+        """one segment per chunk, merged into one at the end
+        """
+        self.clear()
+        count = 0
+        last_id = 0
+        while True:
+            chunk = list(Question.objects.filter(id__gt=last_id)
+                         .order_by('id')[:chunk_size])
+            if not chunk:
+                break
+            self.index.add_many([(question.id, self.fields(question))
+                                 for question in chunk])
+            count += len(chunk)
+            last_id = chunk[-1].id
+        self.index.merge(max_segments=1)
+        return count
+
+
+_backend = None
+
+
+def get_backend():
+    """the configured search backend
+    SEARCH_BACKEND is a dotted path, None picks one for the database,
+    then the inverted index if SEARCH_INDEX_PATH is set
+    """
+    global _backend
+    if _backend is None:
+        if qa_settings.SEARCH_BACKEND:
+            backend_class = import_string(qa_settings.SEARCH_BACKEND)
+        elif connection.vendor == 'postgresql':
+            backend_class = PostgreSQLBackend
+        elif connection.vendor == 'sqlite' and SQLiteBackend.is_supported():
+            backend_class = SQLiteBackend
+        elif qa_settings.SEARCH_INDEX_PATH:
+            backend_class = InvertedIndexBackend
+        else:
+            backend_class = LikeBackend
+        _backend = backend_class()
+    return _backend
+
+
+def setup_index(sender, **kwargs):
+    """post_migrate handler creating the index
+    """
+    get_backend().setup()
+
+
+def index_question(question):
+    """update the document of a question after a write
+    a failure is logged, rebuild_search_index repairs the index
+    """
+    try:
+        with transaction.atomic():
+            get_backend().update_question(question)
+    except (DatabaseError, IOError, OSError) as e:
+        logger.error('search index: %s' % str(e))
+
+
+def unindex_question(question_id):
+    try:
+        with transaction.atomic():
+            get_backend().delete_question(question_id)
+    except (DatabaseError, IOError, OSError) as e:
+        logger.error('search index: %s' % str(e))
 
 
 class Search(object):
@@ -15,12 +396,13 @@ class Search(object):
 
     def __init__(self, query):
         self.query = query
+        self.backend = get_backend()
+        self.ordering = self.backend.ordering
 
     def questions(self):
-        question_filter = Q(content__contains=self.query) | Q(
-            title__contains=self.query)
-        results = Question.objects.filter(question_filter)
-        return results
+        if not parse_terms(self.query):
+            return self.backend.empty()
+        return self.backend.questions(self.query)
 
     def users(self):
         results = User.objects.filter(username__contains=self.query)
@@ -30,16 +412,33 @@ class Search(object):
         pass
 
     def related_questions(self):
-        pass
+        """questions most similar to the query, best first
+        """
+        if not hasattr(self, '_related_ids'):
+            self._related_ids = similar_questions(
+                self.query, qa_settings.RELATED_QUESTIONS)
+        questions = Question.objects.in_bulk(self._related_ids)
+        return [questions[i] for i in self._related_ids if i in questions]
 
     def related_tags(self):
-        pass
+        """tags of the related questions
+        """
+        questions = self.related_questions()
+        return Tag.objects.filter(questions__in=questions).distinct() \
+            .order_by('-question_count', 'name')
 
     def related_users(self):
-        pass
+        """authors of the related questions
+        """
+        questions = self.related_questions()
+        return User.objects.filter(question__in=questions).distinct()
 
     def newest_questions(self):
-        pass
+        """site-wide, not filtered by the query
+        """
+        return new_questions()[:qa_settings.HOME_PAGE_SIZE]
 
     def hotest_questions(self):
-        pass
+        """site-wide, not filtered by the query
+        """
+        return hot_questions()[:qa_settings.HOME_PAGE_SIZE]
@@ -13,6 +13,30 @@
 # avatar upload path and default picture
 DEFAULT_AVATAR = 'defaultavatar.jpg'
 AVATAR_PATH = 'uploads/avatars/'
+# sizes an avatar is served in, made when first requested and kept in
+# AVATAR_CACHE_PATH up to AVATAR_CACHE_MAX_SIZE bytes, least recently
+# used first out; browsers keep them for AVATAR_MAX_AGE seconds
+AVATAR_SIZES = {
+    'large': (256, 256),
+    'medium': (128, 128),
+    'small': (32, 32),
+}
+AVATAR_CACHE_PATH = AVATAR_PATH + 'cache/'
+AVATAR_CACHE_MAX_SIZE = 256 * 1024 * 1024
+AVATAR_MAX_AGE = 365 * 24 * 60 * 60
+# uploads are checked by the AVATAR_WORKERS threads of a process
+# 0 checks them within the request
+AVATAR_WORKERS = 2
+# avatar uploads with more pixels are refused from their header
+AVATAR_MAX_PIXELS = 4096 * 4096
+# bytes of an upload searched for the header of an image
+IMAGE_HEADER_SIZE = 256 * 1024
+# seconds a stored file is kept after its last reference is gone
+MEDIA_GRACE = 24 * 60 * 60
+# tries of an upload to count a reference to a file being removed, and
+# seconds after which a removal that never finished is given up
+MEDIA_ACQUIRE_ATTEMPTS = 5
+MEDIA_REMOVAL_TIMEOUT = 60 * 60
 
 # Page sizes
 HOME_PAGE_SIZE = 25
@@ -22,3 +46,86 @@ QUESTION_PAGE_SIZE = 25
 ANSWER_PAGE_SIZE = 25
 COMMENT_PAGE_SIZE = 5
 MAIL_PAGE_SIZE = 10
+
+# Page-number links shown before list views switch to cursors
+CURSOR_PAGE_LINKS = 5
+
+# Search backend, a dotted path to a search.SearchBackend subclass
+# None picks the full-text index of the database
+SEARCH_BACKEND = None
+
+# Directory of the embedded inverted index, used when the database
+# has no full-text search; None falls back to LIKE scans
+SEARCH_INDEX_PATH = None
+# Ranked results kept for a search
+SEARCH_MAX_RESULTS = 1000
+
+# Related questions shown on a question page, and how long a list
+# stays cached; terms kept in the vector of a question
+RELATED_QUESTIONS = 5
+RELATED_CACHE_TIMEOUT = 24 * 60 * 60
+RELATED_MAX_TERMS = 32
+
+# Hot questions: weight of each vote, answer and view in the activity
+# of a question, and the age in seconds that halves its score
+HOT_VOTE_WEIGHT = 3.0
+HOT_ANSWER_WEIGHT = 2.0
+HOT_HIT_WEIGHT = 0.1
+HOT_HALF_LIFE = 24 * 60 * 60
+
+# Question views are buffered in memory and written once a request
+# has finished, when HIT_BUFFER_SIZE views are waiting or the oldest
+# is HIT_FLUSH_INTERVAL seconds old, HIT_FLUSH_BATCH rows at a time
+HIT_BUFFER_SIZE = 1000
+HIT_FLUSH_INTERVAL = 30
+HIT_FLUSH_BATCH = 200
+
+# How unique viewers are stored: 'rows' keeps a QuestionHit per
+# visitor, 'sketch' a HyperLogLog of 2 ** HIT_SKETCH_PRECISION bytes
+# per question; HIT_DAILY_ROLLUP also keeps views per question and day
+HIT_STORAGE = 'rows'
+HIT_SKETCH_PRECISION = 10
+HIT_DAILY_ROLLUP = False
+
+# Seconds a rendered fragment of a question page stays cached, and
+# the version its keys carry; a version that expired is a new version
+QUESTION_CACHE_TIMEOUT = 10 * 60
+QUESTION_VERSION_TIMEOUT = 6 * QUESTION_CACHE_TIMEOUT
+
+# Cache alias of whole pages, and seconds each list page stays fresh
+# for anonymous users, 0 turns a page off; signed-in users always get
+# a fresh page
+PAGE_CACHE = 'default'
+CACHE_POLICIES = {
+    'home': 30,
+    'questions': 60,
+    'tags': 5 * 60,
+    'users': 5 * 60,
+}
+# Seconds a stale page is still served while one request renders it
+# again, and how long that request holds the rebuild lock
+PAGE_CACHE_STALE = 5 * 60
+PAGE_REBUILD_TIMEOUT = 30
+
+# Emails are queued in OutgoingEmail and sent by the send_queued_mail
+# worker, EMAIL_BATCH_SIZE per SMTP connection. A failed email is tried
+# again after EMAIL_RETRY_DELAY seconds, doubled at each attempt up to
+# EMAIL_RETRY_MAX_DELAY, and is dead after EMAIL_MAX_ATTEMPTS attempts;
+# a worker holds an email for EMAIL_LEASE seconds while sending it.
+# EMAIL_QUEUE = False sends emails within the request
+EMAIL_QUEUE = True
+EMAIL_BATCH_SIZE = 50
+EMAIL_RETRY_DELAY = 60
+EMAIL_RETRY_MAX_DELAY = 6 * 60 * 60
+EMAIL_MAX_ATTEMPTS = 8
+EMAIL_LEASE = 5 * 60
+EMAIL_QUEUE_INTERVAL = 5
+
+# Address of the site in email links, sender of notifications, and
+# users rendered at a time by send_digests
+SITE_URL = 'http://127.0.0.1:8000'
+NOTIFICATION_FROM_EMAIL = 'donotreply@something.com'
+DIGEST_BATCH_SIZE = 500
+
+# Notifications listed at a time by the inbox
+NOTIFICATION_PAGE_SIZE = 20
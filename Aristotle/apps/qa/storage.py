@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#
+# @name: storage.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""Content-addressed file storage
+
+A file is named by the SHA-1 of its bytes, in two levels of directories
+taken from the hash, so the same bytes are stored once and a name never
+points at other bytes. The file is hashed while it is written to a
+temporary file, which is renamed to its name or dropped if that name is
+there already.
+"""
+import os
+import errno
+import hashlib
+import tempfile
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    '''saves name as <dirname of name>/ab/cd/abcd...<extension>
+    '''
+
+    def get_available_name(self, name):
+        # the same name is the same content
+        return name
+
+    def _makedirs(self, directory):
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        root = self.path(directory)
+        self._makedirs(root)
+        digest = hashlib.sha1()
+        fd, temporary = tempfile.mkstemp(dir=root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    f.write(chunk)
+            key = digest.hexdigest()
+            name = os.path.join(directory, key[:2], key[2:4], key + extension)
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.remove(temporary)
+            else:
+                self._makedirs(os.path.dirname(full_path))
+                if self.file_permissions_mode is not None:
+                    os.chmod(temporary, self.file_permissions_mode)
+                else:
+                    os.chmod(temporary, 0o644)
+                os.rename(temporary, full_path)
+        except Exception:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name.replace('\\', '/')
+
+
+avatar_storage = ContentAddressedStorage()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+#
+# @name: uploads.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""Image uploads checked while they stream in
+
+ImageUploadHandler runs before the handlers that store an upload. It
+counts the bytes of each file against TASK_UPLOAD_FILE_MAX_SIZE, and
+reads the format and the pixel dimensions from the header of the image
+as soon as the first chunks hold it; PIL only parses the header there.
+A file that is too large, of a type outside TASK_UPLOAD_FILE_TYPES or
+of more than AVATAR_MAX_PIXELS pixels stops the upload at once, so the
+rest of it is never read, stored or decoded.
+"""
+import warnings
+from io import BytesIO
+from PIL import Image
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+import Aristotle.apps.qa.settings as qa_settings
+
+# file types of TASK_UPLOAD_FILE_TYPES by PIL format
+IMAGE_TYPES = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'BMP': 'bmp'}
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+def sniff_image(head):
+    """the type and the dimensions of an image from its first bytes
+    None while head is too short to tell
+    """
+    # what PIL raises and warns for images past MAX_IMAGE_PIXELS depends
+    # on its version, DecompressionBombError only exists from Pillow 5.0
+    warning = getattr(Image, 'DecompressionBombWarning', None)
+    errors = tuple(error for error in (
+        getattr(Image, 'DecompressionBombError', None), warning) if error)
+    try:
+        with warnings.catch_warnings():
+            if warning is not None:
+                warnings.simplefilter('error', warning)
+            image = Image.open(BytesIO(head))
+    except errors:
+        raise ImageTooLarge()
+    except Exception:
+        return None
+    width, height = image.size
+    max_pixels = getattr(Image, 'MAX_IMAGE_PIXELS', None)
+    if max_pixels and width * height > max_pixels:
+        # versions of PIL that check nothing on open
+        raise ImageTooLarge()
+    image_type = IMAGE_TYPES.get(image.format, (image.format or '').lower())
+    return image_type, image.size
+
+
+class ImageUploadHandler(FileUploadHandler):
+    '''refuses uploads that are not acceptable images, error tells why
+    '''
+
+    def __init__(self, request=None):
+        super(ImageUploadHandler, self).__init__(request)
+        self.max_size = int(settings.TASK_UPLOAD_FILE_MAX_SIZE)
+        self.types = settings.TASK_UPLOAD_FILE_TYPES
+        self.error = None
+        # type of each checked file by field name
+        self.image_types = {}
+
+    def new_file(self, field_name, *args, **kwargs):
+        super(ImageUploadHandler, self).new_file(field_name, *args,
+                                                 **kwargs)
+        self.received = 0
+        self.head = b''
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.refuse('The image is larger than %d bytes' % self.max_size)
+        if self.field_name not in self.image_types:
+            self.head += raw_data
+            self.check(self.head)
+        return raw_data
+
+    def check(self, head):
+        try:
+            image = sniff_image(head)
+        except ImageTooLarge:
+            self.refuse('The image has too many pixels')
+        if image is None:
+            if len(head) > qa_settings.IMAGE_HEADER_SIZE:
+                self.refuse('Incorrect image')
+            return
+        image_type, (width, height) = image
+        if image_type not in self.types:
+            self.refuse('Images of type %s are not accepted' % image_type)
+        if width * height > qa_settings.AVATAR_MAX_PIXELS:
+            self.refuse('The image has too many pixels')
+        self.image_types[self.field_name] = image_type
+        self.head = b''
+
+    def refuse(self, error):
+        self.error = error
+        raise StopUpload(connection_reset=True)
+
+    def file_complete(self, file_size):
+        if self.field_name not in self.image_types:
+            self.refuse('Incorrect image')
+        # stored by the next handler
+        return None
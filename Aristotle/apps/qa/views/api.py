@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+#
+# @name: api.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+"""Read-only JSON API
+
+?fields=a,b picks the fields of each item. Every response has an ETag
+built from the updated time and counters of the rows it shows, so a
+GET with a matching If-None-Match gets a 304 before anything is
+serialized. If-Modified-Since is only honored when no counter is
+selected, since counters change without updating updated_time.
+"""
+import hashlib
+import calendar
+from datetime import datetime
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.generic import View
+from django.contrib.auth.models import User
+from django.db.models.query import prefetch_related_objects
+from django.utils.cache import patch_cache_control
+from django.utils.encoding import force_bytes
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.utils.http import quote_etag
+from Aristotle.apps.qa.models import Question, Answer, Tag
+from Aristotle.apps.qa.search import Search
+from Aristotle.apps.qa.pagination import paginate, InvalidCursor
+from Aristotle.apps.qa.views.lists import sort_questions, TAG_ORDERINGS
+from Aristotle.apps.qa.views.question import ANSWER_SCORE, ANSWER_ORDERING
+import Aristotle.apps.qa.settings as qa_settings
+
+QUESTION_FIELDS = ('id', 'title', 'author', 'created_time', 'updated_time',
+                   'votes_count', 'answers_count', 'hits_count', 'solved',
+                   'content', 'tags')
+QUESTION_COUNTERS = ('votes_count', 'answers_count', 'hits_count', 'solved')
+ANSWER_FIELDS = ('id', 'author', 'created_time', 'updated_time', 'accepted',
+                 'upvotes_count', 'downvotes_count', 'score', 'content')
+ANSWER_COUNTERS = ('accepted', 'upvotes_count', 'downvotes_count')
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, User):
+        return value.username
+    return value
+
+
+def _timestamp(value):
+    return calendar.timegm(value.utctimetuple())
+
+
+def _not_modified(request, etag, last_modified=None):
+    """whether the copy of the client is current
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        etags = parse_etags(if_none_match)
+        return etag in etags or '*' in etags
+    if last_modified is not None:
+        since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'))
+        return since is not None and last_modified <= since
+    return False
+
+
+class ApiView(View):
+    '''JSON items with field selection and conditional GET
+    '''
+    # fields an item can show, and the ones shown by default
+    fields = ()
+    default_fields = ()
+    # fields of an item that its ETag is built from
+    version_fields = ('id',)
+    # fields that change without updated_time
+    counters = ()
+
+    def get(self, request, *args, **kwargs):
+        names = request.GET.get('fields')
+        if names:
+            fields = tuple(name.strip() for name in names.split(',')
+                           if name.strip())
+        else:
+            fields = self.default_fields
+        unknown = [name for name in fields if name not in self.fields]
+        if unknown:
+            return JsonResponse(
+                {'error': 'unknown fields: ' + ', '.join(unknown)},
+                status=400)
+        return self.render(request, fields, *args, **kwargs)
+
+    def etag(self, fields, items, *extra):
+        versions = [tuple(getattr(item, name) for name in
+                          self.version_fields) for item in items]
+        return hashlib.md5(force_bytes(repr(
+            (fields, versions) + extra))).hexdigest()
+
+    def last_modified(self, fields, items):
+        """time of the last change of items, None if unknown or if
+        fields show counters
+        """
+        if set(fields) & set(self.counters):
+            return None
+        times = [item.updated_time or item.created_time for item in items]
+        return _timestamp(max(times)) if times else None
+
+    def item(self, obj, fields):
+        data = {}
+        for name in fields:
+            if name == 'tags':
+                data[name] = sorted(tag.name for tag in obj.tag_set.all())
+            else:
+                data[name] = _value(getattr(obj, name))
+        return data
+
+    def respond(self, request, etag, last_modified, data):
+        """data() as JSON, or a 304 if the client has it already
+        """
+        if _not_modified(request, etag, last_modified):
+            response = HttpResponse(status=304)
+        else:
+            response = JsonResponse(data())
+        response['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, max_age=0)
+        return response
+
+
+class ListApiView(ApiView):
+
+    def render(self, request, fields, *args, **kwargs):
+        queryset, ordering, per_page = self.queryset(request, **kwargs)
+        per_page = request.GET.get('pagesize') or per_page
+        try:
+            page = paginate(request, queryset, ordering, per_page)
+        except InvalidCursor:
+            return JsonResponse(
+                {'error': 'no cursors on this list, use page'}, status=400)
+        items = list(page)
+        count = page.paginator.count if page.paginator else None
+        etag = self.etag(fields, items, page.number, page.next_cursor, count)
+        last_modified = self.last_modified(fields, items)
+
+        def data():
+            if 'tags' in fields:
+                prefetch_related_objects(items, ['tag_set'])
+            return {
+                'items': [self.item(item, fields) for item in items],
+                'count': count,
+                'page': page.number,
+                'has_next': page.has_next(),
+                'next_cursor': page.next_cursor,
+            }
+        return self.respond(request, etag, last_modified, data)
+
+    def last_modified(self, fields, items):
+        # removed and reordered items leave no time behind
+        return None
+
+
+class QuestionsApiView(ListApiView):
+    fields = QUESTION_FIELDS
+    default_fields = QUESTION_FIELDS[:9]
+    version_fields = ('id', 'updated_time') + QUESTION_COUNTERS
+
+    def queryset(self, request, tag_name=None):
+        questions = Question.objects.all()
+        if tag_name is not None:
+            questions = questions.filter(tag__name=tag_name)
+        questions, ordering = sort_questions(questions,
+                                             request.GET.get('sort'))
+        return questions, ordering, qa_settings.QUESTION_PAGE_SIZE
+
+
+class SearchApiView(QuestionsApiView):
+
+    def queryset(self, request):
+        search = Search(request.GET.get('query'))
+        return search.questions().select_related('author'), \
+            search.ordering, qa_settings.QUESTION_PAGE_SIZE
+
+
+class TagsApiView(ListApiView):
+    fields = ('id', 'name', 'question_count')
+    default_fields = fields
+    version_fields = fields
+
+    def queryset(self, request):
+        ordering = TAG_ORDERINGS.get(request.GET.get('sort'),
+                                     TAG_ORDERINGS['popular'])
+        return Tag.objects.filter(question_count__gt=0), ordering, \
+            qa_settings.TAG_PAGE_SIZE
+
+
+class UsersApiView(ListApiView):
+    fields = ('id', 'username', 'date_joined')
+    default_fields = fields
+    version_fields = fields
+
+    def queryset(self, request):
+        return User.objects.all(), ('id',), qa_settings.USER_PAGE_SIZE
+
+
+class AnswersApiView(ListApiView):
+    fields = ANSWER_FIELDS
+    default_fields = ANSWER_FIELDS
+    version_fields = ('id', 'updated_time') + ANSWER_COUNTERS
+
+    def queryset(self, request, question_id):
+        if not Question.objects.filter(id=question_id).exists():
+            raise Http404()
+        answers = Answer.objects.filter(question_id=question_id)
+        answers = answers.select_related('author').extra(
+            select={'score': ANSWER_SCORE})
+        return answers, ANSWER_ORDERING, qa_settings.ANSWER_PAGE_SIZE
+
+
+class QuestionApiView(ApiView):
+    fields = QUESTION_FIELDS
+    default_fields = QUESTION_FIELDS
+    version_fields = ('id', 'updated_time') + QUESTION_COUNTERS
+    counters = QUESTION_COUNTERS
+
+    def render(self, request, fields, question_id):
+        # the version of the question is read before the question
+        versions = Question.objects.filter(id=question_id).only(
+            *(('created_time',) + self.version_fields))
+        if not versions:
+            raise Http404()
+        etag = self.etag(fields, versions)
+        last_modified = self.last_modified(fields, versions)
+
+        def data():
+            question = Question.objects.select_related('author').get(
+                id=question_id)
+            return self.item(question, fields)
+        return self.respond(request, etag, last_modified, data)
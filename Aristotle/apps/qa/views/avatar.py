@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+#
+# @name: avatar.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+import os
+import hashlib
+import logging
+import mimetypes
+from django.http import Http404, HttpResponse
+from django.views.generic import View
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from Aristotle.apps.qa.avatars import thumbnail_cache
+from Aristotle.apps.qa.storage import avatar_storage
+import Aristotle.apps.qa.settings as qa_settings
+
+logger = logging.getLogger(__name__)
+
+
+class AvatarView(View):
+    '''an avatar in one of AVATAR_SIZES; avatar files are named by
+    their content and never change, so browsers keep them for
+    AVATAR_MAX_AGE without asking again
+    '''
+
+    def get(self, request, size, filename):
+        box = qa_settings.AVATAR_SIZES.get(size)
+        name = os.path.normpath(filename)
+        if box is None or name.startswith(('.', '/')):
+            raise Http404()
+        original = avatar_storage.path(qa_settings.AVATAR_PATH + name)
+        try:
+            stat = os.stat(original)
+        except OSError:
+            raise Http404()
+        etag = hashlib.md5('%s:%dx%d:%d:%d' % (
+            name, box[0], box[1], stat.st_mtime, stat.st_size)).hexdigest()
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponse(status=304)
+        else:
+            try:
+                cache = thumbnail_cache(avatar_storage)
+                path = cache.get(original, box, name)
+            except (IOError, ValueError) as e:
+                logger.error('avatar %s: %s' % (name, str(e)))
+                raise Http404()
+            with open(path, 'rb') as f:
+                content = f.read()
+            content_type = mimetypes.guess_type(path)[0]
+            response = HttpResponse(
+                content, content_type=content_type or 'image/jpeg')
+        response['ETag'] = quote_etag(etag)
+        patch_cache_control(response, public=True, immutable=True,
+                            max_age=qa_settings.AVATAR_MAX_AGE)
+        return response
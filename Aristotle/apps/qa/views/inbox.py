@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+#
+# @name: inbox.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+from django.http import JsonResponse
+from django.views.generic import View
+from django.utils.decorators import method_decorator
+from django.contrib.auth.decorators import login_required
+from django.utils.cache import patch_cache_control
+from Aristotle.apps.qa.models import Notification
+from Aristotle.apps.qa.pagination import paginate
+from Aristotle.apps.qa.inbox import unread_count, mark_read
+import Aristotle.apps.qa.settings as qa_settings
+
+NOTIFICATION_ORDERING = ('-id',)
+
+
+def _notification(notification):
+    return {
+        'id': notification.id,
+        'kind': notification.kind,
+        'actor': notification.actor.username,
+        'question': notification.question_id,
+        'title': notification.question.title,
+        'answer': notification.answer_id,
+        'has_read': notification.has_read,
+        'created_time': notification.created_time.isoformat(),
+    }
+
+
+class NotificationsView(View):
+
+    @method_decorator(login_required)
+    def get(self, request, *args, **kwargs):
+        notifications = Notification.objects.filter(
+            user=request.user).select_related('actor', 'question')
+        page = paginate(request, notifications, NOTIFICATION_ORDERING,
+                        qa_settings.NOTIFICATION_PAGE_SIZE)
+        response = JsonResponse({
+            'items': [_notification(item) for item in page],
+            'unread': unread_count(request.user),
+            'has_next': page.has_next(),
+            'next_cursor': page.next_cursor,
+        })
+        patch_cache_control(response, private=True, max_age=0)
+        return response
+
+
+class UnreadView(View):
+    '''polled by pages for the unread count, a single row read
+    '''
+
+    @method_decorator(login_required)
+    def get(self, request, *args, **kwargs):
+        response = JsonResponse({'unread': unread_count(request.user)})
+        patch_cache_control(response, private=True, max_age=0)
+        return response
+
+
+class ReadView(View):
+
+    @method_decorator(login_required)
+    def post(self, request, *args, **kwargs):
+        ids = request.POST.getlist('id')
+        if ids:
+            try:
+                ids = [int(i) for i in ids]
+            except ValueError:
+                return JsonResponse({'error': 'invalid id'}, status=400)
+            mark_read(request.user, ids)
+        else:
+            mark_read(request.user)
+        return JsonResponse({'unread': unread_count(request.user)})
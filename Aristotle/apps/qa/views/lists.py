@@ -5,6 +5,7 @@
 # @update: 04 October 2014 (Saturday)
 # @author: Z. Huang, Liangju
 import logging
+from django.http import HttpResponseBadRequest
 from django.shortcuts import render, redirect
 from django.contrib.auth.models import User
 from django.views.generic import View
@@ -12,136 +13,128 @@ from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from Aristotle.apps.qa.models import Question
 from Aristotle.apps.qa.models import Tag
 from Aristotle.apps.qa.forms import SearchForm
-from Aristotle.apps.qa.search import Search
+from Aristotle.apps.qa.search import Search, highlight
+from Aristotle.apps.qa.pagination import paginate, InvalidCursor
+from Aristotle.apps.qa.hot import hot_questions, top_questions
+from Aristotle.apps.qa.hot import new_questions
+from Aristotle.apps.qa.pagecache import cache_policy
+from Aristotle.apps.qa.avatars import avatar_url
 from Aristotle.apps.qa.utils import form_errors_handler
 import Aristotle.apps.qa.settings as qa_settings
 
 logger = logging.getLogger(__name__)
 
+# ORDER BY clauses for each ?sort= mode of the question lists,
+# id is the last key so that pages are stable
+QUESTION_ORDERINGS = {
+    'newest': ('-created_time', '-id'),
+    'votes': ('-votes_count', '-created_time', '-id'),
+    'answers': ('-solved', '-answers_count', '-created_time', '-id'),
+    'unanswered': ('answers_count', 'votes_count', 'created_time', 'id'),
+    'views': ('-hits_count', '-created_time', '-id'),
+}
+
+
+# ORDER BY clauses for each ?sort= mode of the tag list
+TAG_ORDERINGS = {
+    'popular': ('-question_count', 'name'),
+    'name': ('name',),
+}
+
+
+def sort_questions(queryset, sort):
+    """filter a question queryset for a sort mode and return it
+    with the ORDER BY clause of the mode
+    unknown modes fall back to newest
+    """
+    if sort not in QUESTION_ORDERINGS:
+        sort = 'newest'
+    if sort == 'unanswered':
+        queryset = queryset.filter(solved=False)
+    return queryset.select_related('author'), QUESTION_ORDERINGS[sort]
+
+
+# ?tab= modes of the home page, hot is the default
+HOME_TABS = {
+    'hot': hot_questions,
+    'week': lambda: top_questions(7),
+    'month': lambda: top_questions(30),
+    'new': new_questions,
+}
+
 
 class HomeView(View):
 
+    @cache_policy('home', tags=('questions',))
     def get(self, request, *args, **kwargs):
         """Home page
         """
+        tab = request.GET.get('tab')
+        if tab not in HOME_TABS:
+            tab = 'hot'
         limit = qa_settings.HOME_PAGE_SIZE
-        questions = Question.objects.order_by('-created_time')[:limit]
-        return render(request, 'qa/index.html', {'questions': questions})
+        questions = HOME_TABS[tab]().select_related('author')[:limit]
+        return render(request, 'qa/index.html',
+                      {'questions': questions, 'tab': tab})
 
 
 class QuestionsView(View):
 
+    @cache_policy('questions', tags=('questions',))
     def get(self, request, *args, **kwargs):
         """A list of questions
         """
-        page = request.GET.get('page')
         sort = request.GET.get('sort')
         per_page = request.GET.get('pagesize')
         if not per_page or per_page == '0' or per_page == 0:
             per_page = qa_settings.QUESTION_PAGE_SIZE
-        if not sort:
-            sort = 'newest'
-        question_list = Question.objects
-        if sort == 'votes':
-            question_list = sorted(question_list.all(), key=lambda i: (
-                i.votes_count, i.created_time), reverse=True)
-        elif sort == 'answers':
-            question_list = sorted(question_list.all(), key=lambda i: (
-                i.solved, i.answers_count, i.created_time), reverse=True)
-        elif sort == 'unanswered':
-            question_list = sorted(question_list.filter(solved=False),
-                                   key=lambda i: (i.answers_count,
-                                                  i.votes_count,
-                                                  i.created_time))
-        elif sort == 'views':
-            question_list = sorted(question_list.all(), key=lambda i: (
-                i.hits_count, i.created_time), reverse=True)
-        else:
-            question_list = sorted(
-                question_list.all(),
-                key=lambda i: i.created_time, reverse=True)
-
-        paginator = Paginator(question_list, per_page)
-        try:
-            questions = paginator.page(page)
-        except PageNotAnInteger:
-            questions = paginator.page(1)
-        except EmptyPage:
-            questions = paginator.page(paginator.num_pages)
+        question_list, ordering = sort_questions(Question.objects.all(), sort)
+        questions = paginate(request, question_list, ordering, per_page)
 
         return render(request, 'qa/questions.html', {"questions": questions})
 
 
 class TaggedQuestionsView(View):
 
+    @cache_policy('questions', tags=('tag:{tag_name}',))
     def get(self, request, *args, **kwargs):
         """A list of tagged questions
         """
-        tag = kwargs['tag_name']
-        page = request.GET.get('page')
+        name = kwargs['tag_name']
         sort = request.GET.get('sort')
         per_page = request.GET.get('pagesize')
         if not per_page or per_page == '0' or per_page == 0:
             per_page = qa_settings.QUESTION_PAGE_SIZE
-        if not sort:
-            sort = 'newest'
-        tags = Tag.objects.filter(name=tag)
-        question_list = []
-        unsolved_question_list = []
-        for t in tags:
-            if not t.question.solved:
-                unsolved_question_list.append(t.question)
-            question_list.append(t.question)
-
-        if sort == 'votes':
-            question_list = sorted(question_list, key=lambda i: (
-                i.votes_count, i.created_time), reverse=True)
-        elif sort == 'answers':
-            question_list = sorted(question_list, key=lambda i: (
-                i.solved, i.answers_count, i.created_time), reverse=True)
-        elif sort == 'unanswered':
-            question_list = sorted(unsolved_question_list, key=lambda i: (
-                i.answers_count, i.votes_count, i.created_time))
-        elif sort == 'views':
-            question_list = sorted(question_list, key=lambda i: (
-                i.hits_count, i.created_time), reverse=True)
+        tag = Tag.objects.filter(name=name).first()
+        if tag:
+            question_list = tag.questions.all()
         else:
-            question_list = sorted(
-                question_list, key=lambda i: i.created_time, reverse=True)
-
-        paginator = Paginator(question_list, per_page)
-        try:
-            questions = paginator.page(page)
-        except PageNotAnInteger:
-            questions = paginator.page(1)
-        except EmptyPage:
-            questions = paginator.page(paginator.num_pages)
+            question_list = Question.objects.none()
+        question_list, ordering = sort_questions(question_list, sort)
+        questions = paginate(request, question_list, ordering, per_page)
 
         return render(request, 'qa/questions.html', {"questions": questions})
 
 
 class TagsView(View):
 
+    @cache_policy('tags', tags=('tags',))
     def get(self, request, *args, **kwargs):
         """A list of tags
         """
-        page = request.GET.get('page')
+        sort = request.GET.get('sort')
         per_page = request.GET.get('pagesize')
         if not per_page or per_page == '0' or per_page == 0:
             per_page = qa_settings.TAG_PAGE_SIZE
-        tag_list = Tag.objects.values('name').distinct()
-        paginator = Paginator(tag_list, per_page)
-        try:
-            tags = paginator.page(page)
-        except PageNotAnInteger:
-            tags = paginator.page(1)
-        except EmptyPage:
-            tags = paginator.page(paginator.num_pages)
+        ordering = TAG_ORDERINGS.get(sort, TAG_ORDERINGS['popular'])
+        tag_list = Tag.objects.filter(question_count__gt=0)
+        tags = paginate(request, tag_list, ordering, per_page)
         return render(request, 'qa/tags.html', {'tags': tags})
 
 
 class UsersView(View):
 
+    @cache_policy('users')
     def get(self, request):
         page = request.GET.get('page')
         per_page = request.GET.get('pagesize')
@@ -150,7 +143,7 @@ class UsersView(View):
         # TODO sort
         user_list = User.objects.all()
         paginator = Paginator(user_list, per_page)
-        avatar_path = qa_settings.AVATAR_PATH + 'small/'
+        avatar_path = avatar_url('small', '')
         try:
             users = paginator.page(page)
         except PageNotAnInteger:
@@ -167,23 +160,19 @@ class SearchView(View):
         """Search page
         """
         query = request.GET.get('query')
-        page = request.GET.get('page')
         per_page = request.GET.get('pagesize')
         if not per_page or per_page == '0' or per_page == 0:
             per_page = qa_settings.QUESTION_PAGE_SIZE
-        if query:
-            search = Search(query)
-            questions_list = search.questions()
-        else:
-            questions_list = []
-        # sorting
-        paginator = Paginator(questions_list, per_page)
+        search = Search(query)
+        questions_list = search.questions().select_related('author')
         try:
-            questions = paginator.page(page)
-        except PageNotAnInteger:
-            questions = paginator.page(1)
-        except EmptyPage:
-            questions = paginator.page(paginator.num_pages)
+            questions = paginate(request, questions_list, search.ordering,
+                                 per_page)
+        except InvalidCursor:
+            # ranked results have page numbers only
+            return HttpResponseBadRequest('search results have no cursors')
+        for question in questions:
+            question.highlight = highlight(getattr(question, 'snippet', ''))
         form = SearchForm()
         return render(request, 'qa/search.html',
                       {'form': form, 'questions': questions})
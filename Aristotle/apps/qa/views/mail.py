@@ -5,6 +5,7 @@
 # @update: 11 October 2014 (Saturday)
 # @author: Z. Huang
 import logging
+from django.db import transaction
 from django.http import Http404
 from django.shortcuts import render, redirect
 from django.contrib.auth.models import User
@@ -12,15 +13,17 @@ from django.views.generic import View
 from django.contrib import messages
 from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from Aristotle.apps.qa.forms import MailForm
 from Aristotle.apps.qa.utils import form_errors_handler
-from Aristotle.apps.qa.models import Mail
+from Aristotle.apps.qa.models import MailMessage, MailboxEntry
 from Aristotle.apps.qa.utils import parse_listed_strs
+from Aristotle.apps.qa.pagination import paginate
 import Aristotle.apps.qa.settings as qa_settings
 
 logger = logging.getLogger(__name__)
 
+MAIL_ORDERING = ('-created_time', '-id')
+
 
 class MailsView(View):
 
@@ -31,19 +34,12 @@ class MailsView(View):
             box = kwargs['box']
         else:
             box = 'inbox'
-        page = request.GET.get('page')
         per_page = request.GET.get('pagesize')
         if not per_page or per_page == '0' or per_page == 0:
             per_page = qa_settings.MAIL_PAGE_SIZE
-        mail_list = Mail.objects.order_by(
-            '-created_time').filter(user=user, box=box)
-        paginator = Paginator(mail_list, per_page)
-        try:
-            mails = paginator.page(page)
-        except PageNotAnInteger:
-            mails = paginator.page(1)
-        except EmptyPage:
-            mails = paginator.page(paginator.num_pages)
+        mail_list = MailboxEntry.objects.filter(
+            user=user, box=box).select_related('message')
+        mails = paginate(request, mail_list, MAIL_ORDERING, per_page)
         return render(request, 'qa/mails.html', {'mails': mails})
 
 
@@ -59,7 +55,8 @@ class MailView(View):
             logger.error('mail does not exist')
             raise Http404()
 
-        mail_queryset = Mail.objects.filter(id=mid, user=user)
+        mail_queryset = MailboxEntry.objects.filter(
+            id=mid, user=user).select_related('message')
 
         if not mail_queryset:
             logger.error('mail does not exist')
@@ -97,18 +94,24 @@ class SendMailView(View):
         if form.is_valid():
             try:
                 receivers_list = parse_listed_strs(receivers)
-                for username in receivers_list:
-                    receiver = User.objects.get(username=username)
-                    send_mail = Mail.objects.create(
-                        subject=subject, content=content,
-                        user=user, has_read=True, box='outbox',
-                        sender=sender, receiver=receiver)
-                    send_mail.save()
-                    receive_mail = Mail.objects.create(
-                        subject=subject, content=content,
-                        user=receiver, box='inbox',
-                        sender=sender, receiver=receiver)
-                    receive_mail.save()
+                receivers = list(User.objects.filter(
+                    username__in=receivers_list))
+                unknown = receivers_list - set(
+                    receiver.username for receiver in receivers)
+                if unknown:
+                    messages.error(request, 'user does not exist: ' +
+                                   ', '.join(sorted(unknown)))
+                    return redirect(refer_url)
+                # the message is stored once, each box only points to it
+                with transaction.atomic():
+                    message = MailMessage.objects.create(
+                        subject=subject, content=content, sender=sender)
+                    entries = [MailboxEntry(message=message, user=user,
+                                            box='outbox', has_read=True)]
+                    entries += [MailboxEntry(message=message, user=receiver,
+                                             box='inbox')
+                                for receiver in receivers]
+                    MailboxEntry.objects.bulk_create(entries)
                 # redirect to?
                 return redirect('/mail/')
             except Exception as e:
@@ -5,19 +5,21 @@
 # @update: 04 October 2014 (Saturday)
 # @author: Z. Huang, Liangju
 import logging
-from django.http import Http404, HttpResponse
+from django.db import connection, transaction, IntegrityError
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
 from django.utils.decorators import method_decorator
 from django.utils import timezone
 from django.contrib import messages
 from django.views.generic import View
 from django.contrib.auth.decorators import login_required
-from django.db.models import Prefetch
+from django.db.models import Prefetch, F
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
 from Aristotle.apps.qa.models import Question, Answer
 from Aristotle.apps.qa.models import QuestionComment, QuestionAppend
-from Aristotle.apps.qa.models import QuestionVote, QuestionHit
+from Aristotle.apps.qa.models import QuestionVote
 from Aristotle.apps.qa.models import AnswerComment, AnswerVote
 from Aristotle.apps.qa.models import AnswerAppend
 from Aristotle.apps.qa.models import Tag
@@ -28,11 +30,47 @@ from Aristotle.apps.qa.forms import EditAnswerForm, CommentAnswerForm
 from Aristotle.apps.qa.forms import AppendAnswerForm
 from Aristotle.apps.qa.utils import parse_listed_strs
 from Aristotle.apps.qa.utils import form_errors_handler
+from Aristotle.apps.qa.search import index_question, unindex_question
+from Aristotle.apps.qa.related import update_related, forget_related
+from Aristotle.apps.qa.related import related_questions
+from Aristotle.apps.qa.hot import update_hot_score
+from Aristotle.apps.qa.hits import record_hit
+from Aristotle.apps.qa.fragments import CSRF_PLACEHOLDER, cached_fragment
+from Aristotle.apps.qa.fragments import with_csrf_token, bump_question_version
+from Aristotle.apps.qa.pagecache import invalidate_question_pages
+from Aristotle.apps.qa.inbox import notify_answer, notify_accept
+from Aristotle.apps.qa.inbox import notify_question_comment
+from Aristotle.apps.qa.inbox import notify_answer_comment
+from Aristotle.apps.qa.inbox import forget_question, forget_answer
 import Aristotle.apps.qa.settings as qa_settings
 
 logger = logging.getLogger(__name__)
 
 
+# score of an answer, and the ORDER BY clause of the answers of a
+# question: the accepted one first, then by score
+ANSWER_SCORE = 'upvotes_count - downvotes_count'
+ANSWER_ORDERING = ('-accepted', '-score', '-created_time', '-id')
+COMMENT_ORDERING = ('created_time', 'id')
+
+
+def _vote_counter(vote_type):
+    """name of the answer counter field for a vote type
+    """
+    return 'upvotes_count' if vote_type else 'downvotes_count'
+
+
+def _create_vote(model, **fields):
+    """whether the vote is new, a repeated request finds it there
+    """
+    try:
+        with transaction.atomic():
+            model.objects.create(**fields)
+        return True
+    except IntegrityError:
+        return False
+
+
 class AskQuestionView(View):
 
     @method_decorator(login_required)
@@ -60,11 +98,14 @@ class AskQuestionView(View):
                 question = Question.objects.create(
                     title=title, content=content, author=user)
                 question.save()
+                tags_list = set()
                 if tags:
                     tags_list = parse_listed_strs(tags)
-                    for name in tags_list:
-                        tag = Tag.objects.create(name=name, question=question)
-                        tag.save()
+                    Tag.objects.tag_question(question, tags_list)
+                update_hot_score(question.id)
+                index_question(question)
+                update_related(question)
+                invalidate_question_pages(tags_list)
                 return redirect('/question/{0}/'.format(question.id))
             except Exception as e:
                 logger.error(str(e))
@@ -74,10 +115,116 @@ class AskQuestionView(View):
             return form_errors_handler(request, form, refer_url)
 
 
+def _first_comments(model, parent):
+    """comments of model in order, COMMENT_PAGE_SIZE + 1 at most for
+    each parent, to prefetch for a page of parents
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    column = quote(model._meta.get_field(parent).column)
+    # the number of earlier comments of the same parent
+    where = ('(SELECT COUNT(*) FROM {0} earlier '
+             'WHERE earlier.{1} = {0}.{1} AND '
+             '(earlier.created_time < {0}.created_time OR '
+             'earlier.created_time = {0}.created_time AND '
+             'earlier.id < {0}.id)) < %s').format(table, column)
+    return model.objects.extra(
+        where=[where], params=[qa_settings.COMMENT_PAGE_SIZE + 1]).order_by(
+        *COMMENT_ORDERING).select_related('user')
+
+
+def _trim_comments(parent):
+    """keep the first page of the prefetched comments of a question
+    or answer, and whether it has more
+    """
+    size = qa_settings.COMMENT_PAGE_SIZE
+    parent.more_comments = len(parent.comments) > size
+    parent.comments = parent.comments[:size]
+
+
+def _render_question_body(qid):
+    """title and html of a question with its comments, appends,
+    votes and tags, None if it does not exist
+    """
+    question_comments_queryset = _first_comments(QuestionComment, 'question')
+    question_appends_queryset = QuestionAppend.objects.order_by(
+        'created_time')
+    question_voteups_queryset = QuestionVote.objects.order_by(
+        '-created_time').filter(vote_type=True)
+    question_votedowns_queryset = QuestionVote.objects.order_by(
+        '-created_time').filter(vote_type=False)
+    question_tags_queryset = Tag.objects.all()
+    question_queryset = Question.objects.filter(id=qid).prefetch_related(
+        Prefetch('questioncomment_set',
+                 queryset=question_comments_queryset,
+                 to_attr='comments'),
+        Prefetch('questionappend_set',
+                 queryset=question_appends_queryset,
+                 to_attr='appends'),
+        Prefetch('questionvote_set',
+                 queryset=question_voteups_queryset,
+                 to_attr='upvotes'),
+        Prefetch('questionvote_set',
+                 queryset=question_votedowns_queryset,
+                 to_attr='downvotes'),
+        Prefetch('tag_set',
+                 queryset=question_tags_queryset,
+                 to_attr='tags'))
+    if not question_queryset:
+        return None
+    question = question_queryset[0]
+    _trim_comments(question)
+    html = render_to_string('qa/question_body.html', {
+        'question': question,
+        'question_comment_form': CommentQuestionForm(),
+        'question_append_form': AppendQuestionForm(),
+        'csrf_token': CSRF_PLACEHOLDER,
+    })
+    return {'title': question.title, 'html': html}
+
+
+def _render_question_answers(qid, page, per_page):
+    """html of a page of answers with their comments and appends
+    answers are ordered and paginated by the database, only the page
+    is prefetched
+    """
+    answer_comments_queryset = _first_comments(AnswerComment, 'answer')
+    answer_appends_queryset = AnswerAppend.objects.order_by(
+        'created_time')
+
+    answers = Answer.objects.filter(question_id=qid).select_related('author')
+    answers = answers.extra(select={'score': ANSWER_SCORE})
+    answers = answers.order_by(*ANSWER_ORDERING).prefetch_related(
+        Prefetch('answercomment_set',
+                 queryset=answer_comments_queryset,
+                 to_attr='comments'),
+        Prefetch('answerappend_set',
+                 queryset=answer_appends_queryset,
+                 to_attr='appends'))
+
+    paginator = Paginator(answers, per_page)
+    try:
+        answers = paginator.page(page)
+    except PageNotAnInteger:
+        answers = paginator.page(1)
+    except EmptyPage:
+        answers = paginator.page(paginator.num_pages)
+    for answer in answers:
+        _trim_comments(answer)
+    return render_to_string('qa/question_answers.html', {
+        'answers': answers,
+        'answer_comment_form': CommentAnswerForm(),
+        'answer_append_form': AppendAnswerForm(),
+        'csrf_token': CSRF_PLACEHOLDER,
+    })
+
+
 class QuestionView(View):
 
     def get(self, request, *args, **kwargs):
         """Question page
+        the question and answers are cached fragments, so a view of a
+        popular question does not query the database
         """
         qid = kwargs['question_id']
 
@@ -87,9 +234,9 @@ class QuestionView(View):
             logger.error('question does not exist')
             raise Http404()
 
-        question_queryset = Question.objects.filter(id=qid)
-
-        if not question_queryset:
+        body = cached_fragment(qid, 'body',
+                               lambda: _render_question_body(qid))
+        if body is None:
             logger.error('question does not exist')
             raise Http404()
 
@@ -99,99 +246,23 @@ class QuestionView(View):
             per_page = request.GET.get('pagesize')
             if not per_page or per_page == '0' or per_page == 0:
                 per_page = qa_settings.ANSWER_PAGE_SIZE
-            # store session for anonymous users
-            question = question_queryset[0]
-            if hasattr(request, 'session') and not request.session.session_key:
-                request.session.save()
-            session = request.session.session_key
-            hitted = QuestionHit.objects.filter(
-                question=question, session=session)
-            if not hitted:
-                ip = request.META['REMOTE_ADDR']
-                hit = QuestionHit.objects.create(question=question,
-                                                 ip=ip,
-                                                 session=session)
-                hit.save()
-            # select comments, appends, votes, tags for the question
-
-            # comments limits
-            question_comments_queryset = QuestionComment.objects.order_by(
-                'created_time')
-            question_appends_queryset = QuestionAppend.objects.order_by(
-                'created_time')
-            question_voteups_queryset = QuestionVote.objects.order_by(
-                '-created_time').filter(vote_type=True)
-            question_votedowns_queryset = QuestionVote.objects.order_by(
-                '-created_time').filter(vote_type=False)
-            question_tags_queryset = Tag.objects.all()
-            question_queryset = question_queryset.prefetch_related(
-                Prefetch('questioncomment_set',
-                         queryset=question_comments_queryset,
-                         to_attr='comments'),
-                Prefetch('questionappend_set',
-                         queryset=question_appends_queryset,
-                         to_attr='appends'),
-                Prefetch('questionvote_set',
-                         queryset=question_voteups_queryset,
-                         to_attr='upvotes'),
-                Prefetch('questionvote_set',
-                         queryset=question_votedowns_queryset,
-                         to_attr='downvotes'),
-                Prefetch('tag_set',
-                         queryset=question_tags_queryset,
-                         to_attr='tags'))
+            # buffered, anonymous users are counted by IP
+            session = None
+            if hasattr(request, 'session'):
+                session = request.session.session_key
+            record_hit(qid, request.META.get('REMOTE_ADDR', ''), session)
+            answers = cached_fragment(
+                qid, 'answers',
+                lambda: _render_question_answers(qid, page, per_page),
+                page, per_page)
 
-            question = question_queryset[0]
-            # TODO Limiting the number of comments
-            answer_comments_queryset = AnswerComment.objects.order_by(
-                'created_time')
-            answer_appends_queryset = AnswerAppend.objects.order_by(
-                'created_time')
-            answer_upvotes_queryset = AnswerVote.objects.order_by(
-                '-created_time').filter(vote_type=True)
-            answer_downvotes_queryset = AnswerVote.objects.order_by(
-                '-created_time').filter(vote_type=False)
-
-            answers = Answer.objects.filter(
-                question=question)
-            answers = answers.prefetch_related(
-                Prefetch('answercomment_set',
-                         queryset=answer_comments_queryset,
-                         to_attr='comments'),
-                Prefetch('answervote_set',
-                         queryset=answer_upvotes_queryset,
-                         to_attr='upvotes'),
-                Prefetch('answervote_set',
-                         queryset=answer_downvotes_queryset,
-                         to_attr='downvotes'),
-                Prefetch('answerappend_set',
-                         queryset=answer_appends_queryset,
-                         to_attr='appends'))
-            answer_list = sorted(answers, key=lambda i: (
-                i.accepted, i.abs_votes_count, i.created_time),
-                reverse=True)
-
-            paginator = Paginator(answer_list, per_page)
-            try:
-                answers = paginator.page(page)
-            except PageNotAnInteger:
-                answers = paginator.page(1)
-            except EmptyPage:
-                answers = paginator.page(paginator.num_pages)
-
-            question_comment_form = CommentQuestionForm()
-            question_append_form = AppendQuestionForm()
-            answer_form = AnswerForm()
-            answer_comment_form = CommentAnswerForm()
-            answer_append_form = AppendAnswerForm()
             data = {
-                'question': question,
-                'answers': answers,
-                'answer_form': answer_form,
-                'question_comment_form': question_comment_form,
-                'question_append_form': question_append_form,
-                'answer_comment_form': answer_comment_form,
-                'answer_append_form': answer_append_form,
+                'question_id': qid,
+                'question_title': body['title'],
+                'question_body': with_csrf_token(request, body['html']),
+                'question_answers': with_csrf_token(request, answers),
+                'related_questions': related_questions(qid),
+                'answer_form': AnswerForm(),
             }
 
             return render(request, 'qa/question.html', data)
@@ -289,6 +360,8 @@ class QuestionActionView(View):
             logger.error(str(e))
             messages.error(request, str(e))
             return redirect(refer_url)
+        finally:
+            bump_question_version(qid)
 
     def _edit(self, request, question_queryset, refer_url):
         """Edit a question by its author
@@ -305,17 +378,19 @@ class QuestionActionView(View):
                 return HttpResponse(status=403)
             question_queryset.update(
                 title=title, content=content, updated_time=timezone.now())
+            stored_tags = set(question.tag_set.values_list('name', flat=True))
+            tags_list = set()
             if tags:
                 tags_list = parse_listed_strs(tags)
-                stored_tags = set(
-                    question.tag_set.values_list('name', flat=True))
                 inter = tags_list & stored_tags
                 to_del = stored_tags - inter
                 to_add = tags_list - inter
-                for name in to_del:
-                    Tag.objects.filter(name=name, question=question).delete()
-                for name in to_add:
-                    Tag.objects.create(name=name, question=question).save()
+                Tag.objects.untag_question(question, to_del)
+                Tag.objects.tag_question(question, to_add)
+            question = Question.objects.get(id=question.id)
+            index_question(question)
+            update_related(question)
+            invalidate_question_pages(stored_tags | tags_list)
             redirect_uri = '/question/{0}/'.format(question.id)
             return redirect(redirect_uri)
         else:
@@ -332,6 +407,7 @@ class QuestionActionView(View):
                                                      user=request.user,
                                                      content=content)
             comment.save()
+            notify_question_comment(comment)
             redirect_uri = '/question/{0}/'.format(question.id)
             return redirect(redirect_uri)
         else:
@@ -358,10 +434,18 @@ class QuestionActionView(View):
     def _delete(self, request, question_queryset):
         """Delete a question by its author
         """
-        if request.user != question_queryset[0].author:
+        question = question_queryset[0]
+        if request.user != question.author:
             logger.error('not authorized')
             return HttpResponse(status=403)
-        question_queryset.delete()
+        tag_names = list(question.tag_set.values_list('name', flat=True))
+        Tag.objects.untag_question(question)
+        with transaction.atomic():
+            forget_question(question)
+            question_queryset.delete()
+        unindex_question(question.id)
+        forget_related(question.id)
+        invalidate_question_pages(tag_names)
         return redirect('/')
 
     def _vote(self, request, question_queryset, up=True):
@@ -375,10 +459,13 @@ class QuestionActionView(View):
             if voted:
                 if voted[0].vote_type != up:
                     voted.delete()
-            else:
-                vote = QuestionVote.objects.create(
-                    question=question, user=user, vote_type=up)
-                vote.save()
+                    question_queryset.update(
+                        votes_count=F('votes_count') - 1)
+                    update_hot_score(question.id)
+            elif _create_vote(QuestionVote, question=question, user=user,
+                              vote_type=up):
+                question_queryset.update(votes_count=F('votes_count') + 1)
+                update_hot_score(question.id)
         redirect_uri = '/question/{0}/'.format(question.id)
         return redirect(redirect_uri)
 
@@ -393,6 +480,10 @@ class QuestionActionView(View):
                                            question=question,
                                            author=request.user)
             answer.save()
+            question_queryset.update(answers_count=F('answers_count') + 1)
+            update_hot_score(question.id)
+            index_question(question)
+            notify_answer(answer)
             redirect_uri = '/question/{0}/'.format(question.id)
             return redirect(redirect_uri)
         else:
@@ -451,6 +542,7 @@ class AnswerActionView(View):
         if not answer_queryset:
             logger.error('answer does not exist')
             raise Http404()
+        question_id = answer_queryset[0].question_id
         try:
             if action == 'edit':
                 return self._edit(request, answer_queryset, refer_url)
@@ -470,6 +562,8 @@ class AnswerActionView(View):
             logger.error(str(e))
             messages.error(request, str(e))
             return redirect(refer_url)
+        finally:
+            bump_question_version(question_id)
 
     def _edit(self, request, answer_queryset, refer_url):
         """Edit answer by its author
@@ -483,6 +577,7 @@ class AnswerActionView(View):
         if form.is_valid():
             answer_queryset.update(
                 content=content, updated_time=timezone.now())
+            index_question(answer.question)
             redirect_uri = '/question/{0}/'.format(answer.question.id)
             return redirect(redirect_uri)
         else:
@@ -506,10 +601,12 @@ class AnswerActionView(View):
         # but, this current design makes the calculation of credits
         # much easier, since in this case we do not have to track
         # the credit changes for each answer and user
-        if not question.solved and not answer.accepted:
+        # only solved is written, the counters of the question may have
+        # changed since it was read
+        if not answer.accepted and Question.objects.filter(
+                id=question.id, solved=False).update(solved=True):
             answer_queryset.update(accepted=True, accepted_time=timezone.now())
-            question.solved = True
-            question.save()
+            notify_accept(answer)
         return redirect(redirect_uri)
 
     def _comment(self, request, answer_queryset, refer_url):
@@ -523,6 +620,7 @@ class AnswerActionView(View):
                                                    user=request.user,
                                                    content=content)
             comment.save()
+            notify_answer_comment(comment)
             redirect_uri = '/question/{0}/'.format(answer.question.id)
             return redirect(redirect_uri)
         else:
@@ -556,9 +654,14 @@ class AnswerActionView(View):
             return HttpResponse(status=403)
         question = answer.question
         if question.solved and answer.accepted:
-            question.solved = False
-            question.save()
-        answer_queryset.delete()
+            Question.objects.filter(id=question.id).update(solved=False)
+        with transaction.atomic():
+            forget_answer(answer)
+            answer_queryset.delete()
+        Question.objects.filter(id=question.id).update(
+            answers_count=F('answers_count') - 1)
+        update_hot_score(question.id)
+        index_question(question)
         redirect_uri = '/question/{0}/'.format(answer.question.id)
         return redirect(redirect_uri)
 
@@ -572,10 +675,48 @@ class AnswerActionView(View):
         if user != answer.author:
             if voted:
                 if voted[0].vote_type != up:
+                    counter = _vote_counter(voted[0].vote_type)
                     voted.delete()
-            else:
-                vote = AnswerVote.objects.create(
-                    answer=answer, user=user, vote_type=up)
-                vote.save()
+                    answer_queryset.update(**{counter: F(counter) - 1})
+            elif _create_vote(AnswerVote, answer=answer, user=user,
+                              vote_type=up):
+                counter = _vote_counter(up)
+                answer_queryset.update(**{counter: F(counter) + 1})
         redirect_uri = '/question/{0}/'.format(answer.question.id)
         return redirect(redirect_uri)
+
+
+class CommentsView(View):
+
+    def get(self, request, *args, **kwargs):
+        """a page of the comments of a question or answer as JSON,
+        for the comments after those of the question page
+        """
+        if 'answer_id' in kwargs:
+            parent = Answer.objects.filter(id=kwargs['answer_id'])
+            comments = AnswerComment.objects.filter(
+                answer_id=kwargs['answer_id'])
+        else:
+            parent = Question.objects.filter(id=kwargs['question_id'])
+            comments = QuestionComment.objects.filter(
+                question_id=kwargs['question_id'])
+        if not parent.exists():
+            raise Http404
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        size = qa_settings.COMMENT_PAGE_SIZE
+        start = (page - 1) * size
+        comments = list(comments.order_by(*COMMENT_ORDERING).select_related(
+            'user')[start:start + size + 1])
+        return JsonResponse({
+            'page': page,
+            'has_next': len(comments) > size,
+            'comments': [{
+                'id': comment.id,
+                'user': comment.user.username,
+                'content': comment.content,
+                'created_time': comment.created_time.isoformat(),
+            } for comment in comments[:size]],
+        })
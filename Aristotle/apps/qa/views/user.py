@@ -14,6 +14,7 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.views.generic import View
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 
 from Aristotle.apps.qa.models import Question, Answer
 from Aristotle.apps.qa.models import Member, Activation
@@ -24,6 +25,8 @@ from Aristotle.apps.qa.forms import EditProfileForm, EditAccountForm
 from Aristotle.apps.qa.forms import EditAvatarForm
 from Aristotle.apps.qa.notification import EmailNotification
 from Aristotle.apps.qa.utils import form_errors_handler
+from Aristotle.apps.qa.avatars import save_avatar, avatar_url
+from Aristotle.apps.qa.uploads import ImageUploadHandler
 import Aristotle.apps.qa.settings as qa_settings
 
 logger = logging.getLogger(__name__)
@@ -103,8 +106,7 @@ class SignUpView(View):
                 user.save()
                 Member.objects.create(user=user).save()
                 Activation.objects.create(user=user).save()
-                # only for testing
-                # TODO handle emails concurrently (async queue)
+                # queued, sent by the send_queued_mail worker
                 EmailNotification(user).send_verfication()
                 return redirect('/signin/')
             except Exception as e:
@@ -156,7 +158,7 @@ class ProfileView(View):
             avatar = str(user.member.avatar)
         else:
             avatar = qa_settings.DEFAULT_AVATAR
-        avatar_path = qa_settings.AVATAR_PATH + 'large/' + avatar
+        avatar_path = avatar_url('large', avatar)
 
         return render(request, 'qa/profile.html',
                       {'user': user,
@@ -336,6 +338,17 @@ class EditAccountView(View):
 
 class EditAvatarView(View):
 
+    # the upload handlers are set before the CSRF check reads the upload
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        self.upload_handler = ImageUploadHandler(request)
+        request.upload_handlers.insert(0, self.upload_handler)
+        return self._dispatch(request, *args, **kwargs)
+
+    @method_decorator(csrf_protect)
+    def _dispatch(self, request, *args, **kwargs):
+        return super(EditAvatarView, self).dispatch(request, *args, **kwargs)
+
     @method_decorator(login_required)
     def get(self, request, **kwargs):
         """user avatar page
@@ -358,7 +371,7 @@ class EditAvatarView(View):
             avatar = str(user.member.avatar)
         else:
             avatar = qa_settings.DEFAULT_AVATAR
-        avatar_path = qa_settings.AVATAR_PATH + 'large/' + avatar
+        avatar_path = avatar_url('large', avatar)
         form = EditAvatarForm()
         return render(request, 'qa/edit_avatar.html',
                       {'avatar_path': avatar_path, 'form': form})
@@ -382,14 +395,19 @@ class EditAvatarView(View):
 
         refer_url = request.META.get('HTTP_REFERER') or '/'
         form = EditAvatarForm(request.POST, request.FILES)
+        if self.upload_handler.error:
+            messages.error(request, self.upload_handler.error)
+            return redirect(refer_url)
 
         if form.is_valid():
             try:
                 upload_avatar = request.FILES.get('avatar')
                 if not upload_avatar:
                     raise Exception('Incorrect image')
-                user.member.avatar = upload_avatar
-                user.member.save_avatar()
+                # named by its content, not by what the client says
+                upload_avatar.name = 'avatar.' + \
+                    self.upload_handler.image_types['avatar']
+                save_avatar(user.member, upload_avatar)
                 return redirect(refer_url)
             except Exception as e:
                 logger.error(str(e))
@@ -491,7 +509,6 @@ class ResetPasswordView(View):
                 form = ResetForm(request.POST)
                 if form.is_valid():
                     user = User.objects.get(email=email)
-                    # TODO Email queue
                     EmailNotification(user).send_reset_password()
                     msg = 'please check your email to retrieve a reset link'
                     messages.success(request, msg)
@@ -5,6 +5,9 @@
 # @update: Sep. 7th, 2014
 # @author:
 import os
+import sys
+import tempfile
+from django.core.exceptions import ImproperlyConfigured
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 
 # SECURITY WARNING: keep the secret key used in production secret!
@@ -34,14 +37,12 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE_CLASSES = (
-    # 'django.middleware.cache.UpdateCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    # 'django.middleware.cache.FetchFromCacheMiddleware',
 )
 
 ROOT_URLCONF = 'Aristotle.urls'
@@ -55,10 +56,49 @@ DATABASES = {
     }
 }
 
+# Cache backends, picked by the ARISTOTLE_CACHE environment variable:
+# 'shm' is shared by the workers of a host through a memory-mapped
+# file, 'file' is the fallback where there is no tmpfs, 'memcached'
+# runs across hosts. 'locmem' is private to a process and fails like
+# memcached would; cached question fragments and pages are invalidated
+# through the cache, so it only suits a server of one process, and the
+# tests, which must not see the entries of earlier runs.
+# shm caches a value only if it fits a slot of SLOT_SIZE bytes once
+# compressed; a full page of answers, some 100 KB of HTML, takes a
+# tenth of that
+SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'Aristotle.apps.qa.cache.StrictLocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'shm': {
+        'BACKEND': 'Aristotle.apps.qa.cache.SharedMemoryCache',
+        'LOCATION': os.path.join(SHM_DIR, 'aristotle-cache'),
+        'OPTIONS': {'SLOTS': 2048, 'SLOT_SIZE': 65536, 'WAYS': 8},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'aristotle-cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': '127.0.0.1:11211',
+    },
+}
+
+TESTING = sys.argv[1:2] == ['test']
+ARISTOTLE_CACHE = os.environ.get('ARISTOTLE_CACHE',
+                                 'locmem' if TESTING else 'shm')
+if ARISTOTLE_CACHE not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        'ARISTOTLE_CACHE is %r, it should be one of %s' % (
+            ARISTOTLE_CACHE, ', '.join(sorted(CACHE_BACKENDS))))
+
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-    }
+    'default': CACHE_BACKENDS[ARISTOTLE_CACHE],
 }
 
 LANGUAGE_CODE = 'en-us'
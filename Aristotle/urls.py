@@ -5,7 +5,8 @@
 # @update: 11 October 2014 (Saturday)
 # @author: Z. Huang, Liangju
 from django.conf.urls import patterns, include, url
-from Aristotle.apps.qa.views import user, lists, question, mail
+from Aristotle.apps.qa.views import user, lists, question, mail, api
+from Aristotle.apps.qa.views import inbox, avatar
 from django.contrib import admin
 
 admin.autodiscover()
@@ -32,6 +33,8 @@ urlpatterns = patterns(
         user.EditProfileView.as_view(), name='edit-profile'),
     url(r'^profile/(?P<user_id>[0-9]+)/edit/$',
         user.EditProfileView.as_view(), name='edit-profile'),
+    url(r'^avatar/(?P<size>[a-z]+)/(?P<filename>[0-9A-Za-z_./-]+)$',
+        avatar.AvatarView.as_view(), name='avatar'),
     url(r'^profile/avatar/$',
         user.EditAvatarView.as_view(), name='edit-avatar'),
     url(r'^profile/(?P<user_id>[0-9]+)/avatar/$',
@@ -48,6 +51,12 @@ urlpatterns = patterns(
         mail.SendMailView.as_view(), name='send-mail'),
     url(r'^mail/(?P<mail_id>[0-9]+)/$',
         mail.MailView.as_view(), name='mail'),
+    url(r'^notifications/$',
+        inbox.NotificationsView.as_view(), name='notifications'),
+    url(r'^notifications/unread/$',
+        inbox.UnreadView.as_view(), name='notifications-unread'),
+    url(r'^notifications/read/$',
+        inbox.ReadView.as_view(), name='notifications-read'),
     url(r'^question/(?P<question_id>[0-9]+)/$',
         question.QuestionView.as_view(),
         name='question-view'),
@@ -58,6 +67,10 @@ urlpatterns = patterns(
         name='question-action'),
     url(r'^answer/(?P<answer_id>[0-9]+)/(?P<action>accept|edit|comment|delete|append|upvote|downvote)/$',
         question.AnswerActionView.as_view(), name='answer-action'),
+    url(r'^question/(?P<question_id>[0-9]+)/comments/$',
+        question.CommentsView.as_view(), name='question-comments'),
+    url(r'^answer/(?P<answer_id>[0-9]+)/comments/$',
+        question.CommentsView.as_view(), name='answer-comments'),
     url(r'^$', lists.HomeView.as_view(), name='home'),
     url(r'^questions/$', lists.QuestionsView.as_view(), name='questions'),
     url(r'^questions/tagged/(?P<tag_name>[\w0-9\-]+)/$',
@@ -67,4 +80,15 @@ urlpatterns = patterns(
     url(r'^users/?query=[\w0-9]+/$', lists.UsersView.as_view(),
         name='user-list'),
     url(r'^search/$', lists.SearchView.as_view(), name='search'),
+    url(r'^api/questions/$',
+        api.QuestionsApiView.as_view(), name='api-questions'),
+    url(r'^api/questions/tagged/(?P<tag_name>[\w0-9\-]+)/$',
+        api.QuestionsApiView.as_view(), name='api-tagged-questions'),
+    url(r'^api/questions/(?P<question_id>[0-9]+)/$',
+        api.QuestionApiView.as_view(), name='api-question'),
+    url(r'^api/questions/(?P<question_id>[0-9]+)/answers/$',
+        api.AnswersApiView.as_view(), name='api-answers'),
+    url(r'^api/tags/$', api.TagsApiView.as_view(), name='api-tags'),
+    url(r'^api/users/$', api.UsersApiView.as_view(), name='api-users'),
+    url(r'^api/search/$', api.SearchApiView.as_view(), name='api-search'),
 )
@@ -0,0 +1,43 @@
+/*
+ * Loads the next page of comments of a question or an answer in place
+ * of the page of JSON its "More comments" link points to.
+ */
+(function () {
+    'use strict';
+
+    function append(list, comments) {
+        for (var i = 0; i < comments.length; i++) {
+            var item = document.createElement('li');
+            item.textContent = comments[i].content + ' | ' + comments[i].user;
+            list.appendChild(item);
+        }
+    }
+
+    function load(link) {
+        var request = new XMLHttpRequest();
+        request.open('GET', link.href);
+        request.setRequestHeader('X-Requested-With', 'XMLHttpRequest');
+        request.onload = function () {
+            if (request.status !== 200) {
+                return;
+            }
+            var data = JSON.parse(request.responseText);
+            append(link.previousElementSibling, data.comments);
+            if (data.has_next) {
+                link.href = link.href.replace(/page=\d+/,
+                                              'page=' + (data.page + 1));
+            } else {
+                link.parentNode.removeChild(link);
+            }
+        };
+        request.send();
+    }
+
+    document.addEventListener('click', function (event) {
+        var link = event.target;
+        if (link.className === 'more-comments') {
+            event.preventDefault();
+            load(link);
+        }
+    });
+}());
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#
+# @name:  api.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+import json
+from django.test import TestCase
+from django.test import Client
+from Aristotle.apps.qa.models import Question, Answer
+
+
+class ApiTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        user_data = {'username': 'test',
+                     'email': 'test@gmail.com',
+                     'password': 'test',
+                     'repassword': 'test'}
+        self.client.post('/signup/', user_data)
+        self.client.post('/signin/', {'username': 'test', 'password': 'test'})
+        for i in range(3):
+            self.client.post('/question/ask/', {'title': 'title %d' % i,
+                                                'content': 'content %d' % i,
+                                                'tags': 'tag%d python' % i})
+        self.client.get('/signout/')
+
+    def _get(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response, json.loads(response.content.decode('utf-8'))
+
+    def test_questions(self):
+        response, data = self._get('/api/questions/')
+        self.assertEqual(data['count'], 3)
+        self.assertEqual([q['id'] for q in data['items']], [3, 2, 1])
+        self.assertEqual(data['items'][0]['author'], 'test')
+        self.assertNotIn('content', data['items'][0])
+        response, data = self._get('/api/questions/?fields=id,tags&sort=votes')
+        self.assertEqual(data['items'][0], {'id': 3,
+                                            'tags': ['python', 'tag2']})
+        response, data = self._get('/api/questions/tagged/tag1/')
+        self.assertEqual([q['id'] for q in data['items']], [2])
+        response = self.client.get('/api/questions/?fields=id,password')
+        self.assertEqual(response.status_code, 400)
+
+    def test_conditional_list(self):
+        response, _ = self._get('/api/questions/')
+        etag = response['ETag']
+        response = self.client.get('/api/questions/',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        # counters change the representation
+        Question.objects.filter(id=2).update(votes_count=1)
+        response, _ = self._get('/api/questions/', HTTP_IF_NONE_MATCH=etag)
+        self.assertNotEqual(response['ETag'], etag)
+        # so do the selected fields
+        response, _ = self._get('/api/questions/?fields=id',
+                                HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_question(self):
+        response, data = self._get('/api/questions/1/')
+        self.assertEqual(data['content'], 'content 0')
+        self.assertEqual(data['tags'], ['python', 'tag0'])
+        self.assertNotIn('Last-Modified', response)
+        response = self.client.get('/api/questions/1/',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get('/api/questions/9/').status_code,
+                         404)
+        # without counters the last modification time is known
+        response, data = self._get('/api/questions/1/?fields=title')
+        self.assertEqual(data, {'title': 'title 0'})
+        last_modified = response['Last-Modified']
+        response = self.client.get('/api/questions/1/?fields=title',
+                                   HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_answers(self):
+        question = Question.objects.get(id=1)
+        for votes in (0, 2, 1):
+            Answer.objects.create(question=question, author=question.author,
+                                  content='answer', upvotes_count=votes)
+        response, data = self._get(
+            '/api/questions/1/answers/?fields=id,score')
+        self.assertEqual(data['items'], [{'id': 2, 'score': 2},
+                                         {'id': 3, 'score': 1},
+                                         {'id': 1, 'score': 0}])
+        self.assertEqual(
+            self.client.get('/api/questions/9/answers/').status_code, 404)
+
+    def test_tags_users(self):
+        response, data = self._get('/api/tags/?fields=name,question_count')
+        self.assertEqual(data['items'][0],
+                         {'name': 'python', 'question_count': 3})
+        response, data = self._get('/api/users/?fields=username')
+        self.assertEqual(data['items'], [{'username': 'test'}])
+
+    def test_search(self):
+        response, data = self._get('/api/search/?query=title&fields=id')
+        self.assertEqual(data['count'], 3)
+        response = self.client.get('/api/search/?query=title&after=WzFd')
+        self.assertEqual(response.status_code, 400)
+        response, data = self._get('/api/search/?query=&fields=id')
+        self.assertEqual(data['items'], [])
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+#
+# @name:  cache.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+import os
+import shutil
+import tempfile
+from django.test import TestCase
+from django.test import Client
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from Aristotle.apps.qa.models import Question, Answer, AnswerComment
+from Aristotle.apps.qa.views.question import _render_question_answers
+from Aristotle.apps.qa.cache import SharedMemoryCache, StrictLocMemCache
+from Aristotle.apps.qa.pagecache import page_key
+from Aristotle.apps.qa.fragments import question_version
+from Aristotle.apps.qa.fragments import bump_question_version
+import Aristotle.apps.qa.settings as qa_settings
+
+
+class SharedMemoryCacheTest(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = self._cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def _cache(self):
+        return SharedMemoryCache(os.path.join(self.path, 'cache'), {
+            'OPTIONS': {'SLOTS': 16, 'SLOT_SIZE': 256, 'WAYS': 4}})
+
+    def test_get_set(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.set('a', {'b': [1, 2]})
+        self.assertEqual(self.cache.get('a'), {'b': [1, 2]})
+        self.cache.set('a', u'\u4e2d')
+        self.assertEqual(self.cache.get('a'), u'\u4e2d')
+        self.assertFalse(self.cache.add('a', 1))
+        self.assertTrue(self.cache.add('b', 1))
+        self.assertEqual(self.cache.incr('b', 2), 3)
+        self.assertEqual(self.cache.get('b'), 3)
+        self.assertRaises(ValueError, self.cache.incr, 'c')
+        self.cache.delete('b')
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get_many(['a', 'b']), {'a': u'\u4e2d'})
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_timeout(self):
+        self.cache.set('a', 1, 0)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertTrue(self.cache.add('a', 2, None))
+        self.assertEqual(self.cache.get('a'), 2)
+
+    def test_large_value(self):
+        self.cache.set('a', 'small')
+        # compressed to a few bytes
+        self.cache.set('b', 'x' * 4096)
+        self.assertEqual(self.cache.get('b'), 'x' * 4096)
+        self.cache.set('a', os.urandom(256))
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_answers_fragment(self):
+        # a full page of answers, with the default shm options
+        user = User.objects.create_user('test', 'test@test.com', 'test')
+        question = Question.objects.create(title='title', content='content',
+                                           author=user)
+        words = ('list sort key index query python value order table '
+                 'row column join cache page answer').split()
+        for i in range(qa_settings.ANSWER_PAGE_SIZE):
+            content = ' '.join(words[(i * j) % len(words)] + str(j)
+                               for j in range(60))
+            answer = Answer.objects.create(question=question, author=user,
+                                           content=content)
+            for j in range(3):
+                AnswerComment.objects.create(answer=answer, user=user,
+                                             content='comment %d' % j)
+        html = _render_question_answers(question.id, 1,
+                                        qa_settings.ANSWER_PAGE_SIZE)
+        options = settings.CACHE_BACKENDS['shm']['OPTIONS']
+        self.assertGreater(len(html), options['SLOT_SIZE'])
+        shm = SharedMemoryCache(os.path.join(self.path, 'shm'),
+                                {'OPTIONS': options})
+        shm.set('answers', html)
+        self.assertEqual(shm.get('answers'), html)
+
+    def test_eviction(self):
+        for i in range(64):
+            self.cache.set('key%d' % i, i, 100 + i)
+        values = [self.cache.get('key%d' % i) for i in range(64)]
+        kept = [value for value in values if value is not None]
+        self.assertEqual(len(kept), 16)
+        # the entries closest to expiry go first
+        self.assertEqual(self.cache.get('key63'), 63)
+
+    def test_shared(self):
+        self.cache.set('a', 1)
+        pid = os.fork()
+        if not pid:
+            other = self._cache()
+            other.incr('a')
+            other.set('b', 'child')
+            os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(self.cache.get('a'), 2)
+        self.assertEqual(self.cache.get('b'), 'child')
+
+
+class FragmentVersionTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.timeout = qa_settings.QUESTION_VERSION_TIMEOUT
+
+    def tearDown(self):
+        qa_settings.QUESTION_VERSION_TIMEOUT = self.timeout
+
+    def test_versions_expire(self):
+        version = question_version(1)
+        self.assertEqual(question_version(1), version)
+        bump_question_version(1)
+        self.assertNotEqual(question_version(1), version)
+        # an expired version is a new one
+        qa_settings.QUESTION_VERSION_TIMEOUT = 0
+        cache.clear()
+        version = question_version(1)
+        self.assertIsNone(cache.get('qa:question:1:version'))
+        self.assertNotEqual(question_version(1), version)
+
+
+class StrictLocMemCacheTest(TestCase):
+
+    def test_memcached_rules(self):
+        strict = StrictLocMemCache('strict', {
+            'OPTIONS': {'MAX_VALUE_SIZE': 100}})
+        self.assertRaises(ValueError, strict.set, 'a b', 1)
+        self.assertRaises(ValueError, strict.get, 'a' * 251)
+        strict.set('a', 'small')
+        strict.set('a', 'x' * 100)
+        self.assertIsNone(strict.get('a'))
+
+
+class PageCacheTest(TestCase):
+
+    def setUp(self):
+        self.cache_policies = qa_settings.CACHE_POLICIES
+        cache.clear()
+        self.client = Client()
+        user_data = {'username': 'test',
+                     'email': 'test@gmail.com',
+                     'password': 'test',
+                     'repassword': 'test'}
+        self.client.post('/signup/', user_data)
+        self.client.post('/signin/', {'username': 'test', 'password': 'test'})
+        self.client.post('/question/ask/', {'title': 'first question',
+                                            'content': 'content',
+                                            'tags': 'tag1'})
+
+    def tearDown(self):
+        qa_settings.CACHE_POLICIES = self.cache_policies
+
+    def test_anonymous(self):
+        client = Client()
+        client.get('/questions/')
+        with self.assertNumQueries(0):
+            response = client.get('/questions/')
+        self.assertContains(response, 'first question')
+        self.assertNotContains(response, 'QA_CSRF_TOKEN')
+        self.assertContains(response, response.cookies['csrftoken'].value)
+        self.assertIn('max-age=60', response['Cache-Control'])
+        # another page is rendered on its own
+        response = client.get('/questions/?sort=votes')
+        self.assertIsNotNone(response.context)
+
+    def test_query_order(self):
+        client = Client()
+        client.get('/questions/?sort=votes&page=1')
+        with self.assertNumQueries(0):
+            client.get('/questions/?page=1&sort=votes')
+
+    def test_invalidate(self):
+        client = Client()
+        for url in ('/', '/questions/', '/questions/tagged/tag1/'):
+            client.get(url)
+            self.client.post('/question/ask/', {'title': 'question ' + url,
+                                                'content': 'content',
+                                                'tags': 'tag1'})
+            self.assertContains(client.get(url), 'question ' + url)
+        self.assertNotContains(client.get('/tags/'), 'tag2')
+        self.client.post('/question/ask/', {'title': 'tagged question',
+                                            'content': 'content',
+                                            'tags': 'tag2'})
+        self.assertContains(client.get('/tags/'), 'tag2')
+        question_id = client.get('/?tab=new').context['questions'][0].id
+        self.client.post('/question/%d/delete/' % question_id)
+        self.assertNotContains(client.get('/tags/'), 'tag2')
+
+    def test_stale(self):
+        client = Client()
+        client.get('/questions/')
+        response = self.client.get('/questions/')
+        key = page_key('questions', response.wsgi_request)
+        entry = cache.get(key)
+        entry['fresh_until'] = 0
+        cache.set(key, entry)
+        # another request is rendering the page
+        cache.add(key + ':lock', 1)
+        self.client.post('/question/ask/', {'title': 'second question',
+                                            'content': 'content',
+                                            'tags': 'tag1'})
+        response = client.get('/questions/')
+        self.assertIsNone(response.context)
+        self.assertNotContains(response, 'second question')
+        cache.delete(key + ':lock')
+        response = client.get('/questions/')
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'second question')
+        self.assertIsNone(cache.get(key + ':lock'))
+
+    def test_login(self):
+        self.client.get('/questions/')
+        response = self.client.get('/questions/')
+        self.assertIsNotNone(response.context)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_policy_off(self):
+        qa_settings.CACHE_POLICIES = {'questions': 0}
+        client = Client()
+        client.get('/questions/')
+        response = client.get('/questions/')
+        self.assertIsNotNone(response.context)
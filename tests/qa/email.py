@@ -4,11 +4,28 @@
 # @create: 01 October 2014 (Wednesday)
 # @update: 01 October 2014 (Wednesday)
 # @author: Z. Huang
+import os
+import socket
+import smtpd
+import asyncore
+import threading
+from datetime import timedelta
 from django.core import mail
 from django.test import TestCase
 from django.test import Client
+from django.test.utils import override_settings
+from django.core.management import call_command
 from django.contrib.auth.models import User
+from django.utils import timezone
+from Aristotle.apps.qa.models import OutgoingEmail
 from Aristotle.apps.qa.notification import EmailNotification
+from Aristotle.apps.qa.models import Question, Answer
+from Aristotle.apps.qa.models import MailMessage, MailboxEntry
+from Aristotle.apps.qa.models import QuestionComment, AnswerComment
+from Aristotle.apps.qa.mailqueue import queue_mail, deliver_mail
+from Aristotle.apps.qa.mailqueue import close_connection
+from Aristotle.apps.qa.notification import send_digests
+import Aristotle.apps.qa.settings as qa_settings
 
 
 class VerficationTest(TestCase):
@@ -26,7 +43,10 @@ class VerficationTest(TestCase):
     def test_email(self):
         mail.outbox = []
         self.email.send_verfication()
-        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(len(mail.outbox), 0)
+        # with the email queued at signup
+        self.assertEqual(deliver_mail(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
         subject = 'Please verify your account for website name'
         self.assertEqual(mail.outbox[0].subject, subject)
 
@@ -46,6 +66,192 @@ class ResetPasswordTest(TestCase):
     def test_email(self):
         mail.outbox = []
         self.email.send_reset_password()
-        self.assertEqual(len(mail.outbox), 1)
+        deliver_mail()
+        self.assertEqual(len(mail.outbox), 2)
         subject = 'Reset your password'
-        self.assertEqual(mail.outbox[0].subject, subject)
+        self.assertEqual(mail.outbox[1].subject, subject)
+
+
+class SMTPStandInChannel(smtpd.SMTPChannel):
+
+    def __init__(self, server, conn, addr):
+        smtpd.SMTPChannel.__init__(self, server, conn, addr)
+        self.stand_in = server
+
+    def smtp_NOOP(self, arg):
+        self.stand_in.noops += 1
+        smtpd.SMTPChannel.smtp_NOOP(self, arg)
+
+
+class SMTPStandIn(smtpd.SMTPServer):
+    '''local SMTP server keeping the messages it receives, except
+    those to refused@test.com
+    '''
+
+    def __init__(self):
+        smtpd.SMTPServer.__init__(self, ('127.0.0.1', 0), None)
+        self.port = self.socket.getsockname()[1]
+        self.messages = []
+        self.connections = 0
+        self.noops = 0
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            self.connections += 1
+            SMTPStandInChannel(self, *pair)
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        if 'refused@test.com' in rcpttos:
+            return '554 refused'
+        self.messages.append((rcpttos, data))
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=asyncore.loop, kwargs={'timeout': 0.05})
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.close()
+        self.thread.join()
+
+
+def _free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class MailQueueTest(TestCase):
+
+    def setUp(self):
+        # a connection pooled by another test has other settings
+        close_connection()
+        self.server = SMTPStandIn()
+        self.server.start()
+        self.smtp = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.server.port)
+        self.smtp.enable()
+
+    def tearDown(self):
+        close_connection()
+        self.smtp.disable()
+        self.server.stop()
+
+    def test_batch(self):
+        for i in range(5):
+            queue_mail('subject %d' % i, 'message', 'from@test.com',
+                       ['to%d@test.com' % i])
+        self.assertEqual(deliver_mail(batch_size=3), (3, 0))
+        self.assertEqual(deliver_mail(), (2, 0))
+        self.assertEqual(deliver_mail(), (0, 0))
+        self.assertEqual(len(self.server.messages), 5)
+        self.assertEqual(self.server.messages[0][0], ['to0@test.com'])
+        # both batches share the pooled connection, checked once for the
+        # second batch
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.noops, 1)
+        self.assertEqual(OutgoingEmail.objects.filter(
+            status='sent').count(), 5)
+
+    def test_refused_in_batch(self):
+        for to in ('to0@test.com', 'refused@test.com', 'to2@test.com'):
+            queue_mail('subject', 'message', 'from@test.com', [to])
+        self.assertEqual(deliver_mail(), (2, 1))
+        self.assertEqual([rcpttos for rcpttos, _ in self.server.messages],
+                         [['to0@test.com'], ['to2@test.com']])
+        refused = OutgoingEmail.objects.get(recipients='refused@test.com')
+        self.assertEqual((refused.status, refused.attempts), ('queued', 1))
+        self.assertEqual(OutgoingEmail.objects.filter(
+            status='sent').count(), 2)
+
+    def test_retry(self):
+        queue_mail('subject', 'message', 'from@test.com', ['to@test.com'])
+        with self.settings(EMAIL_PORT=_free_port()):
+            self.assertEqual(deliver_mail(), (0, 1))
+            email = OutgoingEmail.objects.get()
+            self.assertEqual(email.attempts, 1)
+            self.assertEqual(email.status, 'queued')
+            self.assertGreater(email.next_try_time, timezone.now())
+            # not due before its delay
+            self.assertEqual(deliver_mail(), (0, 0))
+            for _ in range(qa_settings.EMAIL_MAX_ATTEMPTS - 1):
+                OutgoingEmail.objects.update(next_try_time=timezone.now())
+                self.assertEqual(deliver_mail(), (0, 1))
+            self.assertEqual(OutgoingEmail.objects.get().status, 'dead')
+        OutgoingEmail.objects.update(status='queued',
+                                     next_try_time=timezone.now())
+        self.assertEqual(deliver_mail(), (1, 0))
+        self.assertEqual(len(self.server.messages), 1)
+
+    def test_lease(self):
+        queue_mail('subject', 'message', 'from@test.com', ['to@test.com'])
+        # leased by a worker which then crashed
+        OutgoingEmail.objects.update(
+            next_try_time=timezone.now() + timedelta(seconds=60))
+        self.assertEqual(deliver_mail(), (0, 0))
+        OutgoingEmail.objects.update(next_try_time=timezone.now())
+        call_command('send_queued_mail', stdout=open(os.devnull, 'w'))
+        self.assertEqual(OutgoingEmail.objects.get().status, 'sent')
+
+    def test_without_queue(self):
+        qa_settings.EMAIL_QUEUE = False
+        try:
+            queue_mail('subject', 'message', 'from@test.com', ['to@test.com'])
+        finally:
+            qa_settings.EMAIL_QUEUE = True
+        self.assertEqual(OutgoingEmail.objects.count(), 0)
+        self.assertEqual(len(self.server.messages), 1)
+
+
+class DigestTest(TestCase):
+
+    def setUp(self):
+        close_connection()
+        self.users = [User.objects.create_user(
+            username='user%d' % i, email='user%d@test.com' % i,
+            password='test') for i in range(3)]
+        self.since = timezone.now()
+        question = Question.objects.create(title='the question',
+                                           content='content',
+                                           author=self.users[0])
+        answer = Answer.objects.create(question=question, content='answer',
+                                       author=self.users[1])
+        QuestionComment.objects.create(question=question, content='comment',
+                                       user=self.users[1])
+        QuestionComment.objects.create(question=question, content='comment',
+                                       user=self.users[0])
+        AnswerComment.objects.create(answer=answer, content='comment',
+                                     user=self.users[0])
+        message = MailMessage.objects.create(subject='hello',
+                                             content='content',
+                                             sender=self.users[0])
+        MailboxEntry.objects.create(message=message, user=self.users[2],
+                                    box='inbox')
+
+    def test_digests(self):
+        mail.outbox = []
+        self.assertEqual(send_digests(self.since, batch_size=2), 3)
+        self.assertEqual([m.to for m in mail.outbox], [
+            ['user0@test.com'], ['user1@test.com'], ['user2@test.com']])
+        digest = mail.outbox[0].body
+        self.assertIn('user1 on "the question"', digest)
+        self.assertIn(qa_settings.SITE_URL + '/question/1/#1', digest)
+        # own comments are left out
+        self.assertNotIn('user0 on', digest)
+        self.assertIn('New comments on your answers', mail.outbox[1].body)
+        self.assertIn('user0: hello', mail.outbox[2].body)
+        self.assertEqual(send_digests(timezone.now()), 0)
+
+    def test_smtp_down(self):
+        with self.settings(
+                EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                EMAIL_HOST='127.0.0.1', EMAIL_PORT=_free_port()):
+            self.assertEqual(send_digests(self.since), 3)
+            close_connection()
+        self.assertEqual(OutgoingEmail.objects.filter(
+            subject='Your activity on website name').count(), 3)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#
+# @name:  inbox.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+import os
+import json
+from django.test import TestCase
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.test import Client
+from Aristotle.apps.qa.models import Notification, NotificationCounter
+
+
+class InboxTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        for name in ('asker', 'answerer', 'commenter'):
+            self.client.post('/signup/', {'username': name,
+                                          'email': name + '@gmail.com',
+                                          'password': 'test',
+                                          'repassword': 'test'})
+        self._signin('asker')
+        self.client.post('/question/ask/', {'title': 'title',
+                                            'content': 'content',
+                                            'tags': 'python'})
+
+    def _signin(self, username):
+        self.client.post('/signin/', {'username': username,
+                                      'password': 'test'})
+
+    def _get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content.decode('utf-8'))
+
+    def test_fan_out(self):
+        self._signin('commenter')
+        self.client.post('/question/1/comment/',
+                         {'question_comment_content': 'a comment'})
+        self._signin('answerer')
+        self.client.post('/question/1/answer/',
+                         {'answer_content': 'an answer'})
+        # the asker and the commenter follow the question
+        self.assertEqual(Notification.objects.filter(kind='answer').count(),
+                         2)
+        self._signin('asker')
+        self.client.post('/answer/1/comment/',
+                         {'answer_comment_content': 'thanks'})
+        self.client.post('/answer/1/accept/')
+        self.assertEqual(self._get('/notifications/unread/'), {'unread': 2})
+        self._signin('answerer')
+        data = self._get('/notifications/')
+        self.assertEqual([item['kind'] for item in data['items']],
+                         ['accept', 'answer_comment'])
+        self.assertEqual(data['items'][0]['actor'], 'asker')
+        # nobody is notified of what they did themselves
+        self.assertFalse(Notification.objects.filter(
+            user__username='answerer', kind='answer').exists())
+
+    def test_read(self):
+        self._signin('answerer')
+        self.client.post('/question/1/answer/', {'answer_content': 'one'})
+        self.client.post('/question/1/answer/', {'answer_content': 'two'})
+        self._signin('asker')
+        with self.assertNumQueries(3):
+            # session, user and counter
+            self.assertEqual(self._get('/notifications/unread/'),
+                             {'unread': 2})
+        first = Notification.objects.order_by('id')[0]
+        response = self.client.post('/notifications/read/',
+                                    {'id': [first.id, first.id]})
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+                         {'unread': 1})
+        response = self.client.post('/notifications/read/')
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+                         {'unread': 0})
+        self.assertFalse(Notification.objects.filter(has_read=False).exists())
+        self.assertEqual(NotificationCounter.objects.get(
+            user__username='asker').unread, 0)
+        self.client.get('/signout/')
+        self.assertEqual(
+            self.client.get('/notifications/unread/').status_code, 302)
+
+    def test_delete(self):
+        self._signin('answerer')
+        self.client.post('/question/1/answer/', {'answer_content': 'one'})
+        self.client.post('/question/1/answer/', {'answer_content': 'two'})
+        self._signin('asker')
+        self.client.post('/answer/1/comment/',
+                         {'answer_comment_content': 'thanks'})
+        self._signin('answerer')
+        # deleted notifications no longer count as unread
+        self.client.post('/answer/1/delete/')
+        self.assertFalse(Notification.objects.filter(answer_id=1).exists())
+        self.assertEqual(self._get('/notifications/unread/'), {'unread': 0})
+        self._signin('asker')
+        self.assertEqual(self._get('/notifications/unread/'), {'unread': 1})
+        self.client.post('/question/1/delete/')
+        self.assertEqual(self._get('/notifications/unread/'), {'unread': 0})
+
+    def test_rebuild(self):
+        self._signin('answerer')
+        self.client.post('/question/1/answer/', {'answer_content': 'one'})
+        NotificationCounter.objects.update(unread=5)
+        NotificationCounter.objects.create(
+            user=User.objects.get(username='answerer'), unread=3)
+        call_command('rebuild_counters', stdout=open(os.devnull, 'w'))
+        self.assertEqual(NotificationCounter.objects.get(
+            user__username='asker').unread, 1)
+        self.assertEqual(NotificationCounter.objects.get(
+            user__username='answerer').unread, 0)
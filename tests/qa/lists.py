@@ -4,9 +4,18 @@
 # @create: 28 September 2014 (Sunday)
 # @update: 05 October 2014 (Sunday)
 # @author: Z. Huang
-
+import os
+from datetime import timedelta
 from django.test import TestCase
 from django.test import Client
+from django.core.cache import cache
+from django.utils import timezone
+from django.core.management import call_command
+from django.db import connection
+from django.utils.six import StringIO
+from Aristotle.apps.qa.models import Question, Tag
+from Aristotle.apps.qa.hot import update_hot_score
+from Aristotle.apps.qa.hits import flush_hits, _buffer as hit_buffer
 import Aristotle.apps.qa.settings as qa_settings
 
 
@@ -18,6 +27,7 @@ USER_NUM = 60
 class HomeTest(TestCase):
 
     def setUp(self):
+        cache.clear()
         self.client = Client()
         user_data = {'username': 'test',
                      'email': 'test@gmail.com',
@@ -47,10 +57,46 @@ class HomeTest(TestCase):
         questions = response.context['questions']
         self.assertEqual(len(questions), qa_settings.HOME_PAGE_SIZE)
 
+    def _tab(self, tab):
+        cache.clear()
+        response = self.client.get('/', {'tab': tab})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['tab'], tab)
+        return [q.id for q in response.context['questions']]
+
+    def test_tabs(self):
+        now = timezone.now()
+        Question.objects.filter(id=1).update(
+            votes_count=5, created_time=now - timedelta(days=20))
+        Question.objects.filter(id=2).update(
+            votes_count=50, created_time=now - timedelta(days=40))
+        Question.objects.filter(id=3).update(answers_count=1)
+        for qid in (1, 2, 3):
+            update_hot_score(qid)
+        # hot decays with age, week and month rank by votes
+        self.assertEqual(self._tab('hot')[:2], [3, 30])
+        self.assertNotIn(1, self._tab('hot'))
+        self.assertEqual(self._tab('week')[:2], [3, 30])
+        self.assertEqual(self._tab('month')[:2], [1, 3])
+        self.assertNotIn(2, self._tab('month'))
+        self.assertEqual(self._tab('new')[:1], [30])
+
+    def test_hits(self):
+        hit_buffer.take()
+        self.client.get('/question/5/')
+        flush_hits()
+        question = Question.objects.get(id=5)
+        self.assertEqual(self._tab('hot')[0], 5)
+        Question.objects.update(hot_score=0)
+        call_command('refresh_hot_scores', stdout=open(os.devnull, 'w'))
+        self.assertEqual(Question.objects.get(id=5).hot_score,
+                         question.hot_score)
+
 
 class QuestionsTest(TestCase):
 
     def setUp(self):
+        cache.clear()
         self.client = Client()
         user_data = {'username': 'test',
                      'email': 'test@gmail.com',
@@ -74,6 +120,58 @@ class QuestionsTest(TestCase):
     def test_get_not_login(self):
         self._test_questions()
 
+    def test_get_sorted(self):
+        Question.objects.filter(id=3).update(votes_count=5, hits_count=1)
+        Question.objects.filter(id=7).update(votes_count=2, hits_count=9)
+        Question.objects.filter(id=7).update(answers_count=1, solved=True)
+        response = self.client.get('/questions/?sort=votes')
+        questions = response.context['questions']
+        self.assertEqual([q.id for q in questions[:2]], [3, 7])
+        response = self.client.get('/questions/?sort=views')
+        questions = response.context['questions']
+        self.assertEqual([q.id for q in questions[:2]], [7, 3])
+        response = self.client.get('/questions/?sort=answers')
+        questions = response.context['questions']
+        self.assertEqual(questions[0].id, 7)
+        response = self.client.get('/questions/?sort=unanswered')
+        questions = response.context['questions']
+        self.assertEqual(questions.paginator.count, QUESTION_NUM - 1)
+        self.assertNotIn(7, [q.id for q in questions])
+        for sort in ('newest', 'votes', 'answers', 'views', 'unknown'):
+            cache.clear()
+            response = self.client.get('/questions/?sort=' + sort)
+            self.assertEqual(response.status_code, 200)
+            questions = response.context['questions']
+            self.assertEqual(questions.paginator.count, QUESTION_NUM)
+
+    def test_get_cursor(self):
+        Question.objects.filter(id__in=[4, 9, 20]).update(votes_count=3)
+        for sort in ('newest', 'votes', 'unanswered'):
+            response = self.client.get(
+                '/questions/?pagesize=30&sort=' + sort)
+            expected = [q.id for q in response.context['questions']]
+            url = '/questions/?pagesize=4&sort=' + sort
+            response = self.client.get(url + '&after=invalid')
+            questions = response.context['questions']
+            self.assertEqual(questions.number, 1)
+            ids = [q.id for q in questions]
+            after = None
+            for i in range(1, qa_settings.CURSOR_PAGE_LINKS):
+                after = questions.next_cursor
+                self.assertIsNone(after)
+                response = self.client.get(url + '&page=' + str(i + 1))
+                questions = response.context['questions']
+                ids.extend(q.id for q in questions)
+            after = questions.next_cursor
+            while after:
+                response = self.client.get(url + '&after=' + after)
+                self.assertEqual(response.status_code, 200)
+                questions = response.context['questions']
+                self.assertIsNone(questions.number)
+                ids.extend(q.id for q in questions)
+                after = questions.next_cursor
+            self.assertEqual(ids, expected)
+
     def _test_questions(self):
         response = self.client.get('/questions/')
         self.assertEqual(response.status_code, 200)
@@ -92,6 +190,7 @@ class QuestionsTest(TestCase):
         pages = QUESTION_NUM / page_size
         pages += 1 if QUESTION_NUM % page_size != 0 else 0
         for i in range(1, pages + 1):
+            cache.clear()
             response = self.client.get(url.format(i))
             self.assertEqual(response.status_code, 200)
             questions = response.context['questions']
@@ -105,6 +204,7 @@ class QuestionsTest(TestCase):
 class TaggedQuestionsTest(TestCase):
 
     def setUp(self):
+        cache.clear()
         self.client = Client()
         user_data = {'username': 'test',
                      'email': 'test@gmail.com',
@@ -161,6 +261,7 @@ class TaggedQuestionsTest(TestCase):
         pages = QUESTION_NUM / page_size
         pages += 1 if QUESTION_NUM % page_size != 0 else 0
         for i in range(1, pages + 1):
+            cache.clear()
             response = self.client.get(url.format(i))
             self.assertEqual(response.status_code, 200)
             questions = response.context['questions']
@@ -174,6 +275,7 @@ class TaggedQuestionsTest(TestCase):
 class TagsTest(TestCase):
 
     def setUp(self):
+        cache.clear()
         self.client = Client()
         user_data = {'username': 'test',
                      'email': 'test@gmail.com',
@@ -197,6 +299,50 @@ class TagsTest(TestCase):
     def test_get_not_login(self):
         self._test_tags()
 
+    def test_get_sorted(self):
+        self.client.post('/signin/', {'username': 'test', 'password': 'test'})
+        question_data = {
+            'title': 'title',
+            'content': 'content',
+            'tags': 'tag7, tag8',
+        }
+        self.client.post('/question/ask/', question_data)
+        question_data['tags'] = 'tag8'
+        self.client.post('/question/ask/', question_data)
+        response = self.client.get('/tags/')
+        tags = response.context['tags']
+        self.assertEqual([t.name for t in tags[:2]], ['tag8', 'tag7'])
+        self.assertEqual([t.question_count for t in tags[:3]], [3, 2, 1])
+        response = self.client.get('/tags/?sort=name')
+        tags = response.context['tags']
+        self.assertEqual([t.name for t in tags[:3]],
+                         ['tag0', 'tag1', 'tag10'])
+        response = self.client.get('/questions/tagged/tag8/')
+        questions = response.context['questions']
+        self.assertEqual(len(questions), 3)
+
+    def test_migrate(self):
+        # the table of one row per tag and question, before tags were unique
+        with connection.schema_editor() as editor:
+            editor.delete_model(Tag)
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE qa_tag (id integer PRIMARY KEY, '
+                           'name varchar(40) NOT NULL, '
+                           'question_id integer NOT NULL)')
+            for name, question_id in [('python', 1), ('sql', 1),
+                                      ('python', 2), ('python', 2)]:
+                cursor.execute('INSERT INTO qa_tag (name, question_id) '
+                               'VALUES (%s, %s)', [name, question_id])
+        out = StringIO()
+        call_command('migrate_tags', stdout=out)
+        self.assertIn('2 tags and 3 links', out.getvalue())
+        self.assertEqual(dict(Tag.objects.values_list(
+            'name', 'question_count')), {'python': 2, 'sql': 1})
+        self.assertEqual(sorted(Question.objects.get(id=1).tag_set.values_list(
+            'name', flat=True)), ['python', 'sql'])
+        call_command('migrate_tags', stdout=out)
+        self.assertIn('already migrated', out.getvalue())
+
     def _test_tags(self):
         response = self.client.get('/tags/')
         self.assertEqual(response.status_code, 200)
@@ -215,6 +361,7 @@ class TagsTest(TestCase):
         pages = TAG_NUM / page_size
         pages += 1 if TAG_NUM % page_size != 0 else 0
         for i in range(1, pages + 1):
+            cache.clear()
             response = self.client.get(url.format(i))
             self.assertEqual(response.status_code, 200)
             tags = response.context['tags']
@@ -228,6 +375,7 @@ class TagsTest(TestCase):
 class UsersTest(TestCase):
 
     def setUp(self):
+        cache.clear()
         self.client = Client()
         for i in range(USER_NUM):
             user_data = {'username': 'test' + str(i),
@@ -261,6 +409,7 @@ class UsersTest(TestCase):
         pages = USER_NUM / page_size
         pages += 1 if USER_NUM % page_size != 0 else 0
         for i in range(1, pages + 1):
+            cache.clear()
             response = self.client.get(url.format(i))
             self.assertEqual(response.status_code, 200)
             users = response.context['users']
@@ -274,6 +423,7 @@ class UsersTest(TestCase):
 class SearchTest(TestCase):
 
     def setUp(self):
+        cache.clear()
         self.client = Client()
         user_data = {'username': 'test',
                      'email': 'test@gmail.com',
@@ -309,6 +459,9 @@ class SearchTest(TestCase):
         for i in range(5):
             for j in range(0, 50, 10):
                 self._test_questions_handler(str(i + 1), j)
+        # ranked results are not served a first page for a cursor
+        response = self.client.get('/search/?query=1&after=WzFd')
+        self.assertEqual(response.status_code, 400)
 
     def _test_questions_handler(self, query, page_size=None):
         if not page_size or page_size == 0:
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+#
+# @name:  mail.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+from django.db import connection
+from django.test import TestCase
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.utils.six import StringIO
+from Aristotle.apps.qa.models import Mail, MailMessage, MailboxEntry
+
+
+class MailTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        for i in range(6):
+            self.client.post('/signup/', {'username': 'user%d' % i,
+                                          'email': 'user%d@gmail.com' % i,
+                                          'password': 'test',
+                                          'repassword': 'test'})
+        self.client.post('/signin/', {'username': 'user0',
+                                      'password': 'test'})
+
+    def _send(self, receivers, subject='hello'):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/mail/new/', {
+                'receivers': receivers, 'subject': subject,
+                'content': 'content'})
+        return response, len(queries)
+
+    def test_send(self):
+        response, two = self._send('user1, user2')
+        self.assertRedirects(response, '/mail/')
+        response, five = self._send('user1 user2 user3 user4 user5',
+                                    subject='hi')
+        # the queries do not grow with the receivers
+        self.assertEqual(two, five)
+        self.assertEqual(MailMessage.objects.count(), 2)
+        self.assertEqual(MailboxEntry.objects.filter(box='inbox').count(), 7)
+        self.assertEqual(MailboxEntry.objects.filter(box='outbox').count(),
+                         2)
+        entry = MailboxEntry.objects.get(user__username='user2',
+                                         message__subject='hello')
+        self.client.post('/signin/', {'username': 'user2',
+                                      'password': 'test'})
+        response = self.client.get('/mail/')
+        self.assertContains(response, 'hello')
+        response = self.client.get('/mail/%d/' % entry.id)
+        self.assertContains(response, 'content')
+        # the outbox of the sender is not there
+        outbox = MailboxEntry.objects.get(user__username='user0',
+                                          message=entry.message)
+        self.assertEqual(self.client.get('/mail/%d/' % outbox.id).status_code,
+                         404)
+
+    def test_unknown_receiver(self):
+        self._send('user1 nobody')
+        self.assertFalse(MailMessage.objects.exists())
+        self.assertFalse(MailboxEntry.objects.exists())
+
+    def test_migrate(self):
+        users = list(User.objects.order_by('id'))
+        sender = users[0]
+        # old copies of two mails, the second one sent twice
+        for subject, receivers in (('one', users[1:4]), ('two', users[1:2]),
+                                   ('two', users[1:2])):
+            for receiver in receivers:
+                Mail.objects.create(subject=subject, content='content',
+                                    user=sender, has_read=True, box='outbox',
+                                    sender=sender, receiver=receiver)
+                Mail.objects.create(subject=subject, content='content',
+                                    user=receiver, box='inbox',
+                                    sender=sender, receiver=receiver)
+        out = StringIO()
+        call_command('migrate_mails', stdout=out)
+        self.assertIn('10 mails moved into 3 messages', out.getvalue())
+        self.assertFalse(Mail.objects.exists())
+        one = MailMessage.objects.get(subject='one')
+        self.assertEqual(sorted(one.mailboxentry_set.values_list(
+            'user__username', 'box')), [
+            ('user0', 'outbox'), ('user1', 'inbox'), ('user2', 'inbox'),
+            ('user3', 'inbox')])
+        self.assertEqual(MailboxEntry.objects.filter(
+            user=users[1], message__subject='two').count(), 2)
@@ -1,9 +1,23 @@
 #!/usr/bin/env python
 
-from django.test import TestCase
-from django.db import IntegrityError
+import os
+from django.test import TestCase, TransactionTestCase
+from django.db import IntegrityError, connection, transaction
+from django.utils.six import StringIO
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from Aristotle.apps.qa.models import Member
+from Aristotle.apps.qa.models import Question, QuestionVote, QuestionHit
+from Aristotle.apps.qa.models import Answer, AnswerVote, Tag
+from Aristotle.apps.qa.models import QuestionViewers, QuestionDailyViews
+from Aristotle.apps.qa.hyperloglog import HyperLogLog
+from Aristotle.apps.qa.hot import hot_score
+from Aristotle.apps.qa.hits import record_hit, flush_hits
+from Aristotle.apps.qa.hits import _buffer as hit_buffer
+from Aristotle.apps.qa import hits
+from Aristotle.apps.qa.queryplans import explain, full_scans
+from Aristotle.apps.qa.management.commands.add_indexes import _constraints
+import Aristotle.apps.qa.settings as qa_settings
 
 
 class MemberTest(TestCase):
@@ -66,3 +80,222 @@ class QuestionTest(TestCase):
 
     def setUp(self):
         pass
+
+
+class RebuildCountersTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='test', password='test', email='test@email.com')
+        self.question = Question.objects.create(
+            title='title', content='content', author=self.user)
+        self.answer = Answer.objects.create(
+            content='answer', author=self.user, question=self.question)
+        QuestionVote.objects.create(question=self.question, user=self.user)
+        QuestionHit.objects.create(question=self.question, ip='127.0.0.1',
+                                   session='session1')
+        QuestionHit.objects.create(question=self.question, ip='127.0.0.1',
+                                   session='session2')
+        AnswerVote.objects.create(answer=self.answer, user=self.user,
+                                  vote_type=True)
+        self.tag = Tag.objects.create(name='tag')
+        self.tag.questions.add(self.question)
+
+    def test_rebuild(self):
+        question = Question.objects.get(id=self.question.id)
+        self.assertEqual(question.votes_count, 0)
+        self.assertEqual(question.answers_count, 0)
+        self.assertEqual(question.hits_count, 0)
+        call_command('rebuild_counters', stdout=open(os.devnull, 'w'))
+        question = Question.objects.get(id=self.question.id)
+        self.assertEqual(question.votes_count, 1)
+        self.assertEqual(question.answers_count, 1)
+        self.assertEqual(question.hits_count, 2)
+        answer = Answer.objects.get(id=self.answer.id)
+        self.assertEqual(answer.upvotes_count, 1)
+        self.assertEqual(answer.downvotes_count, 0)
+        self.assertEqual(answer.abs_votes_count, 1)
+        self.assertEqual(Tag.objects.get(id=self.tag.id).question_count, 1)
+
+
+class HitSketchTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='test', password='test', email='test@email.com')
+        self.question = Question.objects.create(
+            title='title', content='content', author=self.user)
+        hit_buffer.take()
+        self.settings = (qa_settings.HIT_STORAGE,
+                         qa_settings.HIT_DAILY_ROLLUP)
+        qa_settings.HIT_STORAGE = 'sketch'
+        qa_settings.HIT_DAILY_ROLLUP = True
+
+    def tearDown(self):
+        qa_settings.HIT_STORAGE, qa_settings.HIT_DAILY_ROLLUP = self.settings
+
+    def test_hyperloglog(self):
+        sketch = HyperLogLog()
+        for i in range(5000):
+            sketch.add('visitor%d' % i)
+            sketch.add('visitor%d' % i)
+        self.assertTrue(4500 < sketch.count() < 5500)
+        data = sketch.to_bytes()
+        self.assertEqual(len(data), 1025)
+        other = HyperLogLog()
+        for i in range(2500, 7500):
+            other.add('visitor%d' % i)
+        other.merge(HyperLogLog.from_bytes(data))
+        self.assertTrue(6750 < other.count() < 8250)
+        self.assertRaises(ValueError, HyperLogLog.from_bytes, data[:-1])
+
+    def test_flush(self):
+        record_hit(self.question.id, '127.0.0.1', 'session1')
+        record_hit(self.question.id, '127.0.0.1', 'session2')
+        self.assertEqual(flush_hits(), 2)
+        record_hit(self.question.id, '127.0.0.1', 'session1')
+        record_hit(self.question.id, '127.0.0.2')
+        self.assertEqual(flush_hits(), 1)
+        self.assertEqual(QuestionHit.objects.count(), 0)
+        self.assertEqual(Question.objects.get(id=1).hits_count, 3)
+        self.assertEqual(QuestionViewers.objects.count(), 1)
+        daily = QuestionDailyViews.objects.get()
+        self.assertEqual(daily.views, 4)
+        self.assertEqual(HyperLogLog.from_bytes(daily.sketch).count(), 3)
+
+    def test_estimate_drops(self):
+        sketch = HyperLogLog()
+        for i in range(2611):
+            sketch.add('s9-%d' % i)
+        QuestionViewers.objects.create(question=self.question,
+                                       sketch=sketch.to_bytes())
+        # the estimate goes from 2561 to 2560 with this visitor
+        before = sketch.count()
+        sketch.add('s9-2611')
+        self.assertLess(sketch.count(), before)
+        self.assertEqual(hits.add_viewers({self.question.id: ['s9-2611']}),
+                         {self.question.id: 0})
+        self.assertEqual(bytes(QuestionViewers.objects.get().sketch),
+                         sketch.to_bytes())
+
+    def test_created_meanwhile(self):
+        record_hit(self.question.id, '127.0.0.1', 'session1')
+        flush_hits()
+        locked = hits._locked
+        missed = set()
+
+        def read_before_created(queryset):
+            # rows another worker created after they were read
+            if queryset.model not in missed:
+                missed.add(queryset.model)
+                return {}
+            return locked(queryset)
+
+        hits._locked = read_before_created
+        try:
+            record_hit(self.question.id, '127.0.0.1', 'session2')
+            self.assertEqual(flush_hits(), 1)
+        finally:
+            hits._locked = locked
+        viewers = QuestionViewers.objects.get()
+        self.assertEqual(HyperLogLog.from_bytes(viewers.sketch).count(), 2)
+        self.assertEqual(Question.objects.get(id=1).hits_count, 2)
+        daily = QuestionDailyViews.objects.get()
+        self.assertEqual(daily.views, 2)
+        self.assertEqual(HyperLogLog.from_bytes(daily.sketch).count(), 2)
+
+    def test_compact(self):
+        for i in range(3):
+            QuestionHit.objects.create(question=self.question,
+                                       ip='127.0.0.1', session='s%d' % i)
+        Question.objects.filter(id=1).update(hits_count=3)
+        record_hit(self.question.id, '127.0.0.1', 's0')
+        flush_hits()
+        call_command('compact_hits', stdout=open(os.devnull, 'w'))
+        self.assertEqual(QuestionHit.objects.count(), 0)
+        self.assertEqual(Question.objects.get(id=1).hits_count, 3)
+        self.assertEqual(QuestionDailyViews.objects.get().views, 4)
+        call_command('rebuild_counters', stdout=open(os.devnull, 'w'))
+        self.assertEqual(Question.objects.get(id=1).hits_count, 3)
+
+
+class ColumnTest(TransactionTestCase):
+    # the DDL of SQLite commits the rows of the test
+
+    def test_add_columns(self):
+        user = User.objects.create_user('test', 'test@test.com', 'test')
+        question = Question.objects.create(title='t', content='c',
+                                           author=user)
+        QuestionVote.objects.create(question=question, user=user)
+        answer = Answer.objects.create(question=question, content='c',
+                                       author=user)
+        AnswerVote.objects.create(answer=answer, user=user, vote_type=False)
+        # tables made before the counters were columns
+        with connection.schema_editor() as editor:
+            for model, name in ((Question, 'votes_count'),
+                                (Answer, 'downvotes_count')):
+                editor.remove_field(model, model._meta.get_field(name))
+        out = StringIO()
+        call_command('add_columns', stdout=out)
+        self.assertIn('qa_question.votes_count', out.getvalue())
+        self.assertIn('2 columns added', out.getvalue())
+        question = Question.objects.get(id=question.id)
+        self.assertEqual((question.votes_count, question.answers_count),
+                         (1, 1))
+        self.assertEqual(Answer.objects.get(id=answer.id).downvotes_count, 1)
+        call_command('add_columns', stdout=out)
+        self.assertIn('0 columns added', out.getvalue())
+
+    def test_add_hot_score(self):
+        user = User.objects.create_user('test', 'test@test.com', 'test')
+        question = Question.objects.create(title='t', content='c',
+                                           author=user)
+        QuestionVote.objects.create(question=question, user=user)
+        with connection.schema_editor() as editor:
+            editor.remove_field(Question,
+                                Question._meta.get_field('hot_score'))
+        out = StringIO()
+        call_command('add_columns', stdout=out)
+        self.assertIn('qa_question.hot_score', out.getvalue())
+        self.assertIn(['hot_score'], [constraint['columns'] for constraint
+                                      in _constraints(Question)])
+        self.assertEqual(Question.objects.get(id=question.id).hot_score,
+                         hot_score(1, 0, 0, question.created_time))
+
+
+class IndexTest(TestCase):
+
+    def test_add_indexes(self):
+        columns = ['question_id', 'session']
+        index = [constraint['name'] for constraint in _constraints(QuestionHit)
+                 if constraint['columns'] == columns][0]
+        # a table made before the index was declared
+        connection.cursor().execute(
+            'DROP INDEX %s' % connection.ops.quote_name(index))
+        out = StringIO()
+        call_command('add_indexes', stdout=out)
+        self.assertIn('qa_questionhit(question, session)', out.getvalue())
+        self.assertIn('1 indexes created', out.getvalue())
+        self.assertIn(columns, [constraint['columns'] for constraint
+                                in _constraints(QuestionHit)])
+        call_command('add_indexes', stdout=out)
+        self.assertIn('0 indexes created', out.getvalue())
+
+    def test_vote_once(self):
+        user = User.objects.create_user('test', 'test@test.com', 'test')
+        question = Question.objects.create(title='t', content='c',
+                                           author=user)
+        QuestionVote.objects.create(question=question, user=user)
+        with transaction.atomic():
+            self.assertRaises(IntegrityError, QuestionVote.objects.create,
+                              question=question, user=user)
+
+    def test_explain_queries(self):
+        out = StringIO()
+        call_command('explain_queries', seed=50, strict=True, stdout=out)
+        self.assertIn('0 queries with full scans', out.getvalue())
+        self.assertIn('hits\n    SEARCH', out.getvalue())
+        # the seeded rows are rolled back
+        self.assertFalse(Question.objects.exists())
+        plan = explain(Question.objects.filter(content='content'))
+        self.assertEqual(len(full_scans(plan)), 1)
@@ -4,9 +4,17 @@
 # @create: 25 September 2014 (Thursday)
 # @update: 28 September 2014 (Thursday)
 # @author: Z. Huang
+import re
+import json
+from django.db import connection
+from django.core.cache import cache
 from django.test import TestCase
 from django.test import Client
-from Aristotle.apps.qa.models import Question, Answer
+from django.test.utils import CaptureQueriesContext
+from Aristotle.apps.qa.models import Question, Answer, Tag, QuestionHit
+from Aristotle.apps.qa.models import QuestionComment, AnswerComment
+from Aristotle.apps.qa.hits import flush_hits, _buffer as hit_buffer
+from Aristotle.apps.qa.views.question import _render_question_answers
 
 
 class AskQuestionTest(TestCase):
@@ -79,16 +87,114 @@ class QuestionTest(TestCase):
             'tags': 'test1, test2, test3',
         }
         self.client.post('/question/ask/', question_data)
+        # views and fragments left by other tests
+        hit_buffer.take()
+        cache.clear()
 
     def test_get_not_login(self):
         response = self.client.get('/question/1/')
         self.assertEqual(response.status_code, 200)
+        # views are buffered, no session is created
+        self.assertNotIn('sessionid', response.cookies)
+        self.assertEqual(Question.objects.get(id=1).hits_count, 0)
+        self.assertEqual(flush_hits(), 1)
+        self.assertEqual(Question.objects.get(id=1).hits_count, 1)
+
+    def test_hits(self):
+        self.client.get('/question/1/')
+        self.client.get('/question/1/')
+        self.client.post('/signin/', {'username': 'test2', 'password': 'test'})
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/question/1/')
+        for query in context.captured_queries:
+            self.assertNotRegexpMatches(query['sql'], r'INSERT|UPDATE')
+        self.assertEqual(flush_hits(), 2)
+        # already counted visitors are skipped at the next flush
+        self.client.get('/question/1/')
+        self.client.get('/question/1/', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(flush_hits(), 0)
+        self.assertEqual(QuestionHit.objects.count(), 2)
+        self.assertEqual(Question.objects.get(id=1).hits_count, 2)
+
+    def test_answer_order(self):
+        question = Question.objects.get(id=1)
+        for votes in ((0, 0), (5, 1), (2, 0), (0, 3), (1, 0)):
+            Answer.objects.create(question=question, author=question.author,
+                                  content='answer', upvotes_count=votes[0],
+                                  downvotes_count=votes[1])
+        Answer.objects.filter(id=5).update(accepted=True)
+        # one count, one page and a query per prefetched relation
+        with self.assertNumQueries(4):
+            html = _render_question_answers(1, 1, 3)
+        self.assertEqual(re.findall(r'<p id="(\d+)">', html),
+                         ['5', '2', '3'])
+        html = _render_question_answers(1, 2, 3)
+        self.assertEqual(re.findall(r'<p id="(\d+)">', html), ['1', '4'])
+
+    def test_comment_pages(self):
+        question = Question.objects.get(id=1)
+        user = question.author
+        for i in range(7):
+            QuestionComment.objects.create(question=question, user=user,
+                                           content='comment %d' % i)
+        for i in range(2):
+            answer = Answer.objects.create(question=question, author=user,
+                                           content='answer')
+            for j in range(6 + i):
+                AnswerComment.objects.create(answer=answer, user=user,
+                                             content='comment %d' % j)
+        with self.assertNumQueries(4):
+            html = _render_question_answers(1, 1, 10)
+        self.assertEqual(html.count('comment 4'), 2)
+        self.assertNotIn('comment 5', html)
+        self.assertEqual(html.count('class="more-comments"'), 2)
+        response = self.client.get('/question/1/')
+        self.assertContains(response, '/question/1/comments/?page=2')
+        self.assertContains(response, 'js/comments.js')
+        response = self.client.get('/question/1/comments/?page=2')
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertFalse(data['has_next'])
+        self.assertEqual([c['content'] for c in data['comments']],
+                         ['comment 5', 'comment 6'])
+        response = self.client.get('/answer/2/comments/')
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertTrue(data['has_next'])
+        self.assertEqual(len(data['comments']), 5)
+        self.assertEqual(data['comments'][0]['user'], 'test1')
+        response = self.client.get('/answer/404/comments/')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get('/question/404/comments/')
+        self.assertEqual(response.status_code, 404)
 
     def test_get_owner_login(self):
         self.client.post('/signin/', {'username': 'test1', 'password': 'test'})
         response = self.client.get('/question/1/')
         self.assertEqual(response.status_code, 200)
 
+    def test_fragment_cache(self):
+        client = Client()
+        client.get('/question/1/')
+        with self.assertNumQueries(0):
+            response = client.get('/question/1/')
+        self.assertContains(response, 'test content')
+        self.assertNotContains(response, 'QA_CSRF_TOKEN')
+        self.assertContains(response, response.cookies['csrftoken'].value)
+        # any action on the question renders it again
+        self.client.post('/signin/', {'username': 'test2', 'password': 'test'})
+        self.client.post('/question/1/comment/',
+                         {'question_comment_content': 'a new comment'})
+        self.client.post('/question/1/answer/',
+                         {'answer_content': 'a new answer'})
+        response = client.get('/question/1/')
+        self.assertContains(response, 'a new comment')
+        self.assertContains(response, 'a new answer')
+        self.client.post('/answer/1/comment/',
+                         {'answer_comment_content': 'answer comment'})
+        self.assertContains(client.get('/question/1/'), 'answer comment')
+        self.client.post('/signin/', {'username': 'test1', 'password': 'test'})
+        self.client.post('/question/1/delete/')
+        self.assertEqual(client.get('/question/1/').status_code, 404)
+
     def test_get_login(self):
         self.client.post('/signin/', {'username': 'test2', 'password': 'test'})
         response = self.client.get('/question/1/')
@@ -121,6 +227,7 @@ class QuestionActionTest(TestCase):
         }
         self.client.post('/question/ask/', question_data)
         self.client.get('/signout/')
+        cache.clear()
 
     def test_get_not_login(self):
         response = self.client.get('/question/1/edit/')
@@ -232,6 +339,9 @@ class QuestionActionTest(TestCase):
         for tag in tags:
             test_tags_data.add(tag.name)
         self.assertSetEqual(test_tags_data, tags_data)
+        self.assertEqual(Tag.objects.get(name='test2').question_count, 0)
+        self.assertEqual(Tag.objects.get(name='test3').question_count, 1)
+        self.assertEqual(Tag.objects.get(name='test7').question_count, 1)
 
     def test_post_append(self):
         self.client.post('/signin/', {'username': 'test1', 'password': 'test'})
@@ -291,6 +401,7 @@ class QuestionActionTest(TestCase):
         answer = Question.objects.get(id=1).answer_set.all()[1]
         self.assertEqual(answer.content, 'answer 2')
         self.assertEqual(answer.author.username, 'test1')
+        self.assertEqual(Question.objects.get(id=1).answers_count, 2)
 
     def test_post_vote(self):
         self.client.post('/signin/', {'username': 'test2', 'password': 'test'})
@@ -302,6 +413,7 @@ class QuestionActionTest(TestCase):
         vote = votes[0]
         self.assertEqual(len(votes), 1)
         self.assertTrue(vote.vote_type)
+        self.assertEqual(Question.objects.get(id=1).votes_count, 1)
         response = self.client.post('/question/1/upvote/')
         self.assertEqual(response.status_code, 302)
         votes = Question.objects.get(id=1).questionvote_set.all()
@@ -310,6 +422,7 @@ class QuestionActionTest(TestCase):
         self.assertEqual(response.status_code, 302)
         vote = Question.objects.get(id=1).questionvote_set.first()
         self.assertIsNone(vote)
+        self.assertEqual(Question.objects.get(id=1).votes_count, 0)
         self.client.get('/signout/')
         self.client.post('/signin/', {'username': 'test1', 'password': 'test'})
         response = self.client.post('/question/1/upvote/')
@@ -323,11 +436,14 @@ class QuestionActionTest(TestCase):
         self.assertEqual(response.status_code, 302)
         question = Question.objects.filter(id=1).first()
         self.assertIsNone(question)
+        for tag in Tag.objects.all():
+            self.assertEqual(tag.question_count, 0)
 
 
 class AnswerActionTest(TestCase):
 
     def setUp(self):
+        cache.clear()
         self.client = Client()
         user1_data = {'username': 'test1',
                       'email': 'test1@test.com',
@@ -534,6 +650,9 @@ class AnswerActionTest(TestCase):
         vote = votes[0]
         self.assertEqual(len(votes), 1)
         self.assertTrue(vote.vote_type)
+        answer = Answer.objects.get(id=1)
+        self.assertEqual(answer.upvotes_count, 1)
+        self.assertEqual(answer.abs_votes_count, 1)
         response = self.client.post('/answer/1/upvote/')
         self.assertEqual(response.status_code, 302)
         votes = Answer.objects.get(id=1).answervote_set.all()
@@ -542,6 +661,8 @@ class AnswerActionTest(TestCase):
         self.assertEqual(response.status_code, 302)
         vote = Answer.objects.get(id=1).answervote_set.first()
         self.assertIsNone(vote)
+        answer = Answer.objects.get(id=1)
+        self.assertEqual(answer.votes_count, 0)
         self.client.get('/signout/')
         self.client.post('/signin/', {'username': 'test1', 'password': 'test'})
         response = self.client.post('/answer/1/upvote/')
@@ -558,12 +679,17 @@ class AnswerActionTest(TestCase):
         self.assertFalse(answer.accepted)
         self.assertFalse(question.solved)
         answer = Answer.objects.get(id=2)
-        response = self.client.post('/answer/2/accept/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/answer/2/accept/')
         self.assertEqual(response.status_code, 302)
         answer = Answer.objects.get(id=2)
         question = Question.objects.get(id=1)
         self.assertTrue(answer.accepted)
         self.assertTrue(question.solved)
+        # the counters of the question are not written back
+        for query in queries.captured_queries:
+            if query['sql'].startswith('UPDATE "qa_question"'):
+                self.assertNotIn('votes_count', query['sql'])
         response = self.client.post('/answer/3/accept/')
         self.assertEqual(response.status_code, 302)
         answer = Answer.objects.get(id=3)
@@ -588,3 +714,4 @@ class AnswerActionTest(TestCase):
         question = Question.objects.get(id=1)
         self.assertIsNone(answer)
         self.assertFalse(question.solved)
+        self.assertEqual(question.answers_count, 1)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+#
+# @name:  related.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+import os
+from django.test import TestCase
+from django.test import Client
+from django.test.utils import override_settings
+from django.core.management import call_command
+from django.core.cache import cache
+from Aristotle.apps.qa.models import QuestionVector
+from Aristotle.apps.qa.search import Search
+from Aristotle.apps.qa import related
+from Aristotle.apps.qa.related import RelatedIndex, related_questions
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RelatedQuestionsTest(TestCase):
+
+    def setUp(self):
+        # the index of this process outlives the test database
+        related._index = RelatedIndex()
+        cache.clear()
+        self.client = Client()
+        user_data = {'username': 'test',
+                     'email': 'test@gmail.com',
+                     'password': 'test',
+                     'repassword': 'test'}
+        self.client.post('/signup/', user_data)
+        self.client.post('/signin/', {'username': 'test', 'password': 'test'})
+        questions = [
+            ('sorting python lists', 'how do I sort a list', 'python'),
+            ('python generators', 'what does yield do', 'python'),
+            ('database indexes', 'when are indexes used', 'sql'),
+            ('sort a list of dicts', 'sort dicts by a key', 'python'),
+        ]
+        for title, content, tags in questions:
+            question_data = {
+                'title': title,
+                'content': content,
+                'tags': tags,
+            }
+            self.client.post('/question/ask/', question_data)
+
+    def _related(self, qid):
+        response = self.client.get('/question/%d/' % qid)
+        return [i for i, _ in response.context['related_questions']]
+
+    def test_question_view(self):
+        self.assertEqual(self._related(1), [4, 2])
+        self.assertEqual(self._related(3), [])
+        response = self.client.get('/question/1/')
+        self.assertIn('sort a list of dicts', response.content)
+
+    def test_cache(self):
+        self.assertEqual(related_questions(1),
+                         [(4, u'sort a list of dicts'),
+                          (2, u'python generators')])
+        with self.assertNumQueries(0):
+            related_questions(1)
+
+    def test_edit(self):
+        self.assertEqual(self._related(3), [])
+        data = {'title': 'indexes on python lists', 'content': 'sorting',
+                'tags': 'sql'}
+        self.client.post('/question/3/edit/', data)
+        self.assertEqual(self._related(3), [1, 4, 2])
+        self.client.post('/question/4/delete/')
+        self.assertEqual(self._related(3)[:1], [1])
+        self.assertNotIn(4, related._index.vectors)
+
+    def test_delete(self):
+        self.assertEqual(self._related(1), [4, 2])
+        self.client.post('/question/4/delete/')
+        # the cached list of question 1 is recomputed
+        self.assertEqual(related_questions(1), [(2, u'python generators')])
+
+    def test_deleted_by_other_process(self):
+        # the index of a process which did not see the delete
+        stale = RelatedIndex()
+        stale.sync()
+        self.client.post('/question/4/delete/')
+        related._index = stale
+        data = {'title': 'sort a list', 'content': 'sorting lists',
+                'tags': 'python'}
+        self.client.post('/question/3/edit/', data)
+        self.assertNotIn(4, self._related(3))
+        self.assertNotIn(4, stale.vectors)
+
+    def test_missing_vector(self):
+        QuestionVector.objects.all().delete()
+        related._index = RelatedIndex()
+        self.assertEqual(self._related(4), [])
+        call_command('rebuild_related', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self._related(4), [1, 2])
+        self.assertEqual(QuestionVector.objects.count(), 4)
+
+    def test_search(self):
+        search = Search('sorting lists')
+        self.assertEqual([q.id for q in search.related_questions()], [1, 4])
+        self.assertEqual([t.name for t in search.related_tags()], ['python'])
+        self.assertEqual([u.username for u in search.related_users()],
+                         ['test'])
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+#
+# @name:  search.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+import os
+import shutil
+import tempfile
+import threading
+from django.test import TestCase
+from django.test import Client
+from django.core.management import call_command
+from Aristotle.apps.qa.models import Question
+from Aristotle.apps.qa.search import Search, SQLiteBackend, LikeBackend
+from Aristotle.apps.qa.search import get_backend, highlight
+from Aristotle.apps.qa.search import InvertedIndexBackend
+from Aristotle.apps.qa.invertedindex import InvertedIndex, analyze
+
+
+class SearchIndexTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        user_data = {'username': 'test',
+                     'email': 'test@gmail.com',
+                     'password': 'test',
+                     'repassword': 'test'}
+        self.client.post('/signup/', user_data)
+        self.client.post('/signin/', {'username': 'test', 'password': 'test'})
+        questions = [
+            ('sorting lists', 'how do I order a python list', 'python'),
+            ('python generators', 'what does yield do', 'python, yield'),
+            ('database indexes', 'when are indexes used', 'sql'),
+        ]
+        for title, content, tags in questions:
+            question_data = {
+                'title': title,
+                'content': content,
+                'tags': tags,
+            }
+            self.client.post('/question/ask/', question_data)
+
+    def _search(self, query):
+        return [q.id for q in Search(query).questions().order_by(
+            *get_backend().ordering)]
+
+    def test_backend(self):
+        self.assertIsInstance(get_backend(), SQLiteBackend)
+
+    def test_rank(self):
+        # a title match ranks above a content match
+        self.assertEqual(self._search('python'), [2, 1])
+        self.assertEqual(self._search('python yield'), [2])
+        self.assertEqual(self._search('index'), [3])
+        self.assertEqual(self._search('python" * (yield'), [2])
+        self.assertEqual(self._search('missing'), [])
+        self.assertEqual(self._search(''), [])
+        self.assertEqual(self._search('?!'), [])
+
+    def test_snippet(self):
+        question = Search('yield').questions()[0]
+        self.assertEqual(highlight(question.snippet),
+                         'what does <mark>yield</mark> do')
+        self.assertEqual(highlight('<b>' + question.snippet),
+                         '&lt;b&gt;what does <mark>yield</mark> do')
+
+    def test_update(self):
+        data = {'answer_content': 'use a b-tree'}
+        self.client.post('/question/1/answer/', data)
+        self.assertEqual(self._search('tree'), [1])
+        data = {'title': 'sorting', 'content': 'sorted()', 'tags': 'sql'}
+        self.client.post('/question/1/edit/', data)
+        self.assertEqual(self._search('sql'), [3, 1])
+        self.assertEqual(self._search('tree'), [1])
+        self.client.post('/answer/1/delete/')
+        self.assertEqual(self._search('tree'), [])
+        self.client.post('/question/3/delete/')
+        self.assertEqual(self._search('sql'), [1])
+
+    def test_rebuild(self):
+        get_backend().clear()
+        self.assertEqual(self._search('python'), [])
+        call_command('rebuild_search_index', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self._search('python'), [2, 1])
+
+    def test_like_backend(self):
+        results = LikeBackend().questions('python')
+        self.assertEqual(set(q.id for q in results), set([1, 2]))
+
+    def test_view(self):
+        response = self.client.get('/search/?query=python')
+        self.assertEqual(response.status_code, 200)
+        questions = response.context['questions']
+        self.assertEqual([q.id for q in questions], [2, 1])
+        self.assertEqual(questions.paginator.count, 2)
+        self.assertIn('<mark>python</mark>', response.content)
+        self.assertEqual(Question.objects.count(), 3)
+
+
+class InvertedIndexTest(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.index = InvertedIndex(self.path, merge_factor=3,
+                                   background_merge=False)
+        self.index.add_many([
+            (1, [('sorting python lists', 2.0), ('use sorted()', 1.0)]),
+            (2, [('python generators', 2.0), ('what does yield do', 1.0)]),
+            (3, [('database indexes', 2.0), ('sorted lists of keys', 1.0)]),
+        ])
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def _search(self, query):
+        return [doc_id for doc_id, score in self.index.search(query)]
+
+    def test_analyze(self):
+        self.assertEqual(analyze('The Indexes of generators, sorting'),
+                         ['index', 'gener', 'sort'])
+
+    def test_query(self):
+        # the shorter document ranks first
+        self.assertEqual(self._search('python'), [1, 2])
+        # a title match ranks above a content match
+        self.assertEqual(self._search('sorted lists'), [1, 3])
+        self.assertEqual(self._search('python sorting'), [1])
+        self.assertEqual(self._search('yield OR database'), [3, 2])
+        self.assertEqual(self._search('"sorted lists"'), [3])
+        self.assertEqual(self._search('"lists sorted"'), [])
+        # phrases do not span fields
+        self.assertEqual(self._search('"lists use"'), [])
+        self.assertEqual(self._search('missing'), [])
+        self.assertEqual(self._search('the'), [])
+        self.assertEqual(len(self.index.search('python OR sorted', k=2)), 2)
+
+    def test_update(self):
+        self.index.add(1, [('java streams', 2.0)])
+        self.index.add(4, [('python sets', 2.0)])
+        self.assertEqual(self._search('java'), [1])
+        self.assertEqual(set(self._search('python')), set([2, 4]))
+        self.index.delete(2)
+        self.assertEqual(self._search('python'), [4])
+        self.assertEqual(len(self.index), 3)
+
+    def test_merge(self):
+        for doc_id in range(4, 9):
+            self.index.add(doc_id, [('python %d' % doc_id, 1.0)])
+        self.index.delete(5)
+        # merges keep the number of segments under merge_factor
+        self.assertTrue(len(self.index.segments) <= 3)
+        self.index.merge(max_segments=1)
+        self.assertEqual(len(self.index.segments), 1)
+        self.assertEqual(self.index.deleted.values(), [frozenset()])
+        self.assertEqual(sorted(self._search('python')),
+                         [1, 2, 4, 6, 7, 8])
+        segment_files = [name for name in os.listdir(self.path)
+                         if name.startswith('seg_')]
+        self.assertEqual(len(segment_files), 1)
+
+    def test_search_during_merges(self):
+        # readers of other instances see segments merged away under them
+        writer = InvertedIndex(self.path, merge_factor=4,
+                               background_merge=True)
+        readers = [InvertedIndex(self.path) for _ in range(2)]
+        errors = []
+        done = threading.Event()
+
+        def search(index):
+            while not done.is_set():
+                try:
+                    index.search('python')
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=search, args=(index,))
+                   for index in readers + [writer]]
+        for thread in threads:
+            thread.start()
+        for doc_id in range(4, 204):
+            writer.add(doc_id, [('python %d' % doc_id, 1.0)])
+        done.set()
+        for thread in threads:
+            thread.join()
+        writer.merge(max_segments=1)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(readers[0].search('python', k=300)), 202)
+
+    def test_reopen(self):
+        self.index.add(4, [('python sets', 2.0)])
+        index = InvertedIndex(self.path)
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.search('"python sets"'),
+                         self.index.search('"python sets"'))
+        # readers pick up writes of other instances
+        self.index.delete(4)
+        self.assertEqual([doc_id for doc_id, _ in index.search('sets')], [])
+
+
+class InvertedIndexBackendTest(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.client = Client()
+        user_data = {'username': 'test',
+                     'email': 'test@gmail.com',
+                     'password': 'test',
+                     'repassword': 'test'}
+        self.client.post('/signup/', user_data)
+        self.client.post('/signin/', {'username': 'test', 'password': 'test'})
+        for title, content in [('sorting lists', 'order a python list'),
+                               ('python generators', 'what does yield do')]:
+            question_data = {'title': title, 'content': content,
+                             'tags': 'python'}
+            self.client.post('/question/ask/', question_data)
+        self.backend = InvertedIndexBackend(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_questions(self):
+        self.assertEqual(self.backend.rebuild(), 2)
+        results = self.backend.questions('python')
+        self.assertEqual(results.count(), 2)
+        self.assertEqual([q.id for q in results[0:2]], [2, 1])
+        question = results[1]
+        self.assertEqual(question.id, 1)
+        self.assertEqual(highlight(question.snippet),
+                         'order a <mark>python</mark> list')
+        Question.objects.filter(id=2).delete()
+        self.assertEqual([q.id for q in results[0:2]], [1])
+
+    def test_update(self):
+        question = Question.objects.get(id=1)
+        self.backend.update_question(question)
+        self.assertEqual(self.backend.questions('list').count(), 1)
+        self.backend.delete_question(question.id)
+        self.assertEqual(self.backend.questions('list').count(), 0)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+#
+# @name:  storage.py
+# @create: 18 October 2026 (Sunday)
+# @update: 18 October 2026 (Sunday)
+# @author:
+import os
+import shutil
+import hashlib
+import tempfile
+from datetime import timedelta
+from PIL import Image
+from django.test import TestCase
+from django.test import Client
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.six import StringIO
+from Aristotle.apps.qa.models import MediaFile
+from Aristotle.apps.qa.storage import ContentAddressedStorage, avatar_storage
+from Aristotle.apps.qa.media import acquire, release, collect_media
+from Aristotle.apps.qa.media import MediaBusy
+import Aristotle.apps.qa.settings as qa_settings
+
+
+class ContentAddressedStorageTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_save(self):
+        key = hashlib.sha1(b'content').hexdigest()
+        name = self.storage.save('files/a.JPG', ContentFile(b'content'))
+        self.assertEqual(name, 'files/%s/%s/%s.jpg' % (key[:2], key[2:4],
+                                                       key))
+        # the same bytes are stored once, under the same name
+        self.assertEqual(self.storage.save('files/b.jpg',
+                                           ContentFile(b'content')), name)
+        other = self.storage.save('files/c.jpg', ContentFile(b'other'))
+        self.assertNotEqual(other, name)
+        files = []
+        for directory, _, names in os.walk(self.root):
+            files += names
+        self.assertEqual(len(files), 2)
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), b'content')
+
+    def test_refs(self):
+        name = self.storage.save('files/a.jpg', ContentFile(b'content'))
+        acquire(name)
+        acquire(name)
+        release(name)
+        self.assertEqual(MediaFile.objects.get(name=name).refs, 1)
+        self.assertEqual(collect_media(self.storage, 0), [])
+        release(name)
+        # released files are kept for a while
+        self.assertEqual(collect_media(self.storage), [])
+        self.assertEqual(collect_media(self.storage, 0), [name])
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(MediaFile.objects.exists())
+        # files stored before are not counted
+        release('files/old.jpg')
+        self.assertFalse(MediaFile.objects.exists())
+
+    def test_unfinished_removal(self):
+        name = self.storage.save('files/a.jpg', ContentFile(b'content'))
+        gone = 'files/gone.jpg'
+        long_ago = timezone.now() - timedelta(days=1)
+        for media_name in (name, gone):
+            MediaFile.objects.create(name=media_name, refs=-1,
+                                     updated_time=long_ago)
+        attempts = qa_settings.MEDIA_ACQUIRE_ATTEMPTS
+        qa_settings.MEDIA_ACQUIRE_ATTEMPTS = 2
+        try:
+            self.assertRaises(MediaBusy, acquire, name)
+        finally:
+            qa_settings.MEDIA_ACQUIRE_ATTEMPTS = attempts
+        # given up by the next collection, the file is kept
+        self.assertEqual(collect_media(self.storage, 3600), [])
+        self.assertEqual(MediaFile.objects.get(name=name).refs, 0)
+        self.assertFalse(MediaFile.objects.filter(name=gone).exists())
+        acquire(name)
+        self.assertEqual(MediaFile.objects.get(name=name).refs, 1)
+
+
+class AvatarStorageTest(TestCase):
+
+    def setUp(self):
+        self.workers = qa_settings.AVATAR_WORKERS
+        qa_settings.AVATAR_WORKERS = 0
+        self.client = Client()
+        for name in ('test1', 'test2'):
+            self.client.post('/signup/', {'username': name,
+                                          'email': name + '@test.com',
+                                          'password': 'test',
+                                          'repassword': 'test'})
+
+    def tearDown(self):
+        qa_settings.AVATAR_WORKERS = self.workers
+
+    def _upload(self, username, path):
+        self.client.post('/signin/', {'username': username,
+                                      'password': 'test'})
+        with open(path, 'rb') as f:
+            self.client.post('/profile/avatar/', {'avatar': f})
+        return str(User.objects.get(username=username).member.avatar)
+
+    def test_shared_avatar(self):
+        avatar = self._upload('test1', './tests/qa/testingavatar.jpg')
+        self.assertEqual(self._upload('test2', './tests/qa/testingavatar.jpg'),
+                         avatar)
+        name = qa_settings.AVATAR_PATH + avatar
+        self.assertEqual(MediaFile.objects.get(name=name).refs, 2)
+        self.client.get('/avatar/small/' + avatar)
+        # test2 switches to another picture, test1 still uses the file
+        other = tempfile.NamedTemporaryFile(suffix='.png')
+        Image.new('RGB', (40, 40)).save(other, 'PNG')
+        other.flush()
+        self._upload('test2', other.name)
+        MediaFile.objects.update(
+            updated_time=timezone.now() - timedelta(days=2))
+        out = StringIO()
+        call_command('collect_media', stdout=out)
+        self.assertIn('0 files removed', out.getvalue())
+        self._upload('test1', other.name)
+        MediaFile.objects.update(
+            updated_time=timezone.now() - timedelta(days=2))
+        call_command('collect_media', stdout=out)
+        self.assertIn('1 files removed', out.getvalue())
+        self.assertFalse(avatar_storage.exists(name))
+        response = self.client.get('/avatar/small/' + avatar)
+        self.assertEqual(response.status_code, 404)
+        avatar_storage.delete(qa_settings.AVATAR_PATH +
+                              str(User.objects.get(
+                                  username='test1').member.avatar))
@@ -4,13 +4,27 @@
 # @create:
 # @update: 03 October 2014 (Friday)
 # @author: Z. Huang
+import os
+import zlib
+import shutil
+import struct
+import tempfile
+from io import BytesIO
+from contextlib import contextmanager
+from PIL import Image
 from django.test import TestCase
 from django.test import Client
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
 # from django.core.exceptions import RelatedObjectDoesNotExist
 from Aristotle.apps.qa.utils import create_unique_code
 from Aristotle.apps.qa.utils import get_utc_time
+from Aristotle.apps.qa.avatars import avatar_url, ThumbnailCache
+from Aristotle.apps.qa.uploads import ImageUploadHandler
+from Aristotle.apps.qa.uploads import sniff_image, ImageTooLarge
+import Aristotle.apps.qa.settings as qa_settings
 
 
 class SignInTest(TestCase):
@@ -351,6 +365,10 @@ class EditAccountTest(TestCase):
 class EditAvatarView(TestCase):
 
     def setUp(self):
+        self.workers = qa_settings.AVATAR_WORKERS
+        # thumbnails within the request, worker threads have no test
+        # database
+        qa_settings.AVATAR_WORKERS = 0
         self.client = Client()
         user1_data = {'username': 'test1',
                       'email': 'test1@test.com',
@@ -459,6 +477,108 @@ class EditAvatarView(TestCase):
         result = delete_uploaded_files(str(user.member.avatar), 'avatar')
         self.assertTrue(result)
 
+    def test_sizes(self):
+        self.client.post('/signin/', {'username': 'test1', 'password': 'test'})
+        with open('./tests/qa/testingavatar.jpg', 'rb') as f:
+            self.client.post('/profile/avatar/', {'avatar': f})
+        avatar = str(User.objects.get(username='test1').member.avatar)
+        # no size is made before it is asked for
+        self.assertFalse(os.path.exists('./static/' +
+                                        qa_settings.AVATAR_CACHE_PATH))
+        for size, box in qa_settings.AVATAR_SIZES.items():
+            response = self.client.get(avatar_url(size, avatar))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'image/jpeg')
+            self.assertIn('max-age=%d' % qa_settings.AVATAR_MAX_AGE,
+                          response['Cache-Control'])
+            image = Image.open(BytesIO(response.content))
+            self.assertEqual(max(image.size), box[0])
+        response = self.client.get(avatar_url(size, avatar),
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(
+            avatar_url('huge', avatar)).status_code, 404)
+        self.assertEqual(self.client.get(
+            avatar_url('small', '../' + avatar)).status_code, 404)
+        self.assertTrue(delete_uploaded_files(avatar, 'avatar'))
+
+    def _post_avatar(self, content, name):
+        upload = SimpleUploadedFile(name, content)
+        return self.client.post('/profile/avatar/', {'avatar': upload},
+                                HTTP_REFERER='/profile/avatar/', follow=True)
+
+    def test_refused_uploads(self):
+        self.client.post('/signin/', {'username': 'test1', 'password': 'test'})
+        with open('./tests/qa/testingavatar.jpg', 'rb') as f:
+            content = f.read()
+        with self.settings(TASK_UPLOAD_FILE_MAX_SIZE=str(len(content) - 1)):
+            response = self._post_avatar(content, 'a.jpg')
+        self.assertContains(response, 'larger than')
+        response = self._post_avatar(b'GIF89a' + b'x' * 100, 'a.gif')
+        self.assertContains(response, 'Incorrect image')
+        response = self._post_avatar(_png_header(64, 64), 'a.tif')
+        self.assertNotContains(response, 'Incorrect image')
+        with self.settings(TASK_UPLOAD_FILE_TYPES=['jpg']):
+            response = self._post_avatar(_png_header(64, 64), 'a.png')
+        self.assertContains(response, 'type png are not accepted')
+        # refused from the header, whatever follows it
+        response = self._post_avatar(_png_header(50000, 50000), 'a.png')
+        self.assertContains(response, 'too many pixels')
+        user = User.objects.get(username='test1')
+        self.assertEqual(user.member.avatar, 'defaultavatar.jpg')
+        # the type is read from the image, not from the name
+        self._post_avatar(content, 'a.png')
+        avatar = str(User.objects.get(username='test1').member.avatar)
+        self.assertTrue(avatar.endswith('.jpg'))
+        self.assertTrue(delete_uploaded_files(avatar, 'avatar'))
+
+    def test_stops_reading(self):
+        handler = ImageUploadHandler()
+        handler.new_file('avatar', 'a.png', 'image/png', None)
+        with open('./tests/qa/testingavatar.jpg', 'rb') as f:
+            head = f.read()
+        # a header split over chunks is read once it is complete
+        self.assertEqual(handler.receive_data_chunk(head[:10], 0),
+                         head[:10])
+        handler.receive_data_chunk(head[10:], 10)
+        self.assertEqual(handler.image_types, {'avatar': 'jpg'})
+        handler.new_file('other', 'b.png', 'image/png', None)
+        self.assertRaises(StopUpload, handler.receive_data_chunk,
+                          _png_header(100000, 100000), 0)
+
+    def test_sniff_old_pil(self):
+        # PIL before 5.0 has no DecompressionBombError, only warns
+        with _without(Image, 'DecompressionBombError'):
+            self.assertEqual(sniff_image(b'not an image'), None)
+            self.assertEqual(sniff_image(_png_header(64, 64)[:20]), None)
+            self.assertEqual(sniff_image(_png_header(64, 64)),
+                             ('png', (64, 64)))
+            self.assertRaises(ImageTooLarge, sniff_image,
+                              _png_header(10000, 10000))
+
+    def test_cache_eviction(self):
+        root = tempfile.mkdtemp()
+        try:
+            cache = ThumbnailCache(os.path.join(root, 'cache'), 1000000)
+            original = './tests/qa/testingavatar.jpg'
+            first = cache.get(original, (32, 32), 'a.jpg')
+            size = os.path.getsize(first)
+            # room for two and a half thumbnails
+            cache.max_size = size * 5 // 2
+            os.utime(first, (0, 0))
+            os.utime(cache.get(original, (32, 32), 'b.jpg'), (1, 1))
+            # served again, so no longer the oldest
+            cache.get(original, (32, 32), 'a.jpg')
+            cache.get(original, (32, 32), 'c.jpg')
+            self.assertTrue(os.path.exists(first))
+            self.assertFalse(os.path.exists(cache.path((32, 32), 'b.jpg')))
+            self.assertEqual(cache.size, size * 2)
+        finally:
+            shutil.rmtree(root)
+
+    def tearDown(self):
+        qa_settings.AVATAR_WORKERS = self.workers
+
 
 class ActivateTest(TestCase):
 
@@ -597,6 +717,30 @@ class ResetPasswordTest(TestCase):
         # A possible bug for deleting record
 
 
+def _png_header(width, height):
+    """the first chunks of a PNG image of a size, without its pixels
+    """
+    header = b'IHDR' + struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + header + \
+        struct.pack('>I', zlib.crc32(header) & 0xffffffff) + \
+        struct.pack('>I', 1000) + b'IDAT' + b'\0' * 16
+
+
+@contextmanager
+def _without(module, *names):
+    """module with some of its attributes removed
+    """
+    removed = dict((name, getattr(module, name)) for name in names
+                   if hasattr(module, name))
+    for name in removed:
+        delattr(module, name)
+    try:
+        yield module
+    finally:
+        for name, value in removed.items():
+            setattr(module, name, value)
+
+
 def delete_uploaded_files(file_name, upload_type):
     import os
     base_dir = './static/uploads/'
@@ -608,9 +752,7 @@ def delete_uploaded_files(file_name, upload_type):
         if os.path.exists(avatar_dir + file_name):
             try:
                 os.remove(avatar_dir + file_name)
-                os.remove(avatar_dir + 'large/' + file_name)
-                os.remove(avatar_dir + 'medium/' + file_name)
-                os.remove(avatar_dir + 'small/' + file_name)
+                shutil.rmtree(avatar_dir + 'cache/', ignore_errors=True)
                 return True
             except OSError:
                 return False